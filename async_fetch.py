@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import threading
+from typing import Optional, Dict, Mapping, Tuple
+from urllib.parse import urlparse
+
+import aiohttp
+
+from host_health import RETRYABLE_STATUS_CODES, host_health
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class AsyncFetcher:
+    """Shared aiohttp client with a pooled, keep-alive connector per event loop"""
+
+    def __init__(self, limit: int = 100, limit_per_host: int = 8, keepalive_timeout: float = 30,
+                 timeout: float = 10):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        # A ClientSession is bound to the loop it was created on, so each loop gets its own
+        self._sessions: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            # Loops that were closed took their connections down with them
+            for stale_loop in [stale for stale in self._sessions if stale.is_closed()]:
+                del self._sessions[stale_loop]
+            session = self._sessions.get(loop)
+            if session is None or session.closed:
+                connector = aiohttp.TCPConnector(
+                    limit=self.limit,
+                    limit_per_host=self.limit_per_host,
+                    keepalive_timeout=self.keepalive_timeout
+                )
+                session = self._sessions[loop] = aiohttp.ClientSession(
+                    connector=connector,
+                    timeout=aiohttp.ClientTimeout(total=self.timeout)
+                )
+        return session
+
+    async def fetch(self, url: str, headers: Optional[Dict[str, str]] = None,
+                    retry_count: int = 3) -> Optional[Tuple[int, Mapping[str, str], bytes]]:
+        """Get a page with retries; backoff sleeps do not block the event loop
+
+        Returns the status, headers and body of a 200 or 304 response, or None
+        once the host is unhealthy, retries are exhausted or upstream answered
+        with a status not worth retrying. Cancelling the calling task aborts
+        the request and any pending backoff.
+        """
+        host = urlparse(url).hostname or ''
+        session = self._get_session()
+        host_health.start_request()
+        for attempt in range(retry_count):
+            if not host_health.allow(url):
+                metrics.inc('quickreader_fetch_rejected_total', help_text="Fetches refused by an open circuit",
+                            host=host)
+                logger.warning(f"{host} is unhealthy, not fetching {url}")
+                return None
+            if attempt:
+                metrics.inc('quickreader_fetch_retries_total', help_text="Upstream fetch retries", host=host)
+            settled = False
+            try:
+                with metrics.span('fetch', host=host):
+                    async with session.get(url, headers=headers) as response:
+                        body = await response.read()
+                metrics.inc('quickreader_downloaded_bytes_total', len(body),
+                            help_text="Bytes downloaded from upstream", host=host)
+                logger.debug(f"Response status: {response.status}")
+                logger.debug(f"Response headers: {response.headers}")
+
+                if response.status in RETRYABLE_STATUS_CODES:
+                    host_health.record_failure(url)
+                else:
+                    host_health.record_success(url)
+                settled = True
+
+                if response.status in (200, 304):
+                    return response.status, response.headers, body
+
+                logger.warning(f"Got status code {response.status} for {url}")
+                if response.status not in RETRYABLE_STATUS_CODES:
+                    break
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                host_health.record_failure(url)
+                settled = True
+                logger.warning(f"Attempt {attempt + 1} failed for {url}: {str(e)}")
+            finally:
+                # Cancelled or failed unexpectedly: a half-open probe must not stay claimed
+                if not settled:
+                    host_health.release_probe(url)
+
+            if attempt < retry_count - 1:
+                sleep_time = host_health.retry_delay(url)
+                if sleep_time is None:
+                    logger.info(f"Not retrying {url}: host unhealthy or retry budget spent")
+                    break
+                logger.info(f"Retrying in {sleep_time:.2f} seconds...")
+                await asyncio.sleep(sleep_time)
+
+        metrics.inc('quickreader_fetch_failures_total', help_text="Fetches that failed after all retries", host=host)
+        logger.error(f"Failed to get content after {attempt + 1} attempts: {url}")
+        return None
+
+    async def close(self):
+        """Close the sessions of every loop, awaiting the current one's and those of loops still running"""
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            sessions, self._sessions = self._sessions, {}
+        for session_loop, session in sessions.items():
+            if session.closed or session_loop.is_closed():
+                continue
+            if session_loop is loop:
+                await session.close()
+            elif session_loop.is_running():
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(session.close(), session_loop))
+
+_fetcher: Optional[AsyncFetcher] = None
+
+def get_async_fetcher() -> AsyncFetcher:
+    """Return the process-wide fetcher shared by every source"""
+    global _fetcher
+    if _fetcher is None:
+        _fetcher = AsyncFetcher()
+    return _fetcher
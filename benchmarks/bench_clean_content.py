@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Golden-output check and microbenchmark for chapter text normalization.
+
+Every chapter in cache/ is run through clean_chapter_text in several layouts
+(blank-line paragraphs, single line breaks, one unbroken line split on
+sentence punctuation, and HTML with <br>, &nbsp; and tags). The output must
+match the digests in clean_content_golden.json, which were recorded from the
+previous multi-pass _clean_content. Then both versions are timed on
+50-100 KB chapters.
+
+    python benchmarks/bench_clean_content.py
+    python benchmarks/bench_clean_content.py --update-golden   # re-record from the legacy version
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from typing import Callable, Dict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import fixtures
+from text_normalize import clean_chapter_text
+
+GOLDEN_PATH = os.path.join(BENCH_DIR, 'clean_content_golden.json')
+
+def legacy_clean_content(content: str) -> str:
+    """NovelSource._clean_content as it was before the single-pass normalizer"""
+    if not content:
+        return ""
+    content = content.replace('&nbsp;', ' ')
+    content = re.sub(r'<br\s*/?>', '\n', content)
+    content = re.sub(r'<[^>]+>', '', content)
+    paragraphs = []
+    split_methods = [
+        lambda x: x.split('\n\n'),
+        lambda x: x.split('\n'),
+        lambda x: re.split(r'([。！？…]+)', x)
+    ]
+    for split_method in split_methods:
+        parts = split_method(content)
+        if isinstance(parts, list) and len(parts) > 1:
+            if split_method == split_methods[-1]:
+                parts = [''.join(parts[i:i+2]) for i in range(0, len(parts)-1, 2)]
+            for p in parts:
+                p = p.strip()
+                if p and len(p) > 10:
+                    p = re.sub(r'\s+', ' ', p)
+                    if not any(skip in p for skip in ['上一章', '下一章', '目录']):
+                        paragraphs.append(p)
+            if paragraphs:
+                break
+    return '\n\n'.join(paragraphs) if paragraphs else content.strip()
+
+def layouts(text: str) -> Dict[str, str]:
+    """The shapes extracted chapter text arrives in from the different extraction paths"""
+    paragraphs = [p for p in text.split('\n') if p.strip()]
+    return {
+        'paragraphs': text,
+        'lines': '\n'.join(paragraphs),
+        'unbroken': ''.join(paragraphs),
+        'html': '&nbsp;&nbsp;' + '<br/>\n<br />'.join(f'　　{p}  <span class="x">{p[:4]}</span>'
+                                                      for p in paragraphs) + '<a href="/">下一章</a>',
+        'indented': '\n'.join(f'　　{p}\t ' for p in paragraphs) + '\n上一章  目录  下一章',
+    }
+
+def cases() -> Dict[str, str]:
+    result = {}
+    for number, text in enumerate(fixtures.load_cached_texts()):
+        for layout, content in layouts(text).items():
+            result[f'{number:03d}-{layout}'] = content
+    return result
+
+def digest(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def seconds_per_call(func: Callable[[str], str], text: str, iterations: int) -> float:
+    func(text)  # warm up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(text)
+    return (time.perf_counter() - start) / iterations
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check and time chapter text normalization")
+    parser.add_argument('--update-golden', action='store_true', help="Re-record digests from the legacy version")
+    parser.add_argument('--iterations', type=int, default=50)
+    args = parser.parse_args()
+
+    inputs = cases()
+    if args.update_golden:
+        golden = {name: digest(legacy_clean_content(content)) for name, content in inputs.items()}
+        with open(GOLDEN_PATH, 'w', encoding='utf-8') as f:
+            json.dump(golden, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Recorded {len(golden)} digests to {GOLDEN_PATH}")
+        return 0
+
+    with open(GOLDEN_PATH, 'r', encoding='utf-8') as f:
+        golden = json.load(f)
+    mismatches = [name for name, content in inputs.items()
+                  if name in golden and digest(clean_chapter_text(content)) != golden[name]]
+    checked = sum(1 for name in inputs if name in golden)
+    print(f"{checked} golden cases, {len(mismatches)} mismatches")
+    for name in mismatches:
+        print(f"  MISMATCH {name}")
+
+    texts = fixtures.load_cached_texts()
+    print(f"\n{'layout':<12}{'size KB':>9}{'before (ms)':>14}{'after (ms)':>13}{'speedup':>10}")
+    for target_kb in (50, 100):
+        text = ''
+        number = 0
+        while len(text.encode('utf-8')) < target_kb * 1024:
+            text += texts[number % len(texts)] + '\n\n'
+            number += 1
+        for layout, content in layouts(text).items():
+            before = seconds_per_call(legacy_clean_content, content, args.iterations)
+            after = seconds_per_call(clean_chapter_text, content, args.iterations)
+            size = len(content.encode('utf-8')) / 1024
+            print(f"{layout:<12}{size:>9.0f}{before * 1000:>14.2f}{after * 1000:>13.2f}{before / after:>9.1f}x")
+    return 1 if mismatches else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
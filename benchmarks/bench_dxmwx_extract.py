@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: per-chapter CPU time of DXMWXSource page parsing.
+
+Compares the baseline pipeline (eight separate regex searches, an
+html.parser DOM built for every page), copied here unchanged, with
+DXMWXSource.parse_chapter.
+
+    python benchmarks/bench_dxmwx_extract.py [--iterations N]
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import time
+from typing import Optional, Dict
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sources import DXMWXSource
+
+logger = logging.getLogger(__name__)
+
+URL = 'https://www.dxmwx.org/read/55500_41833686.html'
+
+def build_page(paragraphs: int, inline_content: bool) -> str:
+    """Build a dxmwx-style chapter page, with the text in TxtContents or only in the DOM"""
+    text = ['陆叶抬头看了一眼天色，心中默默盘算着接下来的打算，矿洞深处传来阵阵回响。' * 2
+            for _ in range(paragraphs)]
+    txt_contents = '\\n\\n'.join(text).encode('unicode_escape').decode('ascii') if inline_content else ''
+    filler = '\n'.join(f'<div class="ad"><span>推荐阅读 {i}</span></div>' for i in range(200))
+    return f'''<html><head><script>
+        var ChapterTitle = "第二章 算计";
+        var TxtContents = "{txt_contents}";
+        var BookName = "人道大圣";
+        var names = ["陆叶"];
+        var prevpage ="/read/55500_41833685.html";
+        var nextpage ="/read/55500_41833687.html";
+        var chapterpage ="/book/55500.html";
+    </script></head><body>
+    {filler}
+    <div id="Lab_Contents">{''.join(f'<p>{p}</p>' for p in text)}</div>
+    <a href="/read/55500_41833685.html">上一章</a>
+    <a href="/book/55500.html">目录</a>
+    <a href="/read/55500_41833687.html">下一章</a>
+    {filler}
+    </body></html>'''
+
+# The baseline (79a749a) implementations, copied so the "before" column stays fixed
+# while sources.py changes
+
+LEGACY_CONTENT_SELECTORS = [
+    {'type': 'id', 'value': 'content'},
+    {'type': 'id', 'value': 'chapter-content'},
+    {'type': 'id', 'value': 'chapterContent'},
+    {'type': 'class', 'value': 'chapter-content'},
+    {'type': 'class', 'value': 'article-content'}
+]
+LEGACY_NAV_SELECTORS = [
+    {'type': 'id', 'value': 'next', 'text': '下一章'},
+    {'type': 'id', 'value': 'prev', 'text': '上一章'},
+    {'type': 'class', 'value': 'next-chapter', 'text': '下一章'},
+    {'type': 'class', 'value': 'prev-chapter', 'text': '上一章'},
+    {'type': 'text', 'value': '下一章'},
+    {'type': 'text', 'value': '上一章'}
+]
+
+def legacy_extract_js_variables(html_content: str) -> dict:
+    """Extract variables from JavaScript"""
+    variables = {}
+
+    # Extract all relevant variables using regex
+    patterns = {
+        'title': r'var\s+ChapterTitle\s*=\s*["\']([^"\']+)["\']',
+        'book_name': r'var\s+BookName\s*=\s*["\']([^"\']+)["\']',
+        'prev_url': r'var\s+prevpage\s*=\s*["\']([^"\']+)["\']',
+        'next_url': r'var\s+nextpage\s*=\s*["\']([^"\']+)["\']',
+        'chapter_list_url': r'var\s+chapterpage\s*=\s*["\']([^"\']+)["\']',
+        'content': r'var\s+TxtContents\s*=\s*["\']([^"\']+)["\']'
+    }
+
+    for key, pattern in patterns.items():
+        match = re.search(pattern, html_content, re.DOTALL)
+        if match:
+            value = match.group(1)
+            # Decode escaped content
+            if key == 'content':
+                value = value.encode().decode('unicode_escape')
+            variables[key] = value
+
+    # Extract character names array
+    names_match = re.search(r'var\s+names\s*=\s*(\[[^\]]+\])', html_content)
+    if names_match:
+        try:
+            names_str = names_match.group(1).replace("'", '"')
+            variables['names'] = json.loads(names_str)
+        except json.JSONDecodeError:
+            variables['names'] = []
+
+    # Extract book and chapter IDs
+    book_id_match = re.search(r'/read/(\d+)_\d+\.html', html_content)
+    if book_id_match:
+        variables['book_id'] = book_id_match.group(1)
+
+    chapter_id_match = re.search(r'/read/\d+_(\d+)\.html', html_content)
+    if chapter_id_match:
+        variables['chapter_id'] = chapter_id_match.group(1)
+
+    return variables
+
+def legacy_extract_content(soup: BeautifulSoup) -> Optional[str]:
+    """Extract content using multiple selectors with fallbacks"""
+    content = None
+
+    # Try each content selector in order
+    for selector in LEGACY_CONTENT_SELECTORS:
+        try:
+            if selector['type'] == 'id':
+                element = soup.find('div', id=selector['value'])
+            elif selector['type'] == 'class':
+                element = soup.find('div', class_=selector['value'])
+
+            if element:
+                # Remove unwanted elements
+                for unwanted in element.find_all(['script', 'style', 'a', 'div', 'span']):
+                    if unwanted.get_text(strip=True) in ['上一章', '下一章', '目录']:
+                        unwanted.decompose()
+
+                # Get text content
+                content = element.get_text(strip=True)
+                if content and len(content) > 100:  # Minimum content length check
+                    logger.info(f"Found content using selector: {selector}")
+                    return content
+        except Exception as e:
+            logger.warning(f"Error with selector {selector}: {str(e)}")
+
+    # Fallback: Try to find the largest text block
+    if not content:
+        try:
+            text_blocks = []
+            for tag in soup.find_all(['div', 'p']):
+                text = tag.get_text(strip=True)
+                if len(text) > 200 and not any(skip in text for skip in ['上一章', '下一章', '目录']):
+                    text_blocks.append((len(text), text))
+
+            if text_blocks:
+                text_blocks.sort(reverse=True)
+                logger.info("Found content using largest text block method")
+                return text_blocks[0][1]
+        except Exception as e:
+            logger.warning(f"Error in fallback content extraction: {str(e)}")
+
+    return None
+
+def legacy_extract_navigation(soup: BeautifulSoup, base_url: str) -> Dict[str, Optional[str]]:
+    """Extract navigation links using multiple selectors"""
+    nav = {'prev_url': None, 'next_url': None, 'chapter_list_url': None}
+
+    # Try each navigation selector
+    for selector in LEGACY_NAV_SELECTORS:
+        try:
+            if selector['type'] == 'id':
+                links = soup.find_all('a', id=selector['value'])
+            elif selector['type'] == 'class':
+                links = soup.find_all('a', class_=selector['value'])
+            elif selector['type'] == 'text':
+                links = [a for a in soup.find_all('a') if selector['value'] in a.get_text(strip=True)]
+
+            for link in links:
+                href = link.get('href')
+                text = link.get_text(strip=True)
+                if href:
+                    if '下一章' in text and not nav['next_url']:
+                        nav['next_url'] = urljoin(base_url, href)
+                    elif '上一章' in text and not nav['prev_url']:
+                        nav['prev_url'] = urljoin(base_url, href)
+                    elif '目录' in text and not nav['chapter_list_url']:
+                        nav['chapter_list_url'] = urljoin(base_url, href)
+        except Exception as e:
+            logger.warning(f"Error with nav selector {selector}: {str(e)}")
+
+    return nav
+
+def legacy_clean_content(content: str) -> str:
+    """Clean and format the extracted content"""
+    if not content:
+        return ""
+
+    # Basic HTML cleanup
+    content = content.replace('&nbsp;', ' ')
+    content = re.sub(r'<br\s*/?>', '\n', content)
+    content = re.sub(r'<[^>]+>', '', content)
+
+    # Split into paragraphs
+    paragraphs = []
+
+    # Try different splitting methods
+    split_methods = [
+        lambda x: x.split('\n\n'),  # Double newlines
+        lambda x: x.split('\n'),    # Single newlines
+        lambda x: re.split(r'([。！？…]+)', x)  # Chinese punctuation
+    ]
+
+    for split_method in split_methods:
+        parts = split_method(content)
+        if isinstance(parts, list) and len(parts) > 1:
+            # For Chinese punctuation split, rejoin with punctuation
+            if split_method == split_methods[-1]:
+                parts = [''.join(parts[i:i+2]) for i in range(0, len(parts)-1, 2)]
+
+            # Process each part
+            for p in parts:
+                p = p.strip()
+                if p and len(p) > 10:  # Only keep meaningful paragraphs
+                    p = re.sub(r'\s+', ' ', p)  # Normalize whitespace
+                    if not any(skip in p for skip in ['上一章', '下一章', '目录']):
+                        paragraphs.append(p)
+
+            if paragraphs:
+                break
+
+
+def legacy_parse_chapter(url: str, html_content: str) -> Optional[Dict]:
+    """The parsing steps of the baseline DXMWXSource.extract_chapter_content, without the fetch"""
+    variables = legacy_extract_js_variables(html_content)
+    if not variables:
+        return None
+    soup = BeautifulSoup(html_content, 'html.parser')
+    content = variables.get('content') or legacy_extract_content(soup)
+    if not content:
+        return None
+    content = legacy_clean_content(content)
+    if not content:
+        return None
+    nav = legacy_extract_navigation(soup, url)
+    return {
+        'url': url,
+        'title': variables.get('title', ''),
+        'book_name': variables.get('book_name', ''),
+        'content': content,
+        'prev_url': nav['prev_url'] or variables.get('prev_url'),
+        'next_url': nav['next_url'] or variables.get('next_url'),
+        'chapter_list_url': nav['chapter_list_url'] or variables.get('chapter_list_url')
+    }
+
+def cpu_time_per_call(func, iterations: int) -> float:
+    func()  # warm up
+    start = time.process_time()
+    for _ in range(iterations):
+        func()
+    return (time.process_time() - start) / iterations
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--paragraphs', type=int, default=60)
+    args = parser.parse_args()
+
+    source = DXMWXSource()
+    print(f"{'page':<22}{'before (ms)':>14}{'after (ms)':>14}{'speedup':>10}")
+    for label, inline in (('TxtContents present', True), ('DOM-only content', False)):
+        html = build_page(args.paragraphs, inline)
+        before = cpu_time_per_call(lambda: legacy_parse_chapter(URL, html), args.iterations)
+        after = cpu_time_per_call(lambda: source.parse_chapter(URL, html), args.iterations)
+        print(f"{label:<22}{before * 1000:>14.2f}{after * 1000:>14.2f}{before / after:>9.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark for streaming book export.
+
+Books of several lengths are stored in a temporary chapter store, with the
+hetushu chapter list page served by the replay server, then exported to
+EPUB and TXT. Reports wall time and the peak of Python allocations during
+the export, which should stay flat as books grow. An export interrupted
+halfway is resumed and must produce the same output as an uninterrupted one.
+
+    python benchmarks/bench_export.py
+    python benchmarks/bench_export.py --chapters 1000 5000 10000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from typing import Dict, List
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import fixtures
+from replay_server import ReplayServer, mount_replay
+from sources import SourceManager
+
+LIST_URL = f'https://www.hetushu.com/book/{fixtures.HETUSHU_BOOK_ID}/index.html'
+
+class Interrupt(Exception):
+    pass
+
+def build_manager(directory: str, chapter_count: int, server: ReplayServer) -> SourceManager:
+    """Manager whose store holds every chapter of a `chapter_count` chapter book"""
+    manager = SourceManager(store_path=os.path.join(directory, f'chapters-{chapter_count}.db'), http_cache_path=None)
+    mount_replay(manager.get_source_for_url(LIST_URL), server)
+    server.pages[f'/book/{fixtures.HETUSHU_BOOK_ID}/index.html'] = \
+        fixtures.hetushu_index_page(chapter_count).encode('utf-8')
+    chapters = manager.get_chapter_list(LIST_URL)
+    texts = fixtures.load_cached_texts()
+    for start in range(0, len(chapters), 500):
+        manager.store.put_many([{'url': entry['url'], 'title': entry['title'], 'book_name': '蛊真人',
+                                 'content': fixtures.chapter_text(start + i, texts),
+                                 'chapter_list_url': LIST_URL}
+                                for i, entry in enumerate(chapters[start:start + 500])])
+    return manager
+
+def export(manager: SourceManager, path: str) -> Dict:
+    start = time.perf_counter()
+    progress = manager.export_book(LIST_URL, path)
+    elapsed = time.perf_counter() - start
+    # Tracing slows allocation down a lot, so memory is measured on a second run
+    tracemalloc.start()
+    manager.export_book(LIST_URL, path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'seconds': elapsed, 'peak_mb': peak / 1024 / 1024, 'size_mb': os.path.getsize(path) / 1024 / 1024,
+            'chapters': progress.done - len(progress.failed)}
+
+def interrupted_export(manager: SourceManager, path: str, stop_at: int) -> bool:
+    """Export with a crash at `stop_at` chapters, then resume; whether the result matches a clean export"""
+
+    def crash(progress):
+        if progress.done == stop_at:
+            raise Interrupt()
+
+    try:
+        manager.export_book(LIST_URL, path, progress_callback=crash)
+    except Interrupt:
+        pass
+    manager.export_book(LIST_URL, path)
+    return os.path.exists(path)
+
+def same_contents(first: str, second: str) -> bool:
+    if first.endswith('.txt'):
+        with open(first, 'rb') as a, open(second, 'rb') as b:
+            return a.read() == b.read()
+    with zipfile.ZipFile(first) as a, zipfile.ZipFile(second) as b:
+        if a.testzip() is not None or b.testzip() is not None:
+            return False
+        names = sorted(a.namelist())
+        # The package document carries the export time
+        return names == sorted(b.namelist()) and all(
+            a.read(name) == b.read(name) for name in names if name != 'OEBPS/content.opf')
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark streaming book export")
+    parser.add_argument('--chapters', type=int, nargs='+', default=[500, 5000])
+    args = parser.parse_args(argv)
+
+    ok = True
+    print(f"{'chapters':>9}{'format':>8}{'seconds':>10}{'peak MB':>10}{'file MB':>10}  resume")
+    with ReplayServer({}) as server, tempfile.TemporaryDirectory() as directory:
+        for chapter_count in args.chapters:
+            manager = build_manager(directory, chapter_count, server)
+            for export_format in ('epub', 'txt'):
+                path = os.path.join(directory, f'book-{chapter_count}.{export_format}')
+                result = export(manager, path)
+                resumed_path = os.path.join(directory, f'resumed-{chapter_count}.{export_format}')
+                resumed = (interrupted_export(manager, resumed_path, chapter_count // 2 + 7)
+                           and same_contents(path, resumed_path))
+                ok = ok and resumed and result['chapters'] == chapter_count
+                print(f"{chapter_count:>9}{export_format:>8}{result['seconds']:>10.2f}{result['peak_mb']:>10.1f}"
+                      f"{result['size_mb']:>10.1f}  {'ok' if resumed else 'MISMATCH'}")
+            manager.store.close()
+    return 0 if ok else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""
+HTML fixtures for the extraction benchmarks.
+
+Pages are built in the dxmwx.org and hetushu.com layouts the sources parse,
+filled with chapter text from the repository's cache/ directory, so runs are
+deterministic and offline. Pages recorded from the live sites with
+`run_benchmarks.py record` are stored under fixtures/ and take precedence.
+"""
+
+import glob
+import json
+import os
+from typing import List, Dict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RECORDED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+DXMWX_BOOK_ID = 55500
+DXMWX_FIRST_CHAPTER = 41833000
+HETUSHU_BOOK_ID = 7640
+HETUSHU_FIRST_CHAPTER = 5345000
+
+def load_cached_texts() -> List[str]:
+    """Chapter texts from cache/, in a stable order"""
+    texts = []
+    for path in sorted(glob.glob(os.path.join(ROOT, 'cache', '*.json'))):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                chapter = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if chapter.get('content'):
+            texts.append(chapter['content'])
+    if not texts:
+        texts.append('陆叶抬头看了一眼天色，心中默默盘算着接下来的打算。\n\n' * 40)
+    return texts
+
+def chapter_text(index: int, texts: List[str], repeat: int = 1) -> str:
+    return '\n\n'.join([texts[index % len(texts)]] * repeat)
+
+def _filler(count: int) -> str:
+    return '\n'.join(f'<div class="ad"><span>推荐阅读 {i}</span><a href="/book/{i}.html">书页</a></div>'
+                     for i in range(count))
+
+def dxmwx_chapter_page(chapter_index: int, text: str, inline_content: bool = False) -> str:
+    """A dxmwx chapter page; the text sits in TxtContents or only in the DOM"""
+    chapter_id = DXMWX_FIRST_CHAPTER + chapter_index
+    txt_contents = text.encode('unicode_escape').decode('ascii') if inline_content else ''
+    paragraphs = ''.join(f'<p>{p}</p>' for p in text.split('\n\n'))
+    return f'''<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>第{chapter_index + 1}章</title>
+<script>
+        var ChapterTitle = "第{chapter_index + 1}章";
+        var TxtContents = "{txt_contents}";
+        var BookName = "人道大圣";
+        var names = ["陆叶"];
+        var prevpage ="/read/{DXMWX_BOOK_ID}_{chapter_id - 1}.html";
+var nextpage ="/read/{DXMWX_BOOK_ID}_{chapter_id + 1}.html";
+var chapterpage ="/book/{DXMWX_BOOK_ID}.html";
+</script></head><body>
+{_filler(120)}
+<div id="Lab_Contents">{paragraphs}</div>
+<div class="nav"><a href="/read/{DXMWX_BOOK_ID}_{chapter_id - 1}.html">上一章</a>
+<a href="/book/{DXMWX_BOOK_ID}.html">目录</a>
+<a href="/read/{DXMWX_BOOK_ID}_{chapter_id + 1}.html">下一章</a></div>
+{_filler(120)}
+</body></html>'''
+
+def dxmwx_chapter_list_page(chapter_count: int) -> str:
+    """A dxmwx chapter index, three chapters per row"""
+    rows = []
+    for start in range(0, chapter_count, 3):
+        spans = ''.join(
+            f'<span style="width:31%;float:left"><a href="/read/{DXMWX_BOOK_ID}_{DXMWX_FIRST_CHAPTER + i}.html">'
+            f'第{i + 1}章 标题{i + 1}</a></span>'
+            for i in range(start, min(start + 3, chapter_count)))
+        rows.append(f'<div style="height:40px;line-height:40px">{spans}</div>')
+    return f'''<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>人道大圣 目录</title></head><body>
+{_filler(40)}
+<div class="list">{''.join(rows)}</div>
+{_filler(40)}
+</body></html>'''
+
+def hetushu_chapter_page(chapter_index: int, text: str) -> str:
+    chapter_id = HETUSHU_FIRST_CHAPTER + chapter_index
+    paragraphs = ''.join(f'<div>{p}</div>' for p in text.split('\n\n'))
+    return f'''<!DOCTYPE html>
+<html><head><title>第{chapter_index + 1}章</title></head><body>
+<div class="book_info"><h2>蛊真人</h2></div>
+{_filler(60)}
+<div class="body"><h2 class="title">蛊真人 &gt; 第{chapter_index + 1}章</h2>
+<div id="content">{paragraphs}</div></div>
+<div class="nav"><a href="/book/{HETUSHU_BOOK_ID}/{chapter_id - 1}.html">上一章</a>
+<a href="/book/{HETUSHU_BOOK_ID}/index.html">目录</a>
+<a href="/book/{HETUSHU_BOOK_ID}/{chapter_id + 1}.html">下一章</a></div>
+{_filler(60)}
+</body></html>'''
+
+def hetushu_index_page(chapter_count: int) -> str:
+    entries = []
+    for i in range(chapter_count):
+        if i % 100 == 0:
+            entries.append(f'<dt><a href="/book/{HETUSHU_BOOK_ID}/{HETUSHU_FIRST_CHAPTER + i}.html">第{i // 100 + 1}卷</a></dt>')
+        entries.append(f'<dd><a href="/book/{HETUSHU_BOOK_ID}/{HETUSHU_FIRST_CHAPTER + i}.html">第{i + 1}章 标题{i + 1}</a></dd>')
+    return f'''<!DOCTYPE html>
+<html><head><title>蛊真人</title></head><body>
+{_filler(40)}
+<dl id="dir">{''.join(entries)}</dl>
+{_filler(40)}
+</body></html>'''
+
+def build_site(chapter_count: int = 3000, chapter_pages: int = 50, repeat: int = 1) -> Dict[str, bytes]:
+    """Map URL path -> page body for both sites, used by the replay server
+
+    `repeat` concatenates cached chapter texts to make omnibus-sized pages.
+    """
+    texts = load_cached_texts()
+    pages = {
+        f'/chapter/{DXMWX_BOOK_ID}.html': dxmwx_chapter_list_page(chapter_count),
+        f'/book/{HETUSHU_BOOK_ID}/index.html': hetushu_index_page(chapter_count),
+    }
+    for i in range(chapter_pages):
+        text = chapter_text(i, texts, repeat)
+        pages[f'/read/{DXMWX_BOOK_ID}_{DXMWX_FIRST_CHAPTER + i}.html'] = dxmwx_chapter_page(i, text)
+        pages[f'/book/{HETUSHU_BOOK_ID}/{HETUSHU_FIRST_CHAPTER + i}.html'] = hetushu_chapter_page(i, text)
+    site = {path: html.encode('utf-8') for path, html in pages.items()}
+    site.update(load_recorded())
+    return site
+
+def load_recorded() -> Dict[str, bytes]:
+    """Pages recorded from the live sites, keyed by URL path"""
+    index_path = os.path.join(RECORDED_DIR, 'index.json')
+    if not os.path.exists(index_path):
+        return {}
+    with open(index_path, 'r', encoding='utf-8') as f:
+        index = json.load(f)
+    recorded = {}
+    for path, filename in index.items():
+        with open(os.path.join(RECORDED_DIR, filename), 'rb') as f:
+            recorded[path] = f.read()
+    return recorded
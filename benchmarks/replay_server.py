@@ -0,0 +1,116 @@
+"""
+Local HTTP server replaying fixture pages in place of dxmwx.org and hetushu.com.
+Pages carry an ETag and conditional requests for unchanged pages get a 304.
+
+ReplayAdapter is mounted on a source's requests session so the hard-coded
+site URLs are answered by the server instead of the network.
+"""
+
+import hashlib
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Optional, Dict
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+
+class ReplayServer:
+    """Serve `pages` (URL path -> body) with configurable latency and injected errors"""
+
+    def __init__(self, pages: Dict[str, bytes], latency: float = 0.0, error_rate: float = 0.0,
+                 charset: Optional[str] = 'utf-8', seed: int = 0):
+        self.pages = pages
+        self.latency = latency
+        self.error_rate = error_rate
+        # None leaves the charset out of Content-Type, forcing encoding detection
+        self.charset = charset
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with server.lock:
+                    server.requests += 1
+                    fail = server.random.random() < server.error_rate
+                    if fail:
+                        server.errors += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                body = server.pages.get(urlsplit(self.path).path)
+                etag = None
+                if fail:
+                    self.send_response(503)
+                    body = b'Service Unavailable'
+                elif body is None:
+                    self.send_response(404)
+                    body = b'Not Found'
+                else:
+                    etag = '"{}"'.format(hashlib.md5(body).hexdigest())
+                    if self.headers.get('If-None-Match') == etag:
+                        self.send_response(304)
+                        self.send_header('ETag', etag)
+                        self.end_headers()
+                        return
+                    self.send_response(200)
+                if etag:
+                    self.send_header('ETag', etag)
+                content_type = 'text/html'
+                if server.charset:
+                    content_type += f'; charset={server.charset}'
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> 'ReplayServer':
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> 'ReplayServer':
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+class ReplayAdapter(HTTPAdapter):
+    """Transport adapter sending every request to the replay server, keeping the path"""
+
+    def __init__(self, base_url: str, **kwargs):
+        super().__init__(**kwargs)
+        self.base_url = base_url
+
+    def send(self, request, **kwargs):
+        parts = urlsplit(request.url)
+        request.url = self.base_url + parts.path + (f'?{parts.query}' if parts.query else '')
+        return super().send(request, **kwargs)
+
+def mount_replay(source, server: ReplayServer):
+    """Route a source's upstream requests to the replay server"""
+    adapter = ReplayAdapter(server.base_url)
+    for prefix in ('https://', 'http://'):
+        source.session.mount(prefix, adapter)
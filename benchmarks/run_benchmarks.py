@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Offline extraction benchmarks for sources.py.
+
+Runs extract_chapter_content and get_chapter_list against a local replay
+server and reports per-stage timings, chapters/sec and peak memory. Results
+are compared with baselines.json; a regression beyond the tolerance exits
+non-zero.
+
+    python benchmarks/run_benchmarks.py                 # run and compare
+    python benchmarks/run_benchmarks.py --save-baseline # record new baselines
+    python benchmarks/run_benchmarks.py --latency 0.05 --error-rate 0.1
+    python benchmarks/run_benchmarks.py --http-cache    # conditional GETs for repeat loads
+    python benchmarks/run_benchmarks.py record URL [URL ...]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import List, Dict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from sources import DXMWXSource, HetuShuSource, SourceManager
+from http_cache import HttpCache
+import fixtures
+from replay_server import ReplayServer, mount_replay
+
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baselines.json')
+STAGES = ['fetch', 'decode', 'parse', 'extract', 'clean']
+
+class StageTimer:
+    """Accumulate wall time per pipeline stage by wrapping the functions that implement it"""
+
+    def __init__(self):
+        self.totals: Dict[str, float] = defaultdict(float)
+        self.patches = []
+
+    def wrap(self, owner, name: str, stage: str):
+        original = getattr(owner, name)
+        totals = self.totals
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                totals[stage] += time.perf_counter() - start
+
+        setattr(owner, name, timed)
+        self.patches.append((owner, name, original))
+
+    def instrument(self, source):
+        self.wrap(source.session, 'get', 'fetch')
+        # _get_page_content covers fetch plus decoding; fetch is subtracted in stages()
+        self.wrap(source, '_get_page_content', 'fetch_decode')
+        # parse_chapter/parse_chapter_list cover parse, extract and clean; extract is the remainder
+        self.wrap(source, 'parse_chapter', 'process')
+        self.wrap(source, 'parse_chapter_list', 'process')
+        self.wrap(source, '_make_soup', 'parse')
+        self.wrap(source, '_clean_content', 'clean')
+
+    def restore(self):
+        for owner, name, original in reversed(self.patches):
+            setattr(owner, name, original)
+        self.patches.clear()
+
+    def stages(self) -> Dict[str, float]:
+        totals = dict(self.totals)
+        totals['decode'] = max(0.0, totals.pop('fetch_decode', 0.0) - totals.get('fetch', 0.0))
+        totals['extract'] = max(0.0, totals.pop('process', 0.0) - totals.get('parse', 0.0) - totals.get('clean', 0.0))
+        return {stage: totals.get(stage, 0.0) for stage in STAGES}
+
+def chapter_urls(site: str, count: int) -> List[str]:
+    if site == 'dxmwx':
+        return [f'https://www.dxmwx.org/read/{fixtures.DXMWX_BOOK_ID}_{fixtures.DXMWX_FIRST_CHAPTER + i}.html'
+                for i in range(count)]
+    return [f'https://www.hetushu.com/book/{fixtures.HETUSHU_BOOK_ID}/{fixtures.HETUSHU_FIRST_CHAPTER + i}.html'
+            for i in range(count)]
+
+def scenarios(args) -> Dict[str, Dict]:
+    dxmwx_list = f'https://www.dxmwx.org/book/{fixtures.DXMWX_BOOK_ID}.html'
+    hetushu_list = f'https://www.hetushu.com/book/{fixtures.HETUSHU_BOOK_ID}/index.html'
+    return {
+        'dxmwx_chapter': {'source': DXMWXSource, 'method': 'extract_chapter_content',
+                          'urls': chapter_urls('dxmwx', args.chapters)},
+        'hetushu_chapter': {'source': HetuShuSource, 'method': 'extract_chapter_content',
+                            'urls': chapter_urls('hetushu', args.chapters)},
+        'dxmwx_chapter_list': {'source': DXMWXSource, 'method': 'get_chapter_list',
+                               'urls': [dxmwx_list] * args.list_runs},
+        'hetushu_chapter_list': {'source': HetuShuSource, 'method': 'get_chapter_list',
+                                 'urls': [hetushu_list] * args.list_runs},
+    }
+
+def run_scenario(scenario: Dict, server: ReplayServer, http_cache: bool = False) -> Dict:
+    source = scenario['source']()
+    mount_replay(source, server)
+    if http_cache:
+        source.http_cache = HttpCache(':memory:')
+    method = getattr(source, scenario['method'])
+    urls = scenario['urls']
+
+    # Timed pass
+    timer = StageTimer()
+    timer.instrument(source)
+    chapters = 0
+    failures = 0
+    start = time.perf_counter()
+    try:
+        for url in urls:
+            result = method(url)
+            if result is None:
+                failures += 1
+            else:
+                chapters += len(result) if isinstance(result, list) else 1
+    finally:
+        timer.restore()
+    elapsed = time.perf_counter() - start
+
+    # Memory pass, kept separate because tracemalloc slows everything down
+    tracemalloc.start()
+    method(urls[0])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'items': len(urls),
+        'failures': failures,
+        'chapters_per_sec': round(chapters / elapsed, 2) if elapsed else 0.0,
+        'ms_per_item': round(elapsed * 1000 / len(urls), 3),
+        'stages_ms_per_item': {stage: round(total * 1000 / len(urls), 3)
+                               for stage, total in timer.stages().items()},
+        'peak_kb': round(peak / 1024, 1)
+    }
+
+def print_report(results: Dict[str, Dict]):
+    header = f"{'scenario':<22}{'chap/s':>10}{'ms/item':>10}" + ''.join(f'{s:>9}' for s in STAGES) + f"{'peak KB':>10}"
+    print(header)
+    print('-' * len(header))
+    for name, r in results.items():
+        stages = ''.join(f"{r['stages_ms_per_item'][s]:>9.2f}" for s in STAGES)
+        print(f"{name:<22}{r['chapters_per_sec']:>10.1f}{r['ms_per_item']:>10.2f}{stages}{r['peak_kb']:>10.0f}")
+
+def compare_with_baseline(results: Dict[str, Dict], tolerance: float) -> List[str]:
+    if not os.path.exists(BASELINE_PATH):
+        print(f"No baseline at {BASELINE_PATH}; run with --save-baseline to create one")
+        return []
+    with open(BASELINE_PATH, 'r', encoding='utf-8') as f:
+        baselines = json.load(f)
+    regressions = []
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if not baseline:
+            continue
+        if result['chapters_per_sec'] < baseline['chapters_per_sec'] * (1 - tolerance):
+            regressions.append(f"{name}: {result['chapters_per_sec']} chapters/sec, "
+                               f"baseline {baseline['chapters_per_sec']}")
+        if result['peak_kb'] > baseline['peak_kb'] * (1 + tolerance):
+            regressions.append(f"{name}: peak {result['peak_kb']} KB, baseline {baseline['peak_kb']} KB")
+        if result['failures'] > baseline.get('failures', 0):
+            regressions.append(f"{name}: {result['failures']} failed items, baseline {baseline.get('failures', 0)}")
+    return regressions
+
+def record(urls: List[str]):
+    """Save live pages into fixtures/ so later runs replay them"""
+    os.makedirs(fixtures.RECORDED_DIR, exist_ok=True)
+    index_path = os.path.join(fixtures.RECORDED_DIR, 'index.json')
+    index = {}
+    if os.path.exists(index_path):
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    manager = SourceManager(store_path=':memory:', http_cache_path=None)
+    for url in urls:
+        source = manager.get_source_for_url(url)
+        # Keep the bytes exactly as served so replays decode them the way the site does
+        page = source._fetch_page(url) if source else None
+        if not page:
+            print(f"Could not record {url}")
+            continue
+        path = url.split('://', 1)[-1].split('/', 1)[-1]
+        filename = path.strip('/').replace('/', '_')
+        with open(os.path.join(fixtures.RECORDED_DIR, filename), 'wb') as f:
+            f.write(page[0])
+        index['/' + path] = filename
+        print(f"Recorded {url} -> fixtures/{filename}")
+    with open(index_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline extraction benchmarks")
+    parser.add_argument('command', nargs='?', default='run', choices=['run', 'record'])
+    parser.add_argument('urls', nargs='*', help="URLs to record")
+    parser.add_argument('--chapters', type=int, default=50, help="Chapter pages per site")
+    parser.add_argument('--book-size', type=int, default=3000, help="Chapters in the synthetic chapter lists")
+    parser.add_argument('--list-runs', type=int, default=5, help="Chapter list fetches per site")
+    parser.add_argument('--repeat', type=int, default=1, help="Concatenate texts for omnibus-sized chapters")
+    parser.add_argument('--latency', type=float, default=0.0, help="Replay server latency in seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument('--no-charset', action='store_true', help="Omit charset from Content-Type")
+    parser.add_argument('--http-cache', action='store_true', help="Revalidate through an in-memory HTTP cache")
+    parser.add_argument('--only', action='append', help="Run only the named scenario(s)")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed regression before failing")
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    if args.command == 'record':
+        record(args.urls)
+        return 0
+
+    pages = fixtures.build_site(args.book_size, args.chapters, args.repeat)
+    charset = None if args.no_charset else 'utf-8'
+    results = {}
+    with ReplayServer(pages, latency=args.latency, error_rate=args.error_rate, charset=charset) as server:
+        for name, scenario in scenarios(args).items():
+            if args.only and name not in args.only:
+                continue
+            results[name] = run_scenario(scenario, server, args.http_cache)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+
+    if args.save_baseline:
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+        print(f"Saved baseline to {BASELINE_PATH}")
+        return 0
+
+    regressions = compare_with_baseline(results, args.tolerance)
+    if regressions:
+        print("\nREGRESSIONS against baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the web backend.
+
+Each scenario runs in a fresh interpreter several times and reports the
+median time of its startup code, the median wall time of the whole process
+and which heavy third-party modules were loaded by the time it finished.
+
+    python benchmarks/startup_benchmark.py
+    python benchmarks/startup_benchmark.py --runs 10 --json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ['requests', 'bs4', 'lxml', 'aiohttp', 'asyncio']
+
+# Startup code per scenario; it runs between the two clock readings
+SCENARIOS = {
+    'backend_import': 'import sources',
+    'backend_ready': (
+        'import sources\n'
+        "manager = sources.SourceManager(store_path=':memory:', http_cache_path=None)\n"
+        "manager.get_source_for_url('https://www.hetushu.com/book/1/index.html')"
+    ),
+}
+
+RUNNER = '''
+import json, sys, time
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'ms': elapsed * 1000,
+                  'loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+'''
+
+def run_once(code: str) -> Dict:
+    script = RUNNER.format(code=code, heavy=HEAVY_MODULES)
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', script], cwd=ROOT_DIR, capture_output=True,
+                            text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process_ms'] = (time.perf_counter() - start) * 1000
+    return result
+
+def run_scenario(code: str, runs: int) -> Dict:
+    samples = [run_once(code) for _ in range(runs)]
+    return {
+        'startup_ms': round(statistics.median(sample['ms'] for sample in samples), 1),
+        'process_ms': round(statistics.median(sample['process_ms'] for sample in samples), 1),
+        'loaded': samples[-1]['loaded']
+    }
+
+def print_report(results: Dict[str, Dict]):
+    print(f"{'scenario':<18}{'startup ms':>12}{'process ms':>12}  heavy modules loaded")
+    print('-' * 72)
+    for name, result in results.items():
+        loaded = ', '.join(result['loaded']) or '-'
+        print(f"{name:<18}{result['startup_ms']:>12.1f}{result['process_ms']:>12.1f}  {loaded}")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Cold-start benchmark")
+    parser.add_argument('--runs', type=int, default=5, help="Fresh interpreters per scenario")
+    parser.add_argument('--only', action='append', help="Run only the named scenario(s)")
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    results: Dict[str, Dict] = {}
+    for name, code in SCENARIOS.items():
+        if args.only and name not in args.only:
+            continue
+        results[name] = run_scenario(code, args.runs)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
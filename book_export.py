@@ -0,0 +1,288 @@
+import html
+import json
+import logging
+import os
+import re
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Callable, Iterator, Tuple
+
+from chapter_index import ChapterIndex
+from downloader import DownloadProgress
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ('epub', 'txt')
+
+# Characters XML 1.0 does not allow, which would make a chapter file unreadable
+XML_INVALID_PATTERN = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+CONTAINER_XML = '''<?xml version="1.0" encoding="utf-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>
+'''
+
+def _escape(text: str) -> str:
+    return html.escape(XML_INVALID_PATTERN.sub('', text or ''), quote=False)
+
+class TxtWriter:
+    """Plain UTF-8 text, chapters one after another"""
+
+    def __init__(self, path: str, offset: int = 0, directory: bytes = b''):
+        self.file = open(path, 'r+b' if offset else 'wb')
+        # Anything after the checkpoint was written by an interrupted export
+        self.file.truncate(offset)
+        self.file.seek(offset)
+
+    def write_chapter(self, position: int, title: str, content: str):
+        self.file.write(f'{title}\n\n{content}\n\n\n'.encode('utf-8'))
+
+    def checkpoint(self) -> Tuple[int, bytes]:
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell(), b''
+
+    def finish(self, book_name: str, identifier: str, entries: Callable[[], Iterator[Tuple[int, str]]]):
+        self.file.close()
+
+    def close(self):
+        self.file.close()
+
+class EpubWriter:
+    """EPUB 3 zip with one XHTML file per chapter; the package and navigation files are written last"""
+
+    def __init__(self, path: str, offset: int = 0, directory: bytes = b''):
+        self.path = path
+        if offset:
+            # Put back the central directory of the last checkpoint over whatever followed it
+            with open(path, 'r+b') as f:
+                f.truncate(offset)
+                f.seek(offset)
+                f.write(directory)
+            self.zip = zipfile.ZipFile(path, 'a', zipfile.ZIP_DEFLATED)
+        else:
+            self.zip = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED)
+            # The mimetype must come first and be stored uncompressed
+            self.zip.writestr(zipfile.ZipInfo('mimetype'), 'application/epub+zip')
+            self.zip.writestr('META-INF/container.xml', CONTAINER_XML)
+
+    @staticmethod
+    def chapter_name(position: int) -> str:
+        return f'text/{position:05d}.xhtml'
+
+    def write_chapter(self, position: int, title: str, content: str):
+        title = _escape(title)
+        # Escaping leaves the blank lines between paragraphs alone, so the whole text is escaped at once
+        paragraphs = '</p>\n<p>'.join(_escape(content).split('\n\n'))
+        self.zip.writestr('OEBPS/' + self.chapter_name(position),
+                          '<?xml version="1.0" encoding="utf-8"?>\n<!DOCTYPE html>\n'
+                          '<html xmlns="http://www.w3.org/1999/xhtml" xml:lang="zh">\n'
+                          f'<head><title>{title}</title></head>\n<body>\n<h2>{title}</h2>\n'
+                          f'<p>{paragraphs}</p>\n</body>\n</html>\n')
+
+    def checkpoint(self) -> Tuple[int, bytes]:
+        """Close the zip so the file is complete, then reopen it for appending
+
+        Returns where the central directory starts and its bytes, which
+        appending overwrites.
+        """
+        self.zip.close()
+        self.zip = zipfile.ZipFile(self.path, 'a', zipfile.ZIP_DEFLATED)
+        offset = self.zip.start_dir
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            return offset, f.read()
+
+    def finish(self, book_name: str, identifier: str, entries: Callable[[], Iterator[Tuple[int, str]]]):
+        """Write the package document and table of contents for the chapters in `entries`"""
+        with self.zip.open('OEBPS/nav.xhtml', 'w') as f:
+            f.write('<?xml version="1.0" encoding="utf-8"?>\n<!DOCTYPE html>\n'
+                    '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" '
+                    f'xml:lang="zh">\n<head><title>{_escape(book_name)}</title></head>\n<body>\n'
+                    '<nav epub:type="toc" id="toc"><ol>\n'.encode('utf-8'))
+            for position, title in entries():
+                f.write(f'<li><a href="{self.chapter_name(position)}">{_escape(title)}</a></li>\n'.encode('utf-8'))
+            f.write(b'</ol></nav>\n</body>\n</html>\n')
+
+        modified = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        with self.zip.open('OEBPS/content.opf', 'w') as f:
+            f.write('<?xml version="1.0" encoding="utf-8"?>\n'
+                    '<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="book-id">\n'
+                    '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">\n'
+                    f'<dc:identifier id="book-id">{_escape(identifier)}</dc:identifier>\n'
+                    f'<dc:title>{_escape(book_name)}</dc:title>\n<dc:language>zh</dc:language>\n'
+                    f'<meta property="dcterms:modified">{modified}</meta>\n</metadata>\n<manifest>\n'
+                    '<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>\n'
+                    .encode('utf-8'))
+            for position, _ in entries():
+                f.write(f'<item id="c{position:05d}" href="{self.chapter_name(position)}" '
+                        'media-type="application/xhtml+xml"/>\n'.encode('utf-8'))
+            f.write(b'</manifest>\n<spine>\n')
+            for position, _ in entries():
+                f.write(f'<itemref idref="c{position:05d}"/>\n'.encode('utf-8'))
+            f.write(b'</spine>\n</package>\n')
+        self.zip.close()
+
+    def close(self):
+        self.zip.close()
+
+WRITERS = {'epub': EpubWriter, 'txt': TxtWriter}
+
+class BookExporter:
+    """Stream a book from the chapter store into an EPUB or TXT file, in chapter list order
+
+    Chapters are read from the store `window` at a time and only the
+    missing ones in a window are fetched upstream, through the rate-limited
+    single-flight path, so memory stays flat however long the book is.
+    Output goes to `<path>.part`. Every `checkpoint_every` chapters the part
+    file is made consistent and the export's state is saved next to it; a
+    later export of the same book to the same path carries on from there.
+    Chapters that cannot be loaded are left out and reported as failed.
+    """
+
+    def __init__(self, source_manager, window: int = 50, max_workers: int = 4, checkpoint_every: int = 500):
+        self.source_manager = source_manager
+        self.store = source_manager.store
+        self.window = window
+        self.max_workers = max_workers
+        self.checkpoint_every = checkpoint_every
+
+    @staticmethod
+    def _state_path(path: str) -> str:
+        return path + '.part.state'
+
+    def _load_state(self, path: str, list_url: str, export_format: str, index: ChapterIndex) -> Optional[Dict]:
+        """State of an interrupted export of this book to `path`, if it can be resumed"""
+        try:
+            with open(self._state_path(path), 'rb') as f:
+                data = f.read()
+            header, _, directory = data.partition(b'\n')
+            state = json.loads(header)
+            part_size = os.path.getsize(path + '.part')
+        except (OSError, ValueError):
+            return None
+        position = state['position']
+        if (state['list_url'] != list_url or state['format'] != export_format or part_size < state['offset']
+                or len(directory) != state['directory_size'] or position > len(index)
+                or (position and index.url(position - 1) != state['last_url'])):
+            logger.info(f"Not resuming export to {path}: its state does not match")
+            return None
+        state['directory'] = directory
+        return state
+
+    def _save_state(self, path: str, state: Dict, directory: bytes):
+        """Write the state and the writer's checkpoint data in one file, replaced atomically"""
+        header = {key: value for key, value in state.items() if key != 'directory'}
+        header['directory_size'] = len(directory)
+        temporary = self._state_path(path) + '.tmp'
+        with open(temporary, 'wb') as f:
+            f.write(json.dumps(header).encode('utf-8') + b'\n' + directory)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self._state_path(path))
+
+    def _chapters(self, index: ChapterIndex, start: int, stop: int, executor: ThreadPoolExecutor,
+                  progress: DownloadProgress) -> Iterator[Tuple[int, str, Optional[Dict]]]:
+        """(position, url, chapter or None) from `start` to `stop`, one window in memory at a time"""
+
+        def fetch(url: str) -> Optional[Dict]:
+            try:
+                return self.source_manager.fetch_chapter(url, rate_limit=True)
+            except Exception as e:
+                logger.warning(f"Export fetch failed for {url}: {str(e)}")
+                return None
+
+        for window_start in range(start, stop, self.window):
+            entries = index.range(window_start, min(stop, window_start + self.window))
+            urls = [entry['url'] for entry in entries]
+            found = self.store.get_many(urls)
+            missing = [url for url in dict.fromkeys(urls) if url not in found]
+            for url, chapter in zip(missing, executor.map(fetch, missing)):
+                if chapter:
+                    found[url] = chapter
+            fetched = sum(1 for url in missing if url in found)
+            with progress.lock:
+                progress.skipped += len(urls) - len(missing)
+                progress.downloaded += fetched
+            metrics.inc('quickreader_export_chapters_total', len(urls) - len(missing),
+                        help_text="Chapters written by book exports", result='cached')
+            metrics.inc('quickreader_export_chapters_total', fetched,
+                        help_text="Chapters written by book exports", result='fetched')
+            for entry in entries:
+                yield entry['position'], entry['url'], found.get(entry['url'])
+
+    def export(self, url: str, path: str, export_format: Optional[str] = None,
+               progress_callback: Optional[Callable[[DownloadProgress], None]] = None) -> Optional[DownloadProgress]:
+        """Export the book at `url` (any book or chapter URL) to `path`, resuming an interrupted export
+
+        The format defaults to the extension of `path`. Returns the progress
+        counters, or None if the book's chapter list is unavailable.
+        """
+        export_format = (export_format or os.path.splitext(path)[1].lstrip('.')).lower()
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {export_format!r}")
+        manager = self.source_manager
+        # Pick up new chapters first, but an offline export can still use the stored list
+        if manager.refresh_chapter_list(url) is None:
+            logger.warning(f"Could not refresh chapter list for {url}, exporting the stored one")
+        index = manager.get_chapter_index(url)
+        if index is None:
+            logger.error(f"Could not get chapter list for {url}")
+            return None
+
+        state = self._load_state(path, index.list_url, export_format, index)
+        if state is None:
+            state = {'list_url': index.list_url, 'format': export_format, 'total': len(index), 'position': 0,
+                     'last_url': None, 'offset': 0, 'book_name': None, 'failed': [], 'directory': b''}
+        else:
+            logger.info(f"Resuming export to {path} at chapter {state['position']}")
+        total = state['total']
+        progress = DownloadProgress(total)
+        progress.skipped = state['position'] - len(state['failed'])
+        progress.failed.extend(index.url(position) for position in state['failed'])
+        failed = set(state['failed'])
+
+        writer = WRITERS[export_format](path + '.part', state['offset'], state['directory'])
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='export') as executor:
+                for position, chapter_url, chapter in self._chapters(index, state['position'], total,
+                                                                     executor, progress):
+                    if chapter:
+                        writer.write_chapter(position, (chapter.get('title') or index.title(position)).strip(),
+                                             chapter.get('content') or '')
+                        state['book_name'] = state['book_name'] or chapter.get('book_name')
+                    else:
+                        state['failed'].append(position)
+                        failed.add(position)
+                        with progress.lock:
+                            progress.failed.append(chapter_url)
+                        metrics.inc('quickreader_export_chapters_total',
+                                    help_text="Chapters written by book exports", result='failed')
+                    state['position'] = position + 1
+                    state['last_url'] = chapter_url
+                    if state['position'] % self.checkpoint_every == 0:
+                        state['offset'], directory = writer.checkpoint()
+                        self._save_state(path, state, directory)
+                    if progress_callback:
+                        progress_callback(progress)
+
+            def entries() -> Iterator[Tuple[int, str]]:
+                return ((position, index.title(position)) for position in range(total) if position not in failed)
+
+            book_name = state['book_name'] or os.path.splitext(os.path.basename(path))[0]
+            writer.finish(book_name, index.list_url, entries)
+        except BaseException:
+            writer.close()
+            raise
+        os.replace(path + '.part', path)
+        try:
+            os.remove(self._state_path(path))
+        except FileNotFoundError:
+            pass
+        logger.info(f"Exported {path}: {progress.as_dict()}")
+        return progress
@@ -0,0 +1,45 @@
+import zlib
+from typing import Optional, List, Tuple
+
+# How chapter content is stored in the `content` column
+CODEC_TEXT = 0        # plain UTF-8 text
+CODEC_ZLIB = 1        # zlib stream
+CODEC_ZLIB_DICT = 2   # zlib stream primed with the book's dictionary
+
+COMPRESSION_LEVEL = 9
+# zlib only looks back 32 KB, so a larger dictionary would never be referenced
+DICTIONARY_SIZE = 32 * 1024
+# Bytes taken from the start of each sample chapter when training a dictionary
+DICTIONARY_SAMPLE_BYTES = 2048
+
+def compress(text: str, dictionary: Optional[bytes] = None) -> Tuple[int, bytes]:
+    """Return (codec, payload) for chapter text"""
+    data = text.encode('utf-8')
+    if dictionary:
+        compressor = zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, 15, 9, zlib.Z_DEFAULT_STRATEGY, dictionary)
+        return CODEC_ZLIB_DICT, compressor.compress(data) + compressor.flush()
+    return CODEC_ZLIB, zlib.compress(data, COMPRESSION_LEVEL)
+
+def decompress(payload, codec: int, dictionary: Optional[bytes] = None) -> str:
+    if codec == CODEC_TEXT:
+        return payload if isinstance(payload, str) else bytes(payload).decode('utf-8')
+    if codec == CODEC_ZLIB_DICT:
+        decompressor = zlib.decompressobj(15, dictionary)
+        return (decompressor.decompress(payload) + decompressor.flush()).decode('utf-8')
+    return zlib.decompress(payload).decode('utf-8')
+
+def train_dictionary(samples: List[str], size: int = DICTIONARY_SIZE) -> bytes:
+    """Build a zlib preset dictionary from sample chapters of one book
+
+    Chapters of a book share character names, places and stock phrases, so
+    text taken from several of them primes the compressor better than
+    frequency-picked fragments. zlib prefers references near the end of the
+    dictionary, so the earliest samples are cut first when it overflows.
+    """
+    chunk = max(DICTIONARY_SAMPLE_BYTES, size // max(1, len(samples)))
+    parts = []
+    for sample in samples:
+        data = sample.encode('utf-8')[:chunk]
+        # Do not leave half a character at the end of a chunk
+        parts.append(data.decode('utf-8', 'ignore').encode('utf-8'))
+    return b''.join(parts)[-size:]
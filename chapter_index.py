@@ -0,0 +1,160 @@
+import sys
+from array import array
+from typing import Optional, List, Dict, Iterable
+
+from chapter_store import parse_chapter_url
+
+# Odd multiplier spreading chapter ids over the position table (Fibonacci hashing)
+HASH_MULTIPLIER = 0x9E3779B1
+
+class ChapterIndex:
+    """Order of one book's chapters, for navigation without fetching pages
+
+    Chapter URLs of a book differ only in their chapter id, so the index keeps
+    a URL template plus an array of ids instead of a dict per chapter. Titles
+    are packed into one string, and ids are mapped back to positions by an
+    open-addressing table of positions rather than a dict of int objects.
+    URLs that do not fit the template are kept as-is. position/prev/next/nth
+    are O(1); range is O(length of the range). For a URL listed more than
+    once, position() gives the last listing.
+    """
+
+    def __init__(self, list_url: str, chapters: Iterable[Dict] = ()):
+        self.list_url = list_url
+        # URL of chapter id N is prefix + str(N) + suffix
+        self.prefix: Optional[str] = None
+        self.suffix: Optional[str] = None
+        self.ids = array('q')
+        self.title_text = ''
+        self.title_ends = array('I')
+        # Hash table of position + 1 (0 = empty slot), keyed by the id at that position
+        self.table = array('I', bytes(4 * 16))
+        # URLs outside the template, by position and back
+        self.irregular_urls: Dict[int, str] = {}
+        self.irregular_positions: Dict[str, int] = {}
+        self.extend(chapters)
+
+    def _chapter_id(self, url: str) -> Optional[int]:
+        """The chapter id if `url` fits the template, learning the template from the first URL"""
+        _, chapter_id = parse_chapter_url(url)
+        if not chapter_id or str(int(chapter_id)) != chapter_id:
+            return None
+        if self.prefix is None:
+            start = url.rindex(chapter_id)
+            self.prefix, self.suffix = url[:start], url[start + len(chapter_id):]
+        if url != self.prefix + chapter_id + self.suffix:
+            return None
+        return int(chapter_id)
+
+    def extend(self, chapters: Iterable[Dict]):
+        """Append chapters in list order
+
+        The ids array grows last, so concurrent readers never see a position
+        whose URL or title is not in place yet.
+        """
+        ids = array('q')
+        titles = []
+        title_ends = array('I')
+        end = len(self.title_text)
+        for chapter in chapters:
+            url = chapter['url']
+            position = len(self.ids) + len(ids)
+            chapter_id = self._chapter_id(url)
+            if chapter_id is None:
+                ids.append(-1)
+                self.irregular_urls[position] = url
+                self.irregular_positions[url] = position
+            else:
+                ids.append(chapter_id)
+            title = chapter.get('title') or ''
+            titles.append(title)
+            end += len(title)
+            title_ends.append(end)
+        self.title_text += ''.join(titles)
+        self.title_ends.extend(title_ends)
+        start = len(self.ids)
+        self.ids.extend(ids)
+        if len(self.table) < 2 * len(self.ids):
+            size = len(self.table)
+            while size < 2 * len(self.ids):
+                size *= 2
+            table = array('I', bytes(4 * size))
+            self._add_positions(table, 0)
+            self.table = table
+        else:
+            self._add_positions(self.table, start)
+
+    def _add_positions(self, table: array, start: int):
+        """Enter positions from `start` on into `table`, keeping the last position of a repeated id"""
+        ids = self.ids
+        mask = len(table) - 1
+        for position in range(start, len(ids)):
+            chapter_id = ids[position]
+            if chapter_id < 0:
+                continue
+            slot = (chapter_id * HASH_MULTIPLIER) & mask
+            while table[slot] and ids[table[slot] - 1] != chapter_id:
+                slot = (slot + 1) & mask
+            table[slot] = position + 1
+
+    def _find(self, chapter_id: int) -> Optional[int]:
+        table = self.table
+        mask = len(table) - 1
+        slot = (chapter_id * HASH_MULTIPLIER) & mask
+        while table[slot]:
+            position = table[slot] - 1
+            if self.ids[position] == chapter_id:
+                return position
+            slot = (slot + 1) & mask
+        return None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def url(self, position: int) -> str:
+        chapter_id = self.ids[position]
+        if chapter_id < 0:
+            return self.irregular_urls[position]
+        return f'{self.prefix}{chapter_id}{self.suffix}'
+
+    def title(self, position: int) -> str:
+        start = self.title_ends[position - 1] if position else 0
+        return self.title_text[start:self.title_ends[position]]
+
+    def position(self, url: str) -> Optional[int]:
+        """Position of `url` in the list, or None if it is not listed"""
+        position = self.irregular_positions.get(url)
+        if position is not None:
+            return position
+        _, chapter_id = parse_chapter_url(url)
+        if not chapter_id or self.prefix is None or url != self.prefix + chapter_id + self.suffix:
+            return None
+        return self._find(int(chapter_id))
+
+    def nth(self, position: int) -> Optional[Dict]:
+        """The chapter at `position` as {'position', 'url', 'title'}; negative positions count from the end"""
+        if position < 0:
+            position += len(self.ids)
+        if not 0 <= position < len(self.ids):
+            return None
+        return {'position': position, 'url': self.url(position), 'title': self.title(position)}
+
+    def prev(self, url: str) -> Optional[Dict]:
+        position = self.position(url)
+        return self.nth(position - 1) if position else None
+
+    def next(self, url: str) -> Optional[Dict]:
+        position = self.position(url)
+        return self.nth(position + 1) if position is not None else None
+
+    def range(self, start: int, stop: Optional[int] = None) -> List[Dict]:
+        """Chapters from `start` up to, not including, `stop`"""
+        start, stop, _ = slice(start, stop).indices(len(self.ids))
+        return [{'position': position, 'url': self.url(position), 'title': self.title(position)}
+                for position in range(start, stop)]
+
+    def memory_size(self) -> int:
+        """Approximate bytes held by the index"""
+        size = sys.getsizeof(self.ids) + sys.getsizeof(self.title_ends) + sys.getsizeof(self.title_text)
+        size += sys.getsizeof(self.table) + sys.getsizeof(self.irregular_urls) + sys.getsizeof(self.irregular_positions)
+        return size + sum(sys.getsizeof(url) for url in self.irregular_urls.values())
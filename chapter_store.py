@@ -0,0 +1,709 @@
+import argparse
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Optional, Tuple, List, Dict, Iterator
+from urllib.parse import urlparse
+
+from chapter_codec import CODEC_ZLIB_DICT, compress, decompress, train_dictionary
+from search_index import SearchIndex, make_snippet
+
+logger = logging.getLogger(__name__)
+
+CHAPTER_FIELDS = ['url', 'title', 'book_name', 'content', 'prev_url', 'next_url', 'chapter_list_url']
+
+# Book and chapter ids embedded in chapter URLs, per site layout
+CHAPTER_URL_PATTERNS = [
+    re.compile(r'/read/(\d+)_(\d+)\.html'),    # dxmwx.org
+    re.compile(r'/book/(\d+)/(\d+)\.html'),    # hetushu.com
+]
+
+# Unparsed page source that older caches stored in place of chapter text
+MARKUP_PATTERN = re.compile(r'<\s*(?:script|div|html|body)\b|\bvar\s+\w+\s*=', re.IGNORECASE)
+
+def search_index_path(path: str) -> str:
+    """Path of the search index database belonging to the chapter store at `path`"""
+    if path == ':memory:' or not path:
+        return path
+    root, extension = os.path.splitext(path)
+    return f'{root}.search{extension or ".db"}'
+
+def parse_chapter_url(url: str) -> Tuple[Optional[str], Optional[str]]:
+    """Return (book_id, chapter_id) for a chapter URL, or (None, None)"""
+    for pattern in CHAPTER_URL_PATTERNS:
+        match = pattern.search(url)
+        if match:
+            return match.group(1), match.group(2)
+    return None, None
+
+# Chapter rows joined with the book-level fields stored once per book
+SELECT_CHAPTERS = '''
+    SELECT chapters.*, books.host, books.book_id, books.book_name, books.chapter_list_url
+    FROM chapters JOIN books ON books.book_ref = chapters.book_ref
+'''
+
+# A book gets its compression dictionary once this many of its chapters are stored
+DICTIONARY_MIN_CHAPTERS = 8
+# Chapters sampled, spread across the book, to train a dictionary
+DICTIONARY_SAMPLES = 16
+
+def _spread(items: List, count: int) -> List:
+    """Up to `count` items taken evenly across `items`"""
+    if len(items) <= count:
+        return list(items)
+    step = len(items) / count
+    return [items[int(i * step)] for i in range(count)]
+
+def validate_chapter(chapter: Optional[Dict]) -> Optional[str]:
+    """Return why a chapter record is unusable, or None if it is complete"""
+    if not isinstance(chapter, dict):
+        return "record is not an object"
+    for field in ('url', 'content'):
+        value = chapter.get(field)
+        if not isinstance(value, str) or not value.strip():
+            return f"missing {field}"
+    return None
+
+class ChapterStore:
+    """Single-file SQLite store for extracted chapters, keyed by URL and by book/chapter id
+
+    Book-level fields live once in `books`; chapter text is zlib-compressed,
+    primed with a dictionary trained per book once it has enough chapters.
+    The full-text search index lives in a separate file next to the store
+    (chapters.search.db for chapters.db), attached to the same connection;
+    deleting it only costs a rebuild on the next start.
+    """
+
+    def __init__(self, path: str = 'chapters.db', search_path: Optional[str] = None):
+        self.path = path
+        self.search_path = search_path or search_index_path(path)
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('ATTACH DATABASE ? AS search', (self.search_path,))
+        for schema in ('main', 'search'):
+            self.conn.execute(f'PRAGMA {schema}.journal_mode=WAL')
+            self.conn.execute(f'PRAGMA {schema}.synchronous=NORMAL')
+        # dict_id -> dictionary bytes, and book_ref -> dict_id used for new chapters
+        self.dictionaries: Dict[int, bytes] = {}
+        self.book_dictionaries: Dict[int, Optional[int]] = {}
+        self._create_schema()
+        with self.lock:
+            moved_index = self._drop_inline_search_index()
+            self.search_index = SearchIndex(self.conn, 'search')
+            self._migrate_legacy_chapters()
+            if self.search_index.is_empty() and len(self):
+                logger.info(f"Building the search index in {self.search_path}")
+                self.rebuild_search_index()
+            if moved_index:
+                self.conn.execute('VACUUM main')
+
+    def _create_schema(self):
+        with self.lock:
+            legacy = self._has_legacy_chapters()
+            if legacy:
+                self.conn.execute('ALTER TABLE chapters RENAME TO legacy_chapters')
+                self.conn.execute('DROP INDEX IF EXISTS idx_chapters_book')
+            self.conn.executescript('''
+                CREATE TABLE IF NOT EXISTS books (
+                    book_ref INTEGER PRIMARY KEY,
+                    book_key TEXT UNIQUE NOT NULL,
+                    host TEXT,
+                    book_id TEXT,
+                    book_name TEXT,
+                    chapter_list_url TEXT
+                );
+                CREATE TABLE IF NOT EXISTS dictionaries (
+                    dict_id INTEGER PRIMARY KEY,
+                    book_ref INTEGER NOT NULL,
+                    data BLOB NOT NULL,
+                    created_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS chapters (
+                    url TEXT PRIMARY KEY,
+                    book_ref INTEGER NOT NULL,
+                    chapter_id TEXT,
+                    title TEXT,
+                    codec INTEGER NOT NULL,
+                    dict_id INTEGER,
+                    content BLOB NOT NULL,
+                    prev_url TEXT,
+                    next_url TEXT,
+                    cached_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_chapters_book
+                    ON chapters (book_ref, chapter_id);
+                CREATE TABLE IF NOT EXISTS selector_plans (
+                    plan_key TEXT PRIMARY KEY,
+                    selector TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS chapter_lists (
+                    list_url TEXT PRIMARY KEY,
+                    last_chapter_url TEXT,
+                    last_chapter_id TEXT,
+                    chapter_count INTEGER NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS chapter_list_entries (
+                    list_url TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    url TEXT NOT NULL,
+                    title TEXT,
+                    PRIMARY KEY (list_url, position)
+                );
+                CREATE INDEX IF NOT EXISTS idx_chapter_list_entries_url
+                    ON chapter_list_entries (list_url, url);
+                CREATE TABLE IF NOT EXISTS followed_books (
+                    list_url TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    interval REAL NOT NULL,
+                    next_check REAL NOT NULL,
+                    average_gap REAL,
+                    last_change REAL,
+                    followed_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS new_chapters (
+                    feed_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    list_url TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    title TEXT,
+                    found_at REAL NOT NULL
+                );
+            ''')
+
+    def _drop_inline_search_index(self) -> bool:
+        """Drop search tables that older stores kept in the main database, returning whether there were any"""
+        tables = [row['name'] for row in self.conn.execute(
+            "SELECT name FROM main.sqlite_master WHERE type = 'table' AND name IN ('search_docs', 'search_postings')")]
+        for table in tables:
+            self.conn.execute(f'DROP TABLE main.{table}')
+        return bool(tables)
+
+    def _has_legacy_chapters(self) -> bool:
+        """Whether `chapters` still has the uncompressed layout with book fields on every row"""
+        columns = [row['name'] for row in self.conn.execute('PRAGMA table_info(chapters)').fetchall()]
+        return 'book_name' in columns
+
+    def _migrate_legacy_chapters(self):
+        """Move rows of a pre-compression store into the compressed layout, one book at a time"""
+        if not self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'legacy_chapters'").fetchone():
+            return
+        books = self.conn.execute('SELECT DISTINCT host, book_id FROM legacy_chapters').fetchall()
+        logger.info(f"Compressing chapters of {len(books)} books from the previous store layout")
+        for book in books:
+            rows = self.conn.execute('SELECT * FROM legacy_chapters WHERE host IS ? AND book_id IS ?',
+                                     (book['host'], book['book_id'])).fetchall()
+            # The whole book goes in one batch so its dictionary is trained before any chapter is written
+            self.put_many([{field: row[field] for field in CHAPTER_FIELDS} for row in rows],
+                          [row['cached_at'] for row in rows])
+        self.conn.execute('DROP TABLE legacy_chapters')
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    @staticmethod
+    def is_complete(chapter: Optional[Dict]) -> bool:
+        return validate_chapter(chapter) is None
+
+    def _dictionary(self, dict_id: Optional[int]) -> Optional[bytes]:
+        if dict_id is None:
+            return None
+        data = self.dictionaries.get(dict_id)
+        if data is None:
+            row = self.conn.execute('SELECT data FROM dictionaries WHERE dict_id = ?', (dict_id,)).fetchone()
+            data = self.dictionaries[dict_id] = row['data']
+        return data
+
+    def _row_to_chapter(self, row: sqlite3.Row) -> Dict:
+        chapter = {field: row[field] for field in CHAPTER_FIELDS if field != 'content'}
+        with self.lock:
+            dictionary = self._dictionary(row['dict_id'])
+        chapter['content'] = decompress(row['content'], row['codec'], dictionary)
+        return chapter
+
+    def _book_ref(self, url: str, chapter: Optional[Dict] = None) -> int:
+        """Row id of the book a chapter URL belongs to, creating or updating the book row"""
+        host = urlparse(url).hostname
+        book_id, _ = parse_chapter_url(url)
+        book_key = f'{host}/{book_id or ""}'
+        book_name = chapter.get('book_name') if chapter else None
+        chapter_list_url = chapter.get('chapter_list_url') if chapter else None
+        row = self.conn.execute('SELECT * FROM books WHERE book_key = ?', (book_key,)).fetchone()
+        if row is None:
+            return self.conn.execute(
+                'INSERT INTO books (book_key, host, book_id, book_name, chapter_list_url) VALUES (?, ?, ?, ?, ?)',
+                (book_key, host, book_id, book_name, chapter_list_url)).lastrowid
+        if (book_name and book_name != row['book_name']) or \
+                (chapter_list_url and chapter_list_url != row['chapter_list_url']):
+            self.conn.execute(
+                'UPDATE books SET book_name = COALESCE(?, book_name), '
+                'chapter_list_url = COALESCE(?, chapter_list_url) WHERE book_ref = ?',
+                (book_name, chapter_list_url, row['book_ref']))
+        return row['book_ref']
+
+    def _book_dictionary(self, book_ref: int, pending: List[str]) -> Optional[int]:
+        """Dictionary used for new chapters of a book, trained once it has enough chapters"""
+        if book_ref in self.book_dictionaries:
+            return self.book_dictionaries[book_ref]
+        row = self.conn.execute('SELECT MAX(dict_id) AS dict_id FROM dictionaries WHERE book_ref = ?',
+                                (book_ref,)).fetchone()
+        dict_id = row['dict_id']
+        if dict_id is None:
+            samples = list(pending)
+            if len(samples) < DICTIONARY_MIN_CHAPTERS:
+                stored = self.conn.execute(
+                    'SELECT codec, dict_id, content FROM chapters WHERE book_ref = ? LIMIT ?',
+                    (book_ref, DICTIONARY_MIN_CHAPTERS)).fetchall()
+                samples += [decompress(r['content'], r['codec'], self._dictionary(r['dict_id'])) for r in stored]
+            if len(samples) < DICTIONARY_MIN_CHAPTERS:
+                # Too few chapters to learn from yet; compress without a dictionary for now
+                return None
+            dict_id = self._save_dictionary(book_ref, train_dictionary(_spread(samples, DICTIONARY_SAMPLES)))
+        self.book_dictionaries[book_ref] = dict_id
+        return dict_id
+
+    def _save_dictionary(self, book_ref: int, data: bytes) -> int:
+        dict_id = self.conn.execute('INSERT INTO dictionaries (book_ref, data, created_at) VALUES (?, ?, ?)',
+                                    (book_ref, data, time.time())).lastrowid
+        self.dictionaries[dict_id] = data
+        return dict_id
+
+    def _row_values(self, chapter: Dict, book_ref: int, dict_id: Optional[int],
+                    cached_at: Optional[float] = None) -> tuple:
+        url = chapter['url']
+        _, chapter_id = parse_chapter_url(url)
+        codec, payload = compress(chapter['content'], self._dictionary(dict_id))
+        return (
+            url,
+            book_ref,
+            chapter_id,
+            chapter.get('title'),
+            codec,
+            dict_id if codec == CODEC_ZLIB_DICT else None,
+            payload,
+            chapter.get('prev_url'),
+            chapter.get('next_url'),
+            cached_at if cached_at is not None else time.time()
+        )
+
+    def get(self, url: str) -> Optional[Dict]:
+        with self.lock:
+            row = self.conn.execute(f'{SELECT_CHAPTERS} WHERE url = ?', (url,)).fetchone()
+        return self._row_to_chapter(row) if row else None
+
+    def get_many(self, urls: List[str]) -> Dict[str, Dict]:
+        """Stored chapters among `urls`, by URL, read in as few queries as possible"""
+        found = {}
+        for i in range(0, len(urls), 500):
+            batch = urls[i:i + 500]
+            placeholders = ','.join('?' * len(batch))
+            with self.lock:
+                rows = self.conn.execute(f'{SELECT_CHAPTERS} WHERE url IN ({placeholders})', batch).fetchall()
+            for row in rows:
+                found[row['url']] = self._row_to_chapter(row)
+        return found
+
+    def get_by_id(self, book_id: str, chapter_id: str, host: Optional[str] = None) -> Optional[Dict]:
+        query = f'{SELECT_CHAPTERS} WHERE books.book_id = ? AND chapters.chapter_id = ?'
+        params = [book_id, chapter_id]
+        if host:
+            query += ' AND books.host = ?'
+            params.append(host)
+        with self.lock:
+            row = self.conn.execute(query, params).fetchone()
+        return self._row_to_chapter(row) if row else None
+
+    def has(self, url: str) -> bool:
+        with self.lock:
+            row = self.conn.execute('SELECT 1 FROM chapters WHERE url = ?', (url,)).fetchone()
+        return row is not None
+
+    def put(self, chapter: Dict) -> bool:
+        """Store a chapter; incomplete records are rejected"""
+        return self.put_many([chapter]) == 1
+
+    def put_many(self, chapters: List[Dict], cached_at: Optional[List[Optional[float]]] = None) -> int:
+        """Store several chapters in one transaction, returning how many were accepted"""
+        accepted = []
+        for i, chapter in enumerate(chapters):
+            problem = validate_chapter(chapter)
+            if problem:
+                logger.warning(f"Rejecting chapter {chapter.get('url') if isinstance(chapter, dict) else None}: {problem}")
+                continue
+            accepted.append((chapter, cached_at[i] if cached_at else None))
+        if not accepted:
+            return 0
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                by_book: Dict[int, List[tuple]] = {}
+                for chapter, timestamp in accepted:
+                    by_book.setdefault(self._book_ref(chapter['url'], chapter), []).append((chapter, timestamp))
+                rows = []
+                for book_ref, book_chapters in by_book.items():
+                    dict_id = self._book_dictionary(book_ref, [chapter['content'] for chapter, _ in book_chapters])
+                    rows.extend(self._row_values(chapter, book_ref, dict_id, timestamp)
+                                for chapter, timestamp in book_chapters)
+                self.conn.executemany(
+                    'INSERT OR REPLACE INTO chapters VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+                # Only chapters whose content changed are reindexed, not e.g. a new next_url
+                self.search_index.add_many([self._search_document(chapter) for chapter, _ in accepted])
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                # Dictionaries created in the rolled back transaction are gone
+                self.book_dictionaries.clear()
+                raise
+            self.conn.execute('COMMIT')
+        return len(accepted)
+
+    @staticmethod
+    def _search_document(chapter: Dict) -> tuple:
+        url = chapter['url']
+        book_id, chapter_id = parse_chapter_url(url)
+        return url, urlparse(url).hostname, book_id, chapter_id, chapter['content']
+
+    def delete(self, url: str):
+        with self.lock:
+            self.conn.execute('DELETE FROM chapters WHERE url = ?', (url,))
+            self.search_index.remove(url)
+
+    def search(self, query: str, host: Optional[str] = None, book_id: Optional[str] = None,
+               limit: int = 20, order: str = 'rank') -> List[Dict]:
+        """Full-text search over stored chapters, returning ranked hits with snippets
+
+        Each hit has url, title, book_name, score, matches and a snippet
+        ({'text', 'highlights'}). `order='chapter'` lists hits in book order.
+        """
+        with self.lock:
+            hits = self.search_index.search(query, host=host, book_id=book_id, limit=limit, order=order)
+            for hit in hits:
+                chapter = self.get(hit['url']) or {}
+                hit['title'] = chapter.get('title')
+                hit['book_name'] = chapter.get('book_name')
+                hit['snippet'] = make_snippet(chapter.get('content', ''), hit.pop('spans'))
+        return hits
+
+    def iter_chapters(self, batch_size: int = 200) -> Iterator[Dict]:
+        """Every stored chapter, decompressed, read in batches"""
+        last_url = ''
+        while True:
+            with self.lock:
+                rows = self.conn.execute(f'{SELECT_CHAPTERS} WHERE url > ? ORDER BY url LIMIT ?',
+                                         (last_url, batch_size)).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield self._row_to_chapter(row)
+            last_url = rows[-1]['url']
+
+    def rebuild_search_index(self) -> int:
+        """Index every stored chapter from scratch, which also drops postings of removed chapters"""
+        count = 0
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                self.search_index.clear()
+                batch = []
+                for chapter in self.iter_chapters():
+                    batch.append(self._search_document(chapter))
+                    if len(batch) == 200:
+                        count += self.search_index.add_many(batch)
+                        batch = []
+                count += self.search_index.add_many(batch)
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.conn.execute('COMMIT')
+        return count
+
+    def compact(self) -> Dict[str, int]:
+        """Retrain every book's dictionary, recompress its chapters, rebuild the search index and VACUUM"""
+        size_before = self.disk_size()
+        with self.lock:
+            books = [row['book_ref'] for row in self.conn.execute('SELECT book_ref FROM books').fetchall()]
+            recompressed = 0
+            for book_ref in books:
+                rows = self.conn.execute(f'{SELECT_CHAPTERS} WHERE chapters.book_ref = ?', (book_ref,)).fetchall()
+                chapters = [(self._row_to_chapter(row), row['cached_at']) for row in rows]
+                self.conn.execute('BEGIN IMMEDIATE')
+                try:
+                    dict_id = None
+                    if len(chapters) >= DICTIONARY_MIN_CHAPTERS:
+                        samples = _spread([chapter['content'] for chapter, _ in chapters], DICTIONARY_SAMPLES)
+                        dict_id = self._save_dictionary(book_ref, train_dictionary(samples))
+                    self.conn.executemany(
+                        'INSERT OR REPLACE INTO chapters VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                        [self._row_values(chapter, book_ref, dict_id, cached_at) for chapter, cached_at in chapters])
+                    self.conn.execute('DELETE FROM dictionaries WHERE book_ref = ? AND dict_id IS NOT ?',
+                                      (book_ref, dict_id))
+                except Exception:
+                    self.conn.execute('ROLLBACK')
+                    self.book_dictionaries.clear()
+                    raise
+                self.conn.execute('COMMIT')
+                self.book_dictionaries[book_ref] = dict_id
+                recompressed += len(chapters)
+            self.dictionaries.clear()
+            self.rebuild_search_index()
+            self.conn.execute('VACUUM main')
+            self.conn.execute('VACUUM search')
+        return {'chapters': recompressed, 'bytes_before': size_before, 'bytes_after': self.disk_size()}
+
+    def disk_size(self) -> int:
+        with self.lock:
+            page_count = self.conn.execute('PRAGMA page_count').fetchone()[0]
+            page_size = self.conn.execute('PRAGMA page_size').fetchone()[0]
+        return page_count * page_size
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM chapters').fetchone()[0]
+
+    def load_selector_plans(self) -> Dict[str, Dict]:
+        """Content selectors learned per host and per book"""
+        with self.lock:
+            rows = self.conn.execute('SELECT plan_key, selector FROM selector_plans').fetchall()
+        return {row['plan_key']: json.loads(row['selector']) for row in rows}
+
+    def save_selector_plan(self, plan_key: str, selector: Dict):
+        with self.lock:
+            self.conn.execute('INSERT OR REPLACE INTO selector_plans VALUES (?, ?, ?)',
+                              (plan_key, json.dumps(selector), time.time()))
+
+    def get_chapter_list_state(self, list_url: str) -> Optional[Dict]:
+        """Tail and size of a stored chapter list, without loading its entries"""
+        with self.lock:
+            row = self.conn.execute('SELECT * FROM chapter_lists WHERE list_url = ?', (list_url,)).fetchone()
+        return dict(row) if row else None
+
+    def get_chapter_list(self, list_url: str, start: int = 0) -> Optional[List[Dict]]:
+        """Stored chapter list of a book, from position `start` on"""
+        with self.lock:
+            if not self.conn.execute('SELECT 1 FROM chapter_lists WHERE list_url = ?', (list_url,)).fetchone():
+                return None
+            rows = self.conn.execute(
+                'SELECT url, title FROM chapter_list_entries WHERE list_url = ? AND position >= ? ORDER BY position',
+                (list_url, start)).fetchall()
+        return [{'title': row['title'], 'url': row['url']} for row in rows]
+
+    def get_chapter_list_after(self, list_url: str, chapter_url: str) -> Optional[List[Dict]]:
+        """Stored chapters listed after `chapter_url`, or None if it is not in the list"""
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT MAX(position) AS position FROM chapter_list_entries WHERE list_url = ? AND url = ?',
+                (list_url, chapter_url)).fetchone()
+        if row['position'] is None:
+            return None
+        return self.get_chapter_list(list_url, row['position'] + 1)
+
+    def _write_chapter_list(self, list_url: str, chapters: List[Dict], start: int):
+        self.conn.executemany('INSERT OR REPLACE INTO chapter_list_entries VALUES (?, ?, ?, ?)', [
+            (list_url, start + i, chapter['url'], chapter.get('title')) for i, chapter in enumerate(chapters)
+        ])
+        last = self.conn.execute(
+            'SELECT url FROM chapter_list_entries WHERE list_url = ? ORDER BY position DESC LIMIT 1',
+            (list_url,)).fetchone()
+        last_url = last['url'] if last else None
+        self.conn.execute('INSERT OR REPLACE INTO chapter_lists VALUES (?, ?, ?, ?, ?)', (
+            list_url, last_url, parse_chapter_url(last_url)[1] if last_url else None,
+            start + len(chapters), time.time()
+        ))
+
+    def save_chapter_list(self, list_url: str, chapters: List[Dict]):
+        """Replace the stored chapter list of a book"""
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                self.conn.execute('DELETE FROM chapter_list_entries WHERE list_url = ?', (list_url,))
+                self._write_chapter_list(list_url, chapters, 0)
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.conn.execute('COMMIT')
+
+    def append_chapter_list(self, list_url: str, chapters: List[Dict]) -> int:
+        """Append new chapters to a stored list, returning the position of the first one"""
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self.conn.execute('SELECT chapter_count FROM chapter_lists WHERE list_url = ?',
+                                        (list_url,)).fetchone()
+                start = row['chapter_count'] if row else 0
+                self._write_chapter_list(list_url, chapters, start)
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.conn.execute('COMMIT')
+        return start
+
+    def follow_book(self, list_url: str, url: str, interval: float, next_check: float):
+        """Add a book to the followed books, keeping its schedule if it is already followed"""
+        with self.lock:
+            self.conn.execute('''
+                INSERT OR IGNORE INTO followed_books (list_url, url, interval, next_check, followed_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (list_url, url, interval, next_check, time.time()))
+
+    def unfollow_book(self, list_url: str):
+        with self.lock:
+            self.conn.execute('DELETE FROM followed_books WHERE list_url = ?', (list_url,))
+
+    def followed_books(self) -> List[Dict]:
+        with self.lock:
+            rows = self.conn.execute('SELECT * FROM followed_books ORDER BY next_check').fetchall()
+        return [dict(row) for row in rows]
+
+    def save_book_schedule(self, list_url: str, interval: float, next_check: float,
+                           average_gap: Optional[float], last_change: Optional[float]):
+        with self.lock:
+            self.conn.execute('''
+                UPDATE followed_books SET interval = ?, next_check = ?, average_gap = ?, last_change = ?
+                WHERE list_url = ?
+            ''', (interval, next_check, average_gap, last_change, list_url))
+
+    def add_new_chapters(self, list_url: str, chapters: List[Dict]):
+        """Append chapters found by an update check to the new chapters feed"""
+        now = time.time()
+        with self.lock:
+            self.conn.executemany('INSERT INTO new_chapters (list_url, url, title, found_at) VALUES (?, ?, ?, ?)',
+                                  [(list_url, chapter['url'], chapter.get('title'), now) for chapter in chapters])
+
+    def get_new_chapters(self, after_id: int = 0, limit: int = 100) -> List[Dict]:
+        """Feed entries newer than `after_id`, oldest first; pass the last feed_id seen to page on"""
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT * FROM new_chapters WHERE feed_id > ? ORDER BY feed_id LIMIT ?', (after_id, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def _import(self, cache_dir: str, chapters: List[Dict], cached_at: List[Optional[float]],
+                skipped: int) -> Dict[str, int]:
+        """Store imported chapters, newest copy per URL, counting rows inserted and rows replaced"""
+        newest: Dict[str, int] = {}
+        for i, chapter in enumerate(chapters):
+            previous = newest.get(chapter['url'])
+            if previous is None or (cached_at[i] or 0) >= (cached_at[previous] or 0):
+                newest[chapter['url']] = i
+        duplicates = len(chapters) - len(newest)
+        chapters = [chapters[i] for i in newest.values()]
+        cached_at = [cached_at[i] for i in newest.values()]
+        with self.lock:
+            before = self.conn.execute('SELECT COUNT(*) FROM chapters').fetchone()[0]
+        stored = self.put_many(chapters, cached_at)
+        with self.lock:
+            inserted = self.conn.execute('SELECT COUNT(*) FROM chapters').fetchone()[0] - before
+        logger.info(f"Imported {inserted} new chapters from {cache_dir} ({stored - inserted} replaced, "
+                    f"{duplicates} duplicates, {skipped} skipped)")
+        return {'imported': inserted, 'replaced': stored - inserted, 'duplicates': duplicates,
+                'skipped': skipped + len(chapters) - stored}
+
+    def import_json_cache(self, cache_dir: str = 'cache') -> Dict[str, int]:
+        """Bulk import a legacy cache/ directory of <md5>.json chapter files"""
+        chapters, cached_at = [], []
+        skipped = 0
+        for name in sorted(os.listdir(cache_dir)):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(cache_dir, name)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    chapter = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable cache file {path}: {str(e)}")
+                skipped += 1
+                continue
+            if validate_chapter(chapter):
+                skipped += 1
+                continue
+            chapters.append(chapter)
+            cached_at.append(os.path.getmtime(path))
+        return self._import(cache_dir, chapters, cached_at, skipped)
+
+    def import_text_cache(self, cache_dir: str = 'chapter_cache') -> Dict[str, int]:
+        """Bulk import a legacy chapter_cache/ directory (cache_index.json plus .txt files)"""
+        index_path = os.path.join(cache_dir, 'cache_index.json')
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Cannot read {index_path}: {str(e)}")
+            return {'imported': 0, 'replaced': 0, 'duplicates': 0, 'skipped': 0}
+
+        chapters, cached_at = [], []
+        skipped = 0
+        for entries in index.values():
+            for url, entry in entries.items():
+                path = os.path.join(cache_dir, entry.get('filename', ''))
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        text = f.read()
+                except OSError as e:
+                    logger.warning(f"Skipping missing cache file {path}: {str(e)}")
+                    skipped += 1
+                    continue
+
+                # Files start with a "Title: ..." header line
+                if text.startswith('Title:'):
+                    text = text.split('\n', 1)[1] if '\n' in text else ''
+                content = text.strip()
+                if MARKUP_PATTERN.search(content):
+                    logger.warning(f"Skipping {url}: cached text is unparsed page source")
+                    skipped += 1
+                    continue
+
+                chapter = {'url': url, 'title': entry.get('title', ''), 'content': content}
+                if validate_chapter(chapter):
+                    skipped += 1
+                    continue
+                try:
+                    timestamp = datetime.fromisoformat(entry['cached_at']).timestamp()
+                except (KeyError, ValueError):
+                    timestamp = None
+                chapters.append(chapter)
+                cached_at.append(timestamp)
+        return self._import(cache_dir, chapters, cached_at, skipped)
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the QuickReader chapter store")
+    parser.add_argument('--db', default='chapters.db', help="Path of the chapter store")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    import_parser = subparsers.add_parser('import', help="Import the legacy cache directories")
+    import_parser.add_argument('--cache-dir', default='cache')
+    import_parser.add_argument('--chapter-cache-dir', default='chapter_cache')
+    subparsers.add_parser('migrate', help="Compress the store with freshly trained per-book dictionaries")
+    subparsers.add_parser('reindex', help="Rebuild the full-text search index")
+    search_parser = subparsers.add_parser('search', help="Search stored chapters")
+    search_parser.add_argument('query')
+    search_parser.add_argument('--book-id')
+    search_parser.add_argument('--limit', type=int, default=10)
+    search_parser.add_argument('--order', choices=['rank', 'chapter'], default='rank')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+    store = ChapterStore(args.db)
+    if args.command == 'import':
+        if os.path.isdir(args.cache_dir):
+            print(f"{args.cache_dir}: {store.import_json_cache(args.cache_dir)}")
+        if os.path.isdir(args.chapter_cache_dir):
+            print(f"{args.chapter_cache_dir}: {store.import_text_cache(args.chapter_cache_dir)}")
+    elif args.command == 'migrate':
+        result = store.compact()
+        print(f"Recompressed {result['chapters']} chapters: "
+              f"{result['bytes_before'] / 1e6:.1f} MB -> {result['bytes_after'] / 1e6:.1f} MB")
+    elif args.command == 'reindex':
+        print(f"Indexed {store.rebuild_search_index()} chapters")
+    elif args.command == 'search':
+        for hit in store.search(args.query, book_id=args.book_id, limit=args.limit, order=args.order):
+            print(f"{hit['score']:>8.3f}  {hit['title']}  {hit['url']}")
+            print(f"          {hit['snippet']['text']}")
+    store.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, List, Dict, Callable
+from urllib.parse import urlparse
+
+from parse_pool import FetchedPage, ParsePipeline
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Thread-safe token bucket allowing `rate` requests per second with bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens: float = 1.0):
+        """Block until `tokens` are available, then consume them"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def try_acquire(self, tokens: float = 1.0, reserve: float = 0.0) -> bool:
+        """Consume `tokens` without blocking, leaving at least `reserve` tokens for other callers"""
+        with self.lock:
+            self._refill(time.monotonic())
+            if self.tokens - tokens >= reserve:
+                self.tokens -= tokens
+                return True
+            return False
+
+class HostRateLimiter:
+    """One token bucket per hostname, shared by every caller hitting that host"""
+
+    def __init__(self, default_rate: float = 2.0, default_capacity: Optional[float] = None,
+                 host_rates: Optional[Dict[str, float]] = None):
+        self.default_rate = default_rate
+        self.default_capacity = default_capacity
+        self.host_rates = host_rates or {}
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.lock = threading.Lock()
+
+    def bucket_for(self, url: str) -> TokenBucket:
+        host = urlparse(url).hostname or ''
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                rate = self.host_rates.get(host, self.default_rate)
+                bucket = TokenBucket(rate, self.default_capacity)
+                self.buckets[host] = bucket
+            return bucket
+
+    def acquire(self, url: str):
+        self.bucket_for(url).acquire()
+
+    def try_acquire(self, url: str, reserve: float = 0.0) -> bool:
+        return self.bucket_for(url).try_acquire(reserve=reserve)
+
+class DownloadProgress:
+    """Running counters for a bulk download"""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.downloaded = 0
+        self.skipped = 0
+        self.failed: List[str] = []
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+
+    @property
+    def done(self) -> int:
+        return self.downloaded + self.skipped + len(self.failed)
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def chapters_per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.downloaded / elapsed if elapsed > 0 else 0.0
+
+    def as_dict(self) -> Dict:
+        return {
+            'total': self.total,
+            'done': self.done,
+            'downloaded': self.downloaded,
+            'skipped': self.skipped,
+            'failed': len(self.failed),
+            'elapsed': round(self.elapsed, 2),
+            'chapters_per_second': round(self.chapters_per_second, 2)
+        }
+
+class BookDownloader:
+    """Fetch a whole chapter list through a bounded worker pool, skipping stored chapters"""
+
+    def __init__(self, source_manager, store, rate_limiter: Optional[HostRateLimiter] = None,
+                 max_workers: int = 8, parse_workers: int = 0):
+        self.source_manager = source_manager
+        self.store = store
+        self.rate_limiter = rate_limiter or HostRateLimiter()
+        self.max_workers = max_workers
+        # With parse_workers > 0, pages are parsed in that many processes instead of the fetch threads
+        self.parse_workers = parse_workers
+
+    def _download_one(self, url: str) -> Optional[Dict]:
+        # Shares in-flight fetches with readers and read-ahead, and stores the chapter
+        return self.source_manager.fetch_chapter(url, rate_limit=True)
+
+    def _fetch_one(self, url: str) -> Optional[FetchedPage]:
+        source = self.source_manager.get_source_for_url(url)
+        if not source:
+            logger.error(f"No source can handle {url}")
+            return None
+        self.rate_limiter.acquire(url)
+        page = source._fetch_page(url)
+        if page is None:
+            return None
+        body, headers = page
+        return type(source).__name__, body, headers.get('content-type')
+
+    def _record(self, progress: DownloadProgress, url: str, chapter: Optional[Dict],
+                progress_callback: Optional[Callable[[DownloadProgress], None]]):
+        with progress.lock:
+            if chapter:
+                progress.downloaded += 1
+            else:
+                progress.failed.append(url)
+        if progress_callback:
+            progress_callback(progress)
+
+    def download(self, chapters: List[Dict],
+                 progress_callback: Optional[Callable[[DownloadProgress], None]] = None) -> DownloadProgress:
+        """Download every chapter in `chapters` (the output of get_chapter_list)"""
+        pending = [ch['url'] for ch in chapters if not self.store.has(ch['url'])]
+        progress = DownloadProgress(len(chapters))
+        progress.skipped = len(chapters) - len(pending)
+        logger.info(f"Downloading {len(pending)} chapters ({progress.skipped} already stored)")
+
+        if self.parse_workers:
+            def on_result(url: str, chapter: Optional[Dict]):
+                source = self.source_manager.get_source_for_url(url)
+                if source:
+                    source.chapter_parsed(url, chapter)
+                if chapter:
+                    self.store.put(chapter)
+                self._record(progress, url, chapter, progress_callback)
+
+            pipeline = ParsePipeline(self.parse_workers, fetch_workers=self.max_workers,
+                                     selector_plans=dict(self.store.load_selector_plans()))
+            pipeline.run(pending, self._fetch_one, on_result)
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {executor.submit(self._download_one, url): url for url in pending}
+                for future in as_completed(futures):
+                    url = futures[future]
+                    try:
+                        chapter = future.result()
+                    except Exception as e:
+                        logger.error(f"Error downloading {url}: {str(e)}")
+                        chapter = None
+                    self._record(progress, url, chapter, progress_callback)
+
+        logger.info(f"Download finished: {progress.as_dict()}")
+        return progress
@@ -0,0 +1,103 @@
+import codecs
+import logging
+import re
+import threading
+from typing import Optional, Dict, Mapping, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+HEADER_CHARSET_PATTERN = re.compile(r'charset\s*=\s*["\']?\s*([\w.:-]+)', re.IGNORECASE)
+META_CHARSET_PATTERN = re.compile(rb'<meta[^>]+?charset\s*=\s*["\']?\s*([\w.:-]+)', re.IGNORECASE)
+
+# Decode legacy Chinese encodings with their superset so rare characters survive
+ENCODING_ALIASES = {
+    'gb2312': 'gb18030',
+    'gbk': 'gb18030',
+    'x-gbk': 'gb18030',
+    'utf8': 'utf-8',
+}
+
+def normalize_encoding(name: Optional[str]) -> Optional[str]:
+    """Canonical codec name for a charset label, or None if Python does not know it"""
+    if not name:
+        return None
+    name = name.strip().lower()
+    name = ENCODING_ALIASES.get(name, name)
+    try:
+        codecs.lookup(name)
+    except LookupError:
+        return None
+    return name
+
+class EncodingResolver:
+    """Pick a page's encoding without running charset detection over every body
+
+    Order: Content-Type charset, <meta charset> in the first few KB, the
+    encoding last seen for the host (if the body decodes cleanly with it),
+    and only then full detection, whose result is remembered for the host.
+    """
+
+    def __init__(self, sniff_bytes: int = 4096):
+        self.sniff_bytes = sniff_bytes
+        self.host_encodings: Dict[str, str] = {}
+        self.detections = 0
+        self.lock = threading.Lock()
+
+    def _learn(self, host: str, encoding: str):
+        if self.host_encodings.get(host) != encoding:
+            with self.lock:
+                self.host_encodings[host] = encoding
+
+    def resolve(self, url: str, headers: Mapping[str, str], body: bytes) -> str:
+        return self._resolve(url, headers, body)[0]
+
+    def _resolve(self, url: str, headers: Mapping[str, str], body: bytes) -> Tuple[str, Optional[str]]:
+        """The encoding, plus the decoded text when choosing it already required a strict decode"""
+        host = urlparse(url).hostname or ''
+
+        match = HEADER_CHARSET_PATTERN.search(headers.get('content-type', '') or '')
+        encoding = normalize_encoding(match.group(1)) if match else None
+        if encoding:
+            self._learn(host, encoding)
+            return encoding, None
+
+        match = META_CHARSET_PATTERN.search(body[:self.sniff_bytes])
+        encoding = normalize_encoding(match.group(1).decode('ascii', 'ignore')) if match else None
+        if encoding:
+            self._learn(host, encoding)
+            return encoding, None
+
+        learned = self.host_encodings.get(host)
+        text = self._try_decode(body, learned) if learned else None
+        if text is not None:
+            return learned, text
+
+        encoding, text = self._detect(body)
+        self._learn(host, encoding)
+        return encoding, text
+
+    @staticmethod
+    def _try_decode(body: bytes, encoding: str) -> Optional[str]:
+        try:
+            return body.decode(encoding)
+        except UnicodeDecodeError:
+            return None
+
+    def _detect(self, body: bytes) -> Tuple[str, Optional[str]]:
+        """Last resort: UTF-8 if it decodes strictly, else statistical detection"""
+        text = self._try_decode(body, 'utf-8')
+        if text is not None:
+            return 'utf-8', text
+        self.detections += 1
+        from charset_normalizer import from_bytes
+        best = from_bytes(body).best()
+        encoding = normalize_encoding(best.encoding) if best else None
+        logger.debug(f"Detected encoding: {encoding}")
+        return encoding or 'utf-8', None
+
+    def decode(self, url: str, headers: Mapping[str, str], body: bytes) -> str:
+        """Decode a response body once, straight from bytes"""
+        encoding, text = self._resolve(url, headers, body)
+        logger.debug(f"Using encoding: {encoding}")
+        return text if text is not None else body.decode(encoding, errors='replace')
@@ -0,0 +1,135 @@
+import itertools
+import json
+import logging
+import threading
+import time
+from collections import deque
+from typing import Optional, Iterator, List, Dict
+
+logger = logging.getLogger(__name__)
+
+class EventClient:
+    """Bounded event queue for one connected reader"""
+
+    def __init__(self, client_id: str, max_queue: int):
+        self.client_id = client_id
+        self.queue: deque = deque(maxlen=max_queue)
+        self.dropped = 0
+        self.condition = threading.Condition()
+        self.closed = False
+        self.last_seen = time.monotonic()
+
+    def push(self, event: Dict):
+        with self.condition:
+            if len(self.queue) == self.queue.maxlen:
+                # Slow consumer: drop the oldest event rather than grow without bound
+                self.dropped += 1
+            self.queue.append(event)
+            self.condition.notify()
+
+    def drain(self, timeout: Optional[float] = None) -> List[Dict]:
+        """Return queued events, waiting up to `timeout` seconds for the first one"""
+        with self.condition:
+            if not self.queue and timeout and not self.closed:
+                self.condition.wait(timeout)
+            events = list(self.queue)
+            self.queue.clear()
+            self.last_seen = time.monotonic()
+            return events
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+class EventBroker:
+    """Fan out chapter_loaded/loading_started/error events to per-client queues
+
+    Each page generates its own client id and sends it with its requests, so
+    the events a request causes go to that page only. Clients either hold a
+    server-sent events stream open (`stream`) or fall back to polling
+    (`poll`), which drains the same queue. A queue exists only once its
+    client has connected or polled; events for unknown clients are dropped.
+    When a stream disconnects its queue is kept for `idle_timeout` seconds,
+    so events published while the browser reconnects are delivered then.
+    """
+
+    def __init__(self, max_queue: int = 100, heartbeat_interval: float = 15.0, idle_timeout: float = 300.0):
+        self.max_queue = max_queue
+        self.heartbeat_interval = heartbeat_interval
+        # Clients that have neither polled nor streamed for this long are dropped
+        self.idle_timeout = idle_timeout
+        self.clients: Dict[str, EventClient] = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def subscribe(self, client_id: Optional[str] = None) -> EventClient:
+        with self.lock:
+            if client_id is None:
+                client_id = f"client-{next(self.ids)}"
+            client = self.clients.get(client_id)
+            if client is None or client.closed:
+                client = EventClient(client_id, self.max_queue)
+                self.clients[client_id] = client
+            return client
+
+    def unsubscribe(self, client_id: str):
+        with self.lock:
+            client = self.clients.pop(client_id, None)
+        if client:
+            client.close()
+
+    def publish(self, event: Dict, client_id: Optional[str]):
+        """Queue an event for the client whose request caused it; without a subscribed client it is dropped"""
+        self._expire_idle()
+        with self.lock:
+            client = self.clients.get(client_id) if client_id is not None else None
+        if client is None:
+            logger.debug(f"No event client {client_id}, dropping {event.get('type')} event")
+            return
+        client.push(event)
+
+    def broadcast(self, event: Dict):
+        """Queue an event for every connected client, for news that is not about one reader's request"""
+        self._expire_idle()
+        with self.lock:
+            targets = list(self.clients.values())
+        for client in targets:
+            client.push(event)
+
+    def _expire_idle(self):
+        now = time.monotonic()
+        with self.lock:
+            idle = [cid for cid, c in self.clients.items() if now - c.last_seen > self.idle_timeout]
+        for client_id in idle:
+            logger.debug(f"Dropping idle event client {client_id}")
+            self.unsubscribe(client_id)
+
+    def poll(self, client_id: str, timeout: Optional[float] = None) -> List[Dict]:
+        """Polling fallback: return whatever is queued for the client, subscribing it on its first poll"""
+        return self.subscribe(client_id).drain(timeout)
+
+    def stream(self, client_id: Optional[str] = None) -> Iterator[str]:
+        """Yield server-sent events frames for one client until it disconnects
+
+        Serve with mimetype text/event-stream; a comment line goes out every
+        heartbeat_interval seconds so proxies keep idle connections open.
+        """
+        client = self.subscribe(client_id)
+        try:
+            yield "retry: 3000\n\n"
+            while not client.closed:
+                events = client.drain(self.heartbeat_interval)
+                if not events:
+                    yield ": heartbeat\n\n"
+                    continue
+                for event in events:
+                    yield format_sse(event)
+        finally:
+            # Keep the queue for a reconnect; _expire_idle drops it once the client stays away
+            client.last_seen = time.monotonic()
+
+def format_sse(event: Dict) -> str:
+    """Encode an event dict as a server-sent events frame"""
+    data = json.dumps(event, ensure_ascii=False)
+    return f"event: {event.get('type', 'message')}\ndata: {data}\n\n"
@@ -0,0 +1,176 @@
+import logging
+import random
+import threading
+import time
+from typing import Optional, Dict
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Responses that say the host is struggling rather than that the page is missing
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+class CircuitBreaker:
+    """Health of one upstream host
+
+    After `failure_threshold` consecutive failures the circuit opens and calls
+    are refused for a cooldown that doubles (with jitter) each time it reopens.
+    When the cooldown ends one probe request is let through; its outcome closes
+    or reopens the circuit. A probe that ends without an outcome (cancelled,
+    or an unexpected error) is released, and one that never reports back
+    lapses after `probe_timeout` so the host is not locked out.
+    """
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 15.0, max_cooldown: float = 300.0,
+                 probe_timeout: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.probe_timeout = probe_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.opened_until = 0.0
+        self.probing = False
+        self.probe_deadline = 0.0
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.state == CLOSED:
+                return True
+            now = time.monotonic()
+            if self.state == OPEN and now >= self.opened_until:
+                self.state = HALF_OPEN
+                self.probing = False
+            if self.state == HALF_OPEN and (not self.probing or now >= self.probe_deadline):
+                self.probing = True
+                self.probe_deadline = now + self.probe_timeout
+                return True
+            return False
+
+    def is_available(self) -> bool:
+        """Whether allow() could let a call through now, without claiming the half-open probe"""
+        with self.lock:
+            now = time.monotonic()
+            if self.state == OPEN:
+                return now >= self.opened_until
+            return self.state == CLOSED or not self.probing or now >= self.probe_deadline
+
+    def release_probe(self):
+        """Give up the half-open probe without an outcome, so the next call may probe"""
+        with self.lock:
+            if self.state == HALF_OPEN:
+                self.probing = False
+
+    def record_success(self):
+        with self.lock:
+            self.state = CLOSED
+            self.failures = 0
+            self.trips = 0
+            self.probing = False
+
+    def record_failure(self) -> bool:
+        """Count a failure, returning True if it opened the circuit"""
+        with self.lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                cooldown = min(self.max_cooldown, self.cooldown * 2 ** self.trips)
+                self.opened_until = time.monotonic() + random.uniform(cooldown / 2, cooldown)
+                self.state = OPEN
+                self.trips += 1
+                self.probing = False
+                return True
+            return False
+
+    def backoff(self, base: float = 0.5, cap: float = 8.0) -> float:
+        """Full-jitter delay before the next retry, growing with the host's consecutive failures"""
+        with self.lock:
+            failures = self.failures
+        return random.uniform(0, min(cap, base * 2 ** max(0, failures - 1)))
+
+class RetryBudget:
+    """Process-wide cap on retries as a fraction of requests
+
+    Every first attempt deposits `ratio` tokens and every retry spends one, so
+    during an outage retries add at most `ratio` extra load on top of the
+    requests themselves. `min_tokens` allows a few retries when traffic is low.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_tokens: float = 10.0, max_tokens: float = 100.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = min_tokens
+        self.lock = threading.Lock()
+
+    def deposit(self):
+        with self.lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self.lock:
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return True
+            return False
+
+class HostHealth:
+    """Circuit breakers per host plus the shared retry budget used by every fetch path"""
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 15.0, max_cooldown: float = 300.0,
+                 retry_budget: Optional[RetryBudget] = None):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.retry_budget = retry_budget or RetryBudget()
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.lock = threading.Lock()
+
+    def breaker_for(self, url: str) -> CircuitBreaker:
+        host = urlparse(url).hostname or ''
+        with self.lock:
+            breaker = self.breakers.get(host)
+            if breaker is None:
+                breaker = self.breakers[host] = CircuitBreaker(self.failure_threshold, self.cooldown,
+                                                               self.max_cooldown)
+            return breaker
+
+    def allow(self, url: str) -> bool:
+        """Whether a request to the URL's host may go out now"""
+        return self.breaker_for(url).allow()
+
+    def is_available(self, url: str) -> bool:
+        """Whether a request to the URL's host would be let through, for callers deciding whether to try"""
+        return self.breaker_for(url).is_available()
+
+    def release_probe(self, url: str):
+        """Called when an allowed request ends without record_success or record_failure"""
+        self.breaker_for(url).release_probe()
+
+    def record_success(self, url: str):
+        self.breaker_for(url).record_success()
+
+    def record_failure(self, url: str):
+        if self.breaker_for(url).record_failure():
+            logger.warning(f"Circuit opened for {urlparse(url).hostname} after repeated failures")
+
+    def start_request(self):
+        self.retry_budget.deposit()
+
+    def retry_delay(self, url: str) -> Optional[float]:
+        """Seconds to wait before retrying, or None if the host is down or the retry budget is spent"""
+        breaker = self.breaker_for(url)
+        if breaker.state != CLOSED or not self.retry_budget.try_spend():
+            return None
+        return breaker.backoff()
+
+    def open_hosts(self) -> int:
+        with self.lock:
+            return sum(1 for breaker in self.breakers.values() if breaker.state != CLOSED)
+
+# Shared by all sources and the async fetcher, so every path sees the same host state
+host_health = HostHealth()
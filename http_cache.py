@@ -0,0 +1,196 @@
+import logging
+import sqlite3
+import threading
+import time
+from typing import Optional, Dict, List, Mapping
+
+from chapter_store import parse_chapter_url
+
+logger = logging.getLogger(__name__)
+
+# Seconds a stored response is served without asking upstream; None never expires
+DEFAULT_MAX_AGES = {
+    'chapter': 300,   # until pinned: the latest chapter of a serial may still be revised
+    'index': 0,       # chapter lists grow, so they are revalidated on every load
+}
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_ENTRIES = 100000
+
+class CachedResponse:
+    __slots__ = ('url', 'body', 'content_type', 'etag', 'last_modified', 'validated_at', 'immutable')
+
+    def __init__(self, url: str, body: bytes, content_type: Optional[str], etag: Optional[str],
+                 last_modified: Optional[str], validated_at: float, immutable: bool):
+        self.url = url
+        self.body = body
+        self.content_type = content_type
+        self.etag = etag
+        self.last_modified = last_modified
+        self.validated_at = validated_at
+        self.immutable = immutable
+
+    @property
+    def has_body(self) -> bool:
+        """False for pinned chapter pages, whose body was dropped once the chapter was stored"""
+        return bool(self.body)
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        """Headers needed to decode the stored body"""
+        return {'content-type': self.content_type} if self.content_type else {}
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+class HttpCache:
+    """On-disk store of raw upstream responses and their validators
+
+    Fresh entries are served without a request; stale ones are revalidated with
+    a conditional GET so an unchanged page costs a 304 instead of its body.
+    Chapter pages known to be finished are pinned: their parsed chapter lives
+    in the chapter store, so only the validators are kept and the body is
+    dropped. Bodies are capped at `max_bytes` and rows at `max_entries`, with
+    the least recently used evicted first.
+    """
+
+    def __init__(self, path: str = 'http_cache.db', max_ages: Optional[Dict[str, Optional[float]]] = None,
+                 max_bytes: int = DEFAULT_MAX_BYTES, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_ages = dict(DEFAULT_MAX_AGES, **(max_ages or {}))
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        with self.lock:
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS responses (
+                    url TEXT PRIMARY KEY,
+                    body BLOB NOT NULL,
+                    content_type TEXT,
+                    etag TEXT,
+                    last_modified TEXT,
+                    validated_at REAL NOT NULL,
+                    immutable INTEGER NOT NULL DEFAULT 0,
+                    used_at REAL NOT NULL DEFAULT 0
+                )
+            ''')
+            self._migrate()
+            self.conn.execute('CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at)')
+            self.size, self.count = self.conn.execute(
+                'SELECT COALESCE(SUM(LENGTH(body)), 0), COUNT(*) FROM responses').fetchone()
+            self._evict()
+
+    def _migrate(self):
+        """Add LRU tracking to caches written before it, dropping bodies of pages already pinned"""
+        columns = [row['name'] for row in self.conn.execute('PRAGMA table_info(responses)').fetchall()]
+        if 'used_at' in columns:
+            return
+        self.conn.execute('ALTER TABLE responses ADD COLUMN used_at REAL NOT NULL DEFAULT 0')
+        self.conn.execute("UPDATE responses SET used_at = validated_at, body = CASE immutable WHEN 1 THEN X'' ELSE body END")
+        self.conn.execute('VACUUM')
+
+    def _evict(self):
+        """Drop least recently used rows until the cache is within its byte and row caps"""
+        if self.size <= self.max_bytes and self.count <= self.max_entries:
+            return
+        evicted = 0
+        rows = self.conn.execute('SELECT url, LENGTH(body) AS size FROM responses ORDER BY used_at').fetchall()
+        for row in rows:
+            if self.size <= self.max_bytes and self.count <= self.max_entries:
+                break
+            self.conn.execute('DELETE FROM responses WHERE url = ?', (row['url'],))
+            self.size -= row['size']
+            self.count -= 1
+            evicted += 1
+        logger.debug(f"Evicted {evicted} responses from the HTTP cache")
+
+    def _body_size(self, url: str) -> Optional[int]:
+        row = self.conn.execute('SELECT LENGTH(body) FROM responses WHERE url = ?', (url,)).fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    @staticmethod
+    def page_kind(url: str) -> str:
+        book_id, _ = parse_chapter_url(url)
+        return 'chapter' if book_id else 'index'
+
+    def is_fresh(self, entry: CachedResponse, now: Optional[float] = None) -> bool:
+        if entry.immutable:
+            return True
+        max_age = self.max_ages.get(self.page_kind(entry.url), 0)
+        if max_age is None:
+            return True
+        return (now if now is not None else time.time()) - entry.validated_at < max_age
+
+    def get(self, url: str) -> Optional[CachedResponse]:
+        with self.lock:
+            row = self.conn.execute('SELECT * FROM responses WHERE url = ?', (url,)).fetchone()
+            if not row:
+                return None
+            self.conn.execute('UPDATE responses SET used_at = ? WHERE url = ?', (time.time(), url))
+        return CachedResponse(row['url'], row['body'], row['content_type'], row['etag'],
+                              row['last_modified'], row['validated_at'], bool(row['immutable']))
+
+    def put(self, url: str, headers: Mapping[str, str], body: bytes):
+        """Store a 200 response, unless upstream forbids it"""
+        if 'no-store' in (headers.get('cache-control') or '').lower():
+            return
+        now = time.time()
+        with self.lock:
+            old_size = self._body_size(url)
+            self.conn.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, 0, ?)', (
+                url, body, headers.get('content-type'), headers.get('etag'),
+                headers.get('last-modified'), now, now
+            ))
+            self.size += len(body) - (old_size or 0)
+            self.count += old_size is None
+            self._evict()
+
+    def revalidated(self, url: str, headers: Mapping[str, str]):
+        """Record a 304: the stored body is current, validators may have been refreshed"""
+        with self.lock:
+            self.conn.execute('''
+                UPDATE responses SET validated_at = ?,
+                    etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified)
+                WHERE url = ?
+            ''', (time.time(), headers.get('etag'), headers.get('last-modified'), url))
+
+    def pin(self, url: str):
+        """Mark a chapter page as final once its parsed chapter is stored, keeping only its validators"""
+        with self.lock:
+            old_size = self._body_size(url)
+            if old_size is None:
+                return
+            self.conn.execute("UPDATE responses SET immutable = 1, body = X'' WHERE url = ?", (url,))
+            self.size -= old_size
+
+    def invalidate(self, url: str):
+        with self.lock:
+            old_size = self._body_size(url)
+            if old_size is None:
+                return
+            self.conn.execute('DELETE FROM responses WHERE url = ?', (url,))
+            self.size -= old_size
+            self.count -= 1
+
+    def urls(self, kind: Optional[str] = None) -> List[str]:
+        """URLs with a stored body, optionally only those of one page kind ('chapter' or 'index')"""
+        with self.lock:
+            rows = self.conn.execute("SELECT url FROM responses WHERE body != X'' ORDER BY url").fetchall()
+        return [row['url'] for row in rows if kind is None or self.page_kind(row['url']) == kind]
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
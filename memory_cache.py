@@ -0,0 +1,96 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict
+
+def estimate_size(chapter: Dict) -> int:
+    """Approximate memory held by a chapter dict, in bytes"""
+    size = sys.getsizeof(chapter)
+    for key, value in chapter.items():
+        size += sys.getsizeof(key) + sys.getsizeof(value)
+    return size
+
+class ChapterLRUCache:
+    """Size-bounded in-memory LRU of parsed chapter dicts with optional per-entry TTL"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, default_ttl: Optional[float] = None):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.lock = threading.Lock()
+
+    def _remove(self, url: str):
+        _, size, _ = self.entries.pop(url)
+        self.current_bytes -= size
+
+    def get(self, url: str, count: bool = True) -> Optional[Dict]:
+        """Cached chapter or None; `count=False` leaves the hit/miss counters alone for re-checks"""
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is None:
+                self.misses += count
+                return None
+            chapter, _, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(url)
+                self.expirations += 1
+                self.misses += count
+                return None
+            self.entries.move_to_end(url)
+            self.hits += count
+            return chapter
+
+    def put(self, url: str, chapter: Dict, ttl: Optional[float] = None):
+        """Cache a chapter; `ttl` seconds overrides the default expiry"""
+        size = estimate_size(chapter)
+        if size > self.max_bytes:
+            return
+        ttl = ttl if ttl is not None else self.default_ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self.lock:
+            if url in self.entries:
+                self._remove(url)
+            self.entries[url] = (chapter, size, expires_at)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                oldest = next(iter(self.entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, url: str):
+        with self.lock:
+            if url in self.entries:
+                self._remove(url)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.current_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, url: str) -> bool:
+        with self.lock:
+            entry = self.entries.get(url)
+            return entry is not None and (entry[2] is None or entry[2] > time.monotonic())
+
+    def stats(self) -> Dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,206 @@
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Optional, Callable, List, Dict, Tuple
+
+# Seconds; covers sub-millisecond regex work up to multi-second upstream fetches
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = ('{}="{}"'.format(k, v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+               for k, v in pairs)
+    return '{' + ','.join(escaped) + '}'
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        # label key -> [bucket counts..., sum, count]
+        self.series: Dict[LabelKey, list] = {}
+
+    def observe(self, value: float, labels: LabelKey):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series.setdefault(labels, [0] * len(self.buckets) + [0.0, 0])
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for key, series in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_format_labels(key, ("le", repr(bound)))} {cumulative}')
+            lines.append(f'{self.name}_bucket{_format_labels(key, ("le", "+Inf"))} {series[-1]}')
+            lines.append(f'{self.name}_sum{_format_labels(key)} {series[-2]}')
+            lines.append(f'{self.name}_count{_format_labels(key)} {series[-1]}')
+        return lines
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self.series: Dict[LabelKey, float] = {}
+
+    def inc(self, value: float, labels: LabelKey):
+        self.series[labels] = self.series.get(labels, 0) + value
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        for key, value in sorted(self.series.items()):
+            lines.append(f'{self.name}{_format_labels(key)} {value}')
+        return lines
+
+class RequestProfile:
+    """Stage timings collected for one request by `MetricsRegistry.profile_request`"""
+
+    def __init__(self):
+        self.spans: List[Tuple[str, Dict[str, str], float]] = []
+
+    def totals(self) -> Dict[str, float]:
+        totals: Dict[str, float] = {}
+        for stage, _, seconds in self.spans:
+            totals[stage] = totals.get(stage, 0.0) + seconds
+        return totals
+
+class _Span:
+    __slots__ = ('registry', 'stage', 'labels', 'start')
+
+    def __init__(self, registry: 'MetricsRegistry', stage: str, labels: Dict[str, str]):
+        self.registry = registry
+        self.stage = stage
+        self.labels = labels
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.record_span(self.stage, time.perf_counter() - self.start, self.labels)
+        return False
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_SPAN = _NullSpan()
+
+class MetricsRegistry:
+    """Hot-path timing spans and counters, rendered in the Prometheus text format
+
+    When disabled, `span` returns a shared no-op context manager and counters
+    return immediately, so instrumented code pays one attribute check.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.stage_seconds = Histogram('quickreader_stage_seconds', 'Time spent per pipeline stage')
+        self.counters: Dict[str, Counter] = {}
+        self.profile_hook: Optional[Callable[[str, float, Dict[str, str]], None]] = None
+        self._local = threading.local()
+
+    def span(self, stage: str, **labels):
+        """Time a block of code as one pipeline stage"""
+        if not self.enabled and getattr(self._local, 'profile', None) is None:
+            return NULL_SPAN
+        return _Span(self, stage, labels)
+
+    def timed(self, stage: str):
+        """Decorator timing a method as a stage, labelled with the instance's class"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(instance, *args, **kwargs):
+                with self.span(stage, source=type(instance).__name__):
+                    return func(instance, *args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record_span(self, stage: str, seconds: float, labels: Dict[str, str]):
+        if self.enabled:
+            key = _label_key(dict(labels, stage=stage))
+            with self.lock:
+                self.stage_seconds.observe(seconds, key)
+        profile = getattr(self._local, 'profile', None)
+        if profile is not None:
+            profile.spans.append((stage, labels, seconds))
+        if self.profile_hook:
+            self.profile_hook(stage, seconds, labels)
+
+    def inc(self, name: str, value: float = 1, help_text: str = '', **labels):
+        if not self.enabled:
+            return
+        with self.lock:
+            counter = self.counters.get(name)
+            if counter is None:
+                counter = self.counters[name] = Counter(name, help_text or name)
+            counter.inc(value, _label_key(labels))
+
+    def set_profile_hook(self, hook: Optional[Callable[[str, float, Dict[str, str]], None]]):
+        """Call `hook(stage, seconds, labels)` for every finished span, e.g. to log slow requests"""
+        self.profile_hook = hook
+
+    def profile_request(self) -> 'ProfileContext':
+        """Collect the spans of the current thread, even while metrics are disabled
+
+            with metrics.profile_request() as profile:
+                source.extract_chapter_content(url)
+            print(profile.totals())
+        """
+        return ProfileContext(self)
+
+    def render_prometheus(self, gauges: Optional[Dict[str, float]] = None) -> str:
+        """Render all metrics, plus point-in-time `gauges` supplied by the caller"""
+        with self.lock:
+            lines = self.stage_seconds.render()
+            for name in sorted(self.counters):
+                lines.extend(self.counters[name].render())
+        for name, value in sorted((gauges or {}).items()):
+            lines.extend([f'# TYPE {name} gauge', f'{name} {value}'])
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self.lock:
+            self.stage_seconds.series.clear()
+            self.counters.clear()
+
+class ProfileContext:
+    def __init__(self, registry: MetricsRegistry):
+        self.registry = registry
+        self.profile = RequestProfile()
+        self.previous = None
+
+    def __enter__(self) -> RequestProfile:
+        self.previous = getattr(self.registry._local, 'profile', None)
+        self.registry._local.profile = self.profile
+        return self.profile
+
+    def __exit__(self, *exc):
+        self.registry._local.profile = self.previous
+        return False
+
+# Process-wide registry; set QUICKREADER_METRICS=0 to disable collection
+metrics = MetricsRegistry(enabled=os.environ.get('QUICKREADER_METRICS', '1') != '0')
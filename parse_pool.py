@@ -0,0 +1,93 @@
+import logging
+import multiprocessing
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Optional, Iterable, Dict, Tuple, Callable
+
+logger = logging.getLogger(__name__)
+
+# (source class name, raw body, Content-Type header) handed from the fetch stage to the parse stage
+FetchedPage = Tuple[str, bytes, Optional[str]]
+
+# Per-process state of parse workers
+_worker_sources: Dict[str, object] = {}
+_worker_selector_plans: Dict[str, Dict] = {}
+
+def _init_worker(selector_plans: Optional[Dict[str, Dict]]):
+    _worker_selector_plans.update(selector_plans or {})
+
+def parse_page(source_name: str, url: str, body: bytes, content_type: Optional[str]) -> Optional[Dict]:
+    """Decode and parse one chapter page; runs in a worker process"""
+    source = _worker_sources.get(source_name)
+    if source is None:
+        import sources
+        source = _worker_sources[source_name] = getattr(sources, source_name)()
+        source.selector_plans = _worker_selector_plans
+    headers = {'content-type': content_type} if content_type else {}
+    html_content = source.encoding_resolver.decode(url, headers, body)
+    return source.parse_chapter(url, html_content)
+
+class ParsePipeline:
+    """Fetch pages on I/O threads and parse them in worker processes
+
+    Fetched pages wait in a bounded queue, so fetch threads block once parsing
+    falls behind instead of buffering a whole book in memory. Results are
+    delivered to `on_result` on the calling thread.
+    """
+
+    def __init__(self, parse_workers: Optional[int] = None, fetch_workers: int = 8, queue_size: int = 32,
+                 selector_plans: Optional[Dict[str, Dict]] = None):
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+        self.fetch_workers = fetch_workers
+        self.queue_size = queue_size
+        self.selector_plans = selector_plans
+
+    def run(self, urls: Iterable[str], fetch: Callable[[str], Optional[FetchedPage]],
+            on_result: Callable[[str, Optional[Dict]], None]):
+        urls = list(urls)
+        pages: 'queue.Queue[Tuple[str, Optional[FetchedPage]]]' = queue.Queue(maxsize=self.queue_size)
+
+        def fetch_one(url: str):
+            try:
+                page = fetch(url)
+            except Exception as e:
+                logger.error(f"Error fetching {url}: {str(e)}")
+                page = None
+            pages.put((url, page))
+
+        # Spawned workers do not inherit the parent's threads, locks or sqlite handles
+        context = multiprocessing.get_context('spawn')
+        with ThreadPoolExecutor(max_workers=self.fetch_workers) as fetchers, \
+                ProcessPoolExecutor(max_workers=self.parse_workers, mp_context=context,
+                                    initializer=_init_worker, initargs=(self.selector_plans,)) as parsers:
+            for url in urls:
+                fetchers.submit(fetch_one, url)
+
+            remaining = len(urls)
+            in_flight = {}
+            while remaining:
+                # Keep every worker busy without moving the whole queue into the pool
+                while remaining > len(in_flight) and len(in_flight) < self.parse_workers * 2:
+                    try:
+                        url, page = pages.get(timeout=0.01 if in_flight else 0.1)
+                    except queue.Empty:
+                        break
+                    if page is None:
+                        remaining -= 1
+                        on_result(url, None)
+                        continue
+                    in_flight[parsers.submit(parse_page, page[0], url, page[1], page[2])] = url
+                if not in_flight:
+                    continue
+
+                done, _ = wait(in_flight, timeout=0.05, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url = in_flight.pop(future)
+                    remaining -= 1
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logger.error(f"Error parsing {url}: {str(e)}")
+                        result = None
+                    on_result(url, result)
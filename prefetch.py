@@ -0,0 +1,104 @@
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Optional, Dict
+
+logger = logging.getLogger(__name__)
+
+class ReadAheadScheduler:
+    """Prefetch the chapters following the one a reader just opened
+
+    Each reader has a generation; opening another chapter replaces it so
+    prefetches for the previous position stop at their next step. A reader's
+    entries are removed once its read-ahead finishes, so per-tab reader ids
+    do not accumulate.
+    """
+
+    def __init__(self, source_manager, depth: int = 2, max_workers: int = 2,
+                 budget_reserve: float = 1.0, budget_wait: float = 0.25, max_budget_wait: float = 30.0):
+        self.source_manager = source_manager
+        self.depth = depth
+        # Tokens left in the host bucket for interactive requests
+        self.budget_reserve = budget_reserve
+        self.budget_wait = budget_wait
+        self.max_budget_wait = max_budget_wait
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='read-ahead')
+        # Generations come from one counter, so a reader whose entries were removed never reuses one
+        self.generation_ids = itertools.count(1)
+        self.generations: Dict[str, int] = {}
+        self.pending: Dict[str, Future] = {}
+        self.prefetched = 0
+        # Reentrant: cancelling a future runs its done callback on the cancelling thread
+        self.lock = threading.RLock()
+
+    def schedule(self, chapter: Dict, reader_id: str = 'default') -> Optional[Future]:
+        """Start prefetching after `chapter`, cancelling this reader's older read-ahead"""
+        if self.depth <= 0 or not chapter.get('next_url'):
+            return None
+        with self.lock:
+            generation = next(self.generation_ids)
+            self.generations[reader_id] = generation
+            previous = self.pending.pop(reader_id, None)
+            if previous:
+                previous.cancel()
+            future = self.executor.submit(self._read_ahead, reader_id, generation, chapter['next_url'])
+            self.pending[reader_id] = future
+            future.add_done_callback(lambda done: self._finished(reader_id, done))
+        return future
+
+    def _finished(self, reader_id: str, future: Future):
+        """Forget a reader once its latest read-ahead is over"""
+        with self.lock:
+            if self.pending.get(reader_id) is future:
+                del self.pending[reader_id]
+                del self.generations[reader_id]
+
+    def cancel(self, reader_id: str = 'default'):
+        with self.lock:
+            self.generations.pop(reader_id, None)
+            previous = self.pending.pop(reader_id, None)
+            if previous:
+                previous.cancel()
+
+    def _is_stale(self, reader_id: str, generation: int) -> bool:
+        return self.generations.get(reader_id) != generation
+
+    def _wait_for_budget(self, url: str, reader_id: str, generation: int) -> bool:
+        """Wait until the host bucket has spare capacity; give up when stale"""
+        limiter = self.source_manager.rate_limiter
+        deadline = time.monotonic() + self.max_budget_wait
+        while not limiter.try_acquire(url, reserve=self.budget_reserve):
+            if self._is_stale(reader_id, generation) or time.monotonic() > deadline:
+                return False
+            time.sleep(self.budget_wait)
+        return True
+
+    def _read_ahead(self, reader_id: str, generation: int, url: Optional[str]):
+        manager = self.source_manager
+        for _ in range(self.depth):
+            if not url or self._is_stale(reader_id, generation):
+                return
+            chapter = manager.get_cached_chapter(url)
+            if not chapter:
+                if not self._wait_for_budget(url, reader_id, generation):
+                    return
+                try:
+                    chapter = manager.fetch_chapter(url)
+                except Exception as e:
+                    logger.warning(f"Read-ahead failed for {url}: {str(e)}")
+                    return
+                if not chapter:
+                    return
+                with self.lock:
+                    self.prefetched += 1
+                logger.debug(f"Prefetched {url}")
+            url = chapter.get('next_url')
+
+    def shutdown(self):
+        with self.lock:
+            # Running read-ahead sees its generation gone and stops
+            self.generations.clear()
+            self.pending.clear()
+        self.executor.shutdown(wait=False, cancel_futures=True)
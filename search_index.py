@@ -0,0 +1,318 @@
+import math
+import sqlite3
+import zlib
+from typing import Optional, List, Dict, Tuple, Sequence, Set
+
+# Characters of context kept on each side of the first hit in a snippet
+SNIPPET_CONTEXT = 40
+
+# BM25 parameters, applied with the whole query phrase as the term
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Pairs with the last character of a run of letters; never alphanumeric itself
+RUN_END = ' '
+
+def tokenize(text: str) -> List[Tuple[str, int]]:
+    """Overlapping character bigrams with their offsets in `text`
+
+    Bigrams never span punctuation or whitespace, which suits Chinese text
+    where words are not delimited. Latin letters are lowercased. The last
+    character of each run is paired with RUN_END, so every character starts
+    exactly one token and one-character queries can use prefix lookups.
+    """
+    tokens = []
+    previous = None
+    for position, char in enumerate(text):
+        if not char.isalnum():
+            if previous is not None:
+                tokens.append((previous + RUN_END, position - 1))
+            previous = None
+            continue
+        char = char.lower()
+        if previous is not None:
+            tokens.append((previous + char, position - 1))
+        previous = char
+    if previous is not None:
+        tokens.append((previous + RUN_END, len(text) - 1))
+    return tokens
+
+def query_segments(query: str) -> List[str]:
+    """Split a query into phrases on punctuation and whitespace"""
+    segments = []
+    current = []
+    for char in query:
+        if char.isalnum():
+            current.append(char.lower())
+        elif current:
+            segments.append(''.join(current))
+            current = []
+    if current:
+        segments.append(''.join(current))
+    return segments
+
+# Postings of one bigram for this many consecutive doc ids share a row. Chapters
+# of a book are mostly indexed together, so a book costs about one row per
+# bigram per block instead of one row per bigram per chapter.
+BLOCK_SIZE = 64
+
+def _append_varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def encode_postings(out: bytearray, doc_offset: int, positions: List[int]):
+    """Append one chapter's entry: its offset in the block, the count, then the positions as deltas"""
+    _append_varint(out, doc_offset)
+    _append_varint(out, len(positions))
+    previous = 0
+    for position in positions:
+        _append_varint(out, position - previous)
+        previous = position
+
+def decode_postings(blob: bytes, base: int, live: Set[int], result: Dict[int, List[int]]):
+    """Add the positions of every live chapter in a postings row to `result`"""
+    index, end = 0, len(blob)
+    while index < end:
+        values = []
+        # Offset and count, then `count` position deltas
+        while len(values) < 2 or len(values) < 2 + values[1]:
+            value = shift = 0
+            while True:
+                byte = blob[index]
+                index += 1
+                value |= (byte & 0x7f) << shift
+                if byte < 0x80:
+                    break
+                shift += 7
+            values.append(value)
+        doc_id = base + values[0]
+        if doc_id in live:
+            positions = result.setdefault(doc_id, [])
+            position = 0
+            for delta in values[2:]:
+                position += delta
+                positions.append(position)
+
+class SearchIndex:
+    """Positional bigram inverted index over chapter content, in a database attached to the chapter store
+
+    Postings map a bigram to the chapters containing it and the character
+    offsets where it occurs, so phrase queries are answered by intersecting
+    offset lists instead of scanning chapter text. Offsets are delta and
+    varint encoded, and rows cover BLOCK_SIZE chapters each. Doc ids are
+    never reused: removing a chapter only deletes its search_docs row, and
+    its postings are ignored until the index is rebuilt.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, schema: str = 'main'):
+        """Use the index tables in the attached database `schema`, creating them if needed"""
+        self.conn = conn
+        self.conn.executescript(f'''
+            CREATE TABLE IF NOT EXISTS {schema}.search_docs (
+                doc_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT UNIQUE NOT NULL,
+                host TEXT,
+                book_id TEXT,
+                chapter_id TEXT,
+                length INTEGER NOT NULL,
+                checksum INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS {schema}.idx_search_docs_book ON search_docs (host, book_id);
+            CREATE TABLE IF NOT EXISTS {schema}.search_postings (
+                bigram TEXT NOT NULL,
+                block INTEGER NOT NULL,
+                postings BLOB NOT NULL,
+                PRIMARY KEY (bigram, block)
+            ) WITHOUT ROWID;
+        ''')
+
+    def is_empty(self) -> bool:
+        return self.conn.execute('SELECT 1 FROM search_docs LIMIT 1').fetchone() is None
+
+    def clear(self):
+        self.conn.execute('DELETE FROM search_postings')
+        self.conn.execute('DELETE FROM search_docs')
+
+    def remove(self, url: str):
+        self.conn.execute('DELETE FROM search_docs WHERE url = ?', (url,))
+
+    def add_many(self, documents: List[Tuple[str, Optional[str], Optional[str], Optional[str], str]]) -> int:
+        """(Re)index (url, host, book_id, chapter_id, content) documents, returning how many changed
+
+        Chapters whose content is already indexed are skipped. The caller
+        holds the store lock and transaction.
+        """
+        rows: Dict[Tuple[str, int], bytearray] = {}
+        first_doc_id = None
+        changed = 0
+        for url, host, book_id, chapter_id, content in documents:
+            checksum = zlib.crc32(content.encode('utf-8'))
+            row = self.conn.execute('SELECT length, checksum FROM search_docs WHERE url = ?', (url,)).fetchone()
+            if row is not None and tuple(row) == (len(content), checksum):
+                continue
+            self.remove(url)
+            doc_id = self.conn.execute(
+                'INSERT INTO search_docs (url, host, book_id, chapter_id, length, checksum) VALUES (?, ?, ?, ?, ?, ?)',
+                (url, host, book_id, chapter_id, len(content), checksum)).lastrowid
+            if first_doc_id is None:
+                first_doc_id = doc_id
+            changed += 1
+            block, doc_offset = divmod(doc_id, BLOCK_SIZE)
+
+            postings: Dict[str, List[int]] = {}
+            for bigram, position in tokenize(content):
+                positions = postings.get(bigram)
+                if positions is None:
+                    positions = postings[bigram] = []
+                positions.append(position)
+            for bigram, positions in postings.items():
+                key = (bigram, block)
+                out = rows.get(key)
+                if out is None:
+                    out = rows[key] = bytearray()
+                encode_postings(out, doc_offset, positions)
+        if first_doc_id is None:
+            return 0
+
+        # Doc ids only grow, so only the block the batch started in can already have rows
+        shared_block = first_doc_id // BLOCK_SIZE
+        for (bigram, block), out in rows.items():
+            if block == shared_block:
+                row = self.conn.execute('SELECT postings FROM search_postings WHERE bigram = ? AND block = ?',
+                                        (bigram, block)).fetchone()
+                if row is not None:
+                    out[:0] = row[0]
+        self.conn.executemany('INSERT OR REPLACE INTO search_postings VALUES (?, ?, ?)',
+                              [(bigram, block, bytes(out)) for (bigram, block), out in rows.items()])
+        return changed
+
+    def _live_docs(self, where: str, params: list) -> Set[int]:
+        return set(row[0] for row in self.conn.execute(f'SELECT doc_id FROM search_docs WHERE {where}', params))
+
+    def _postings(self, bigram: str, live: Set[int]) -> Dict[int, List[int]]:
+        result: Dict[int, List[int]] = {}
+        for block, blob in self.conn.execute('SELECT block, postings FROM search_postings WHERE bigram = ?',
+                                             (bigram,)).fetchall():
+            decode_postings(blob, block * BLOCK_SIZE, live, result)
+        return result
+
+    def _prefix_postings(self, char: str, live: Set[int]) -> Dict[int, List[int]]:
+        """Postings of every bigram starting with `char`, for one-character queries"""
+        result: Dict[int, List[int]] = {}
+        for block, blob in self.conn.execute(
+                'SELECT block, postings FROM search_postings WHERE bigram >= ? AND bigram < ?',
+                (char, char + '\U0010ffff')).fetchall():
+            decode_postings(blob, block * BLOCK_SIZE, live, result)
+        return result
+
+    def _phrase_matches(self, phrase: str, live: Set[int]) -> Dict[int, Sequence[int]]:
+        """Start offsets of `phrase` per live chapter"""
+        if len(phrase) == 1:
+            return self._prefix_postings(phrase, live)
+
+        bigrams = [phrase[i:i + 2] for i in range(len(phrase) - 1)]
+        unique = list(dict.fromkeys(bigrams))
+        postings = {bigram: self._postings(bigram, live) for bigram in unique}
+        # Intersect from the rarest bigram so the candidate set shrinks fastest
+        unique.sort(key=lambda bigram: len(postings[bigram]))
+        doc_ids = set(postings[unique[0]])
+        for bigram in unique[1:]:
+            doc_ids.intersection_update(postings[bigram])
+
+        if len(bigrams) == 1:
+            return postings[bigrams[0]]
+
+        matches = {}
+        for doc_id in doc_ids:
+            starts = set(postings[bigrams[0]][doc_id])
+            for offset, bigram in enumerate(bigrams[1:], 1):
+                starts.intersection_update([p - offset for p in postings[bigram][doc_id]])
+                if not starts:
+                    break
+            if starts:
+                matches[doc_id] = sorted(starts)
+        return matches
+
+    def search(self, query: str, host: Optional[str] = None, book_id: Optional[str] = None,
+               limit: int = 20, order: str = 'rank') -> List[Dict]:
+        """Chapters containing every phrase of `query`
+
+        Hits are ranked by BM25 (`order='rank'`) or listed in chapter order
+        (`order='chapter'`, e.g. to find the first mention). Each hit carries
+        the url, score, match count and the (start, end) offsets of the matches.
+        """
+        segments = query_segments(query)
+        if not segments:
+            return []
+
+        conditions, params = [], []
+        if host:
+            conditions.append('host = ?')
+            params.append(host)
+        if book_id:
+            conditions.append('book_id = ?')
+            params.append(book_id)
+        where = ' AND '.join(conditions) or '1'
+
+        total_docs, average_length = self.conn.execute(
+            f'SELECT COUNT(*), AVG(length) FROM search_docs WHERE {where}', params).fetchone()
+        if not total_docs:
+            return []
+        live = self._live_docs(where, params)
+
+        segment_matches = []
+        for segment in segments:
+            matches = self._phrase_matches(segment, live)
+            if not matches:
+                return []
+            segment_matches.append((segment, matches))
+        doc_ids = set.intersection(*(set(matches) for _, matches in segment_matches))
+        if not doc_ids:
+            return []
+
+        placeholders = ','.join('?' * len(doc_ids))
+        docs = {row['doc_id']: row for row in self.conn.execute(
+            f'SELECT doc_id, url, book_id, chapter_id, length FROM search_docs WHERE doc_id IN ({placeholders})',
+            list(doc_ids)).fetchall()}
+
+        scores: Dict[int, float] = dict.fromkeys(doc_ids, 0.0)
+        for segment, matches in segment_matches:
+            idf = math.log(1 + (total_docs - len(matches) + 0.5) / (len(matches) + 0.5))
+            for doc_id in doc_ids:
+                frequency = len(matches[doc_id])
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * docs[doc_id]['length'] / average_length)
+                scores[doc_id] += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+
+        if order == 'chapter':
+            ranked = sorted(doc_ids, key=lambda doc_id: (docs[doc_id]['book_id'] or '',
+                                                         int(docs[doc_id]['chapter_id'] or 0)))
+        else:
+            ranked = sorted(doc_ids, key=lambda doc_id: -scores[doc_id])
+
+        results = []
+        for doc_id in ranked[:limit]:
+            spans = sorted((start, start + len(segment))
+                           for segment, matches in segment_matches for start in matches[doc_id])
+            results.append({
+                'url': docs[doc_id]['url'],
+                'score': round(scores[doc_id], 4),
+                'matches': len(spans),
+                'spans': spans
+            })
+        return results
+
+def make_snippet(content: str, spans: List[Tuple[int, int]], context: int = SNIPPET_CONTEXT) -> Dict:
+    """Text around the first match, with the offsets of the matches shown in it"""
+    if not spans:
+        return {'text': content[:2 * context], 'highlights': []}
+    start = max(0, spans[0][0] - context)
+    end = min(len(content), spans[0][1] + context)
+    prefix = '…' if start else ''
+    suffix = '…' if end < len(content) else ''
+    shift = len(prefix) - start
+    return {
+        'text': prefix + content[start:end].replace('\n', ' ') + suffix,
+        'highlights': [(s + shift, e + shift) for s, e in spans if s >= start and e <= end]
+    }
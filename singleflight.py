@@ -0,0 +1,62 @@
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+class FlightTimeout(TimeoutError):
+    """A waiter gave up on a call that another thread is still running"""
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one execution
+
+    The first caller for a key runs the function; callers arriving while it
+    runs wait for and share its result, or get its exception re-raised. Once
+    the call finishes the key is forgotten, so later calls run again.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls: Dict[Hashable, _Call] = {}
+        self.shared = 0
+        # Called with the key whenever a caller joins a call in flight
+        self.on_shared: Optional[Callable[[Hashable], None]] = None
+
+    def do(self, key: Hashable, func: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """Run `func` for `key`, or wait up to `timeout` seconds for the call already in flight"""
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+            else:
+                self.shared += 1
+
+        if not leader:
+            if self.on_shared:
+                self.on_shared(key)
+            if not call.done.wait(timeout):
+                raise FlightTimeout(f"Timed out after {timeout}s waiting for in-flight call {key!r}")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self, key: Hashable) -> bool:
+        with self.lock:
+            return key in self.calls
@@ -1,19 +1,77 @@
 from abc import ABC, abstractmethod
-from typing import Optional, Tuple, List, Dict
-import requests
-from bs4 import BeautifulSoup
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from typing import TYPE_CHECKING, Optional, Tuple, List, Dict, Mapping, Type
 import re
+import html
 import json
 import logging
+import threading
 import time
 from urllib.parse import urljoin, urlparse
+from chapter_index import ChapterIndex
+from chapter_store import ChapterStore, parse_chapter_url
+from memory_cache import ChapterLRUCache
+from metrics import metrics
+from prefetch import ReadAheadScheduler
+from encoding import EncodingResolver
+from host_health import RETRYABLE_STATUS_CODES, host_health
+from http_cache import CachedResponse, HttpCache
+from downloader import BookDownloader, DownloadProgress, HostRateLimiter
+from parse_pool import ParsePipeline
+from singleflight import FlightTimeout, SingleFlight
+from update_scheduler import UpdateScheduler
+from text_normalize import clean_chapter_text
+
+if TYPE_CHECKING:
+    # requests, the parsing libraries and the asyncio client are imported on first use to keep startup fast
+    import requests
+    from bs4 import BeautifulSoup
 
 logger = logging.getLogger(__name__)
 
+# Content "selector" standing for the largest-text-block fallback
+LARGEST_TEXT_BLOCK = {'type': 'largest_text_block'}
+
+# Links on a chapter list page, scanned without building a DOM for incremental refreshes
+CHAPTER_LINK_PATTERN = re.compile(r'<a\s[^>]*?href\s*=\s*["\']([^"\']+)["\'][^>]*>(.*?)</a>', re.IGNORECASE | re.DOTALL)
+TAG_PATTERN = re.compile(r'<[^>]+>')
+# Book id in book index URLs (/book/<id>.html, /book/<id>/index.html, /chapter/<id>.html)
+BOOK_URL_PATTERN = re.compile(r'/(?:book|chapter)/(\d+)')
+
+def drop_volume_headings(chapters: List[Dict]) -> List[Dict]:
+    """Drop entries whose URL is listed again right after them
+
+    Volume headings link to the chapter that opens the volume, whose own
+    entry follows; only that entry is kept, so stored lists and chapter
+    indexes count every chapter once.
+    """
+    return [chapter for chapter, following in zip(chapters, chapters[1:] + [None])
+            if following is None or following['url'] != chapter['url']]
+
 class NovelSource(ABC):
+    # How many times a page is fetched when parsing it yields no content
+    parse_attempts = 1
+    # Whether parse_chapter_list orders chapters by chapter id instead of page order
+    chapter_list_sorted = False
+    # Where the chapter list container closes, searched from the stored tail; None scans to the end of the page
+    chapter_list_end: Optional['re.Pattern'] = None
+    # Seconds to connect and to wait for data on every upstream request
+    request_timeout = (5, 10)
+    # Domains served by this source; their subdomains are served too
+    domains: Tuple[str, ...] = ()
+
     def __init__(self):
-        self.session = requests.Session()
-        self.setup_session()
+        self._session: Optional['requests.Session'] = None
+        self._session_lock = threading.Lock()
+        self.encoding_resolver = EncodingResolver()
+        self.host_health = host_health
+        # Optional on-disk HttpCache, attached by SourceManager
+        self.http_cache: Optional[HttpCache] = None
+        # Optional per-host limiter, attached by SourceManager; retried requests take a token from it
+        self.rate_limiter: Optional[HostRateLimiter] = None
         self.content_selectors = [
             {'type': 'id', 'value': 'content'},
             {'type': 'id', 'value': 'chapter-content'},
@@ -29,52 +87,162 @@ class NovelSource(ABC):
             {'type': 'text', 'value': '下一章'},
             {'type': 'text', 'value': '上一章'}
         ]
+        # Winning content selector per "host" and "host/book_id", shared with SourceManager
+        self.selector_plans: Dict[str, Dict] = {}
+        self.on_selector_plan_learned = None
+
+    @property
+    def session(self) -> 'requests.Session':
+        """HTTP session, created on first use"""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    import requests
+                    self._session = requests.Session()
+                    self.setup_session()
+        return self._session
+
+    def _selector_plan_keys(self, url: Optional[str]) -> List[str]:
+        """Keys under which the winning content selector is memoized, most specific first"""
+        if not url:
+            return []
+        host = urlparse(url).hostname or ''
+        book_id, _ = parse_chapter_url(url)
+        return [f'{host}/{book_id}', host] if book_id else [host]
+
+    def _selector_plan(self, plan_keys: List[str]) -> Optional[Dict]:
+        """The memoized selector for a page: its book's, else its host's unless that is the fallback"""
+        for key in plan_keys:
+            plan = self.selector_plans.get(key)
+            if plan and (key != plan_keys[-1] or plan != LARGEST_TEXT_BLOCK):
+                return plan
+        return None
+
+    def _learn_selector_plan(self, plan_keys: List[str], selector: Dict):
+        if selector == LARGEST_TEXT_BLOCK:
+            # A page without the site's layout says nothing about the host's other books
+            plan_keys = plan_keys[:-1]
+        for key in plan_keys:
+            if self.selector_plans.get(key) != selector:
+                self.selector_plans[key] = selector
+                if self.on_selector_plan_learned:
+                    self.on_selector_plan_learned(key, selector)
+
+    def _select_content(self, soup: 'BeautifulSoup', selector: Dict) -> Optional[str]:
+        """Apply one content selector, returning the element text if it matched"""
+        if selector['type'] == LARGEST_TEXT_BLOCK['type']:
+            return self._largest_text_block(soup, 200, ['上一章', '下一章', '目录'])
+
+        if selector['type'] == 'id':
+            element = soup.find('div', id=selector['value'])
+        elif selector['type'] == 'class':
+            element = soup.find('div', class_=selector['value'])
+        else:
+            return None
+
+        if not element:
+            return None
+
+        # Remove unwanted elements
+        for unwanted in element.find_all(['script', 'style', 'a', 'div', 'span']):
+            if unwanted.get_text(strip=True) in ['上一章', '下一章', '目录']:
+                unwanted.decompose()
 
-    def _extract_content(self, soup: BeautifulSoup) -> Optional[str]:
-        """Extract content using multiple selectors with fallbacks"""
+        # Get text content
+        return element.get_text(strip=True)
+
+    def _largest_text_block(self, soup: 'BeautifulSoup', min_length: int, skip_words: List[str]) -> Optional[str]:
+        """Find the longest div/p text without navigation words
+
+        Text lengths are summed from children to parents in one pass, so only
+        the longest candidates ever have their text built. A tag whose whole
+        text comes from one child shares that child's text, which keeps deeply
+        nested wrappers from being rendered once per level.
+        """
+        from bs4 import CData, NavigableString, Tag
+
+        lengths: Dict[int, int] = {}
+        longest_child: Dict[int, tuple] = {}
+        candidates = []
+
+        # Reversed document order visits every child before its parent
+        for node in reversed(list(soup.descendants)):
+            parent = node.parent
+            if isinstance(node, Tag):
+                length = lengths.pop(id(node), 0)
+                child_length, text_node = longest_child.pop(id(node), (0, None))
+                if child_length != length or text_node is None:
+                    text_node = node
+                if node.name in ('div', 'p') and length > min_length:
+                    candidates.append((length, text_node))
+                if parent is not None and length >= longest_child.get(id(parent), (0, None))[0]:
+                    longest_child[id(parent)] = (length, text_node)
+            elif type(node) in (NavigableString, CData):
+                length = len(node.strip())
+            else:
+                continue
+            if length and parent is not None:
+                lengths[id(parent)] = lengths.get(id(parent), 0) + length
+
+        # Same choice as sorting (length, text) in reverse, checking skip words longest first
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        for _, group in groupby(candidates, key=lambda candidate: candidate[0]):
+            text_nodes = {id(node): node for _, node in group}
+            texts = [node.get_text(strip=True) for node in text_nodes.values()]
+            texts = [text for text in texts if not any(skip in text for skip in skip_words)]
+            if texts:
+                return max(texts)
+        return None
+
+    @metrics.timed('extract')
+    def _extract_content(self, soup: 'BeautifulSoup', url: Optional[str] = None) -> Optional[str]:
+        """Extract content using multiple selectors with fallbacks
+
+        The selector that worked last time for the page's book (or host) is
+        tried first, so pages with a known layout skip the search. The
+        largest-text-block fallback is only remembered for the book.
+        """
         content = None
-        
+        plan_keys = self._selector_plan_keys(url)
+        plan = self._selector_plan(plan_keys)
+
+        if plan:
+            try:
+                content = self._select_content(soup, plan)
+                if content and len(content) > 100:
+                    self._learn_selector_plan(plan_keys, plan)
+                    return content
+            except Exception as e:
+                logger.warning(f"Error with learned selector {plan}: {str(e)}")
+
         # Try each content selector in order
         for selector in self.content_selectors:
+            if selector == plan:
+                continue
             try:
-                if selector['type'] == 'id':
-                    element = soup.find('div', id=selector['value'])
-                elif selector['type'] == 'class':
-                    element = soup.find('div', class_=selector['value'])
-                
-                if element:
-                    # Remove unwanted elements
-                    for unwanted in element.find_all(['script', 'style', 'a', 'div', 'span']):
-                        if unwanted.get_text(strip=True) in ['上一章', '下一章', '目录']:
-                            unwanted.decompose()
-                    
-                    # Get text content
-                    content = element.get_text(strip=True)
-                    if content and len(content) > 100:  # Minimum content length check
-                        logger.info(f"Found content using selector: {selector}")
-                        return content
+                content = self._select_content(soup, selector)
+                if content and len(content) > 100:  # Minimum content length check
+                    logger.info(f"Found content using selector: {selector}")
+                    self._learn_selector_plan(plan_keys, selector)
+                    return content
             except Exception as e:
                 logger.warning(f"Error with selector {selector}: {str(e)}")
-        
+
         # Fallback: Try to find the largest text block
-        if not content:
+        if not content and plan != LARGEST_TEXT_BLOCK:
             try:
-                text_blocks = []
-                for tag in soup.find_all(['div', 'p']):
-                    text = tag.get_text(strip=True)
-                    if len(text) > 200 and not any(skip in text for skip in ['上一章', '下一章', '目录']):
-                        text_blocks.append((len(text), text))
-                
-                if text_blocks:
-                    text_blocks.sort(reverse=True)
+                content = self._select_content(soup, LARGEST_TEXT_BLOCK)
+                if content:
                     logger.info("Found content using largest text block method")
-                    return text_blocks[0][1]
+                    self._learn_selector_plan(plan_keys, LARGEST_TEXT_BLOCK)
+                    return content
             except Exception as e:
                 logger.warning(f"Error in fallback content extraction: {str(e)}")
-        
+
         return None
 
-    def _extract_navigation(self, soup: BeautifulSoup, base_url: str) -> Dict[str, Optional[str]]:
+    @metrics.timed('extract')
+    def _extract_navigation(self, soup: 'BeautifulSoup', base_url: str) -> Dict[str, Optional[str]]:
         """Extract navigation links using multiple selectors"""
         nav = {'prev_url': None, 'next_url': None, 'chapter_list_url': None}
         
@@ -103,182 +271,398 @@ class NovelSource(ABC):
         
         return nav
 
+    @metrics.timed('clean')
     def _clean_content(self, content: str) -> str:
         """Clean and format the extracted content"""
-        if not content:
-            return ""
-        
-        # Basic HTML cleanup
-        content = content.replace('&nbsp;', ' ')
-        content = re.sub(r'<br\s*/?>', '\n', content)
-        content = re.sub(r'<[^>]+>', '', content)
-        
-        # Split into paragraphs
-        paragraphs = []
-        
-        # Try different splitting methods
-        split_methods = [
-            lambda x: x.split('\n\n'),  # Double newlines
-            lambda x: x.split('\n'),    # Single newlines
-            lambda x: re.split(r'([。！？…]+)', x)  # Chinese punctuation
-        ]
-        
-        for split_method in split_methods:
-            parts = split_method(content)
-            if isinstance(parts, list) and len(parts) > 1:
-                # For Chinese punctuation split, rejoin with punctuation
-                if split_method == split_methods[-1]:
-                    parts = [''.join(parts[i:i+2]) for i in range(0, len(parts)-1, 2)]
-                
-                # Process each part
-                for p in parts:
-                    p = p.strip()
-                    if p and len(p) > 10:  # Only keep meaningful paragraphs
-                        p = re.sub(r'\s+', ' ', p)  # Normalize whitespace
-                        if not any(skip in p for skip in ['上一章', '下一章', '目录']):
-                            paragraphs.append(p)
-                
-                if paragraphs:
-                    break
-        
-        return '\n\n'.join(paragraphs) if paragraphs else content.strip()
+        return clean_chapter_text(content)
 
-    def _get_page_content(self, url: str, retry_count: int = 3) -> Optional[str]:
-        """Get page content with retry mechanism and detailed logging"""
+    def _serve_stale(self, url: str, host: str, cached) -> Optional[Tuple[bytes, Mapping[str, str]]]:
+        if cached is None:
+            return None
+        logger.warning(f"Serving stale copy of {url}")
+        metrics.inc('quickreader_http_cache_total', help_text="HTTP cache outcomes", host=host, result='stale')
+        return cached.body, cached.headers
+
+    def _cache_lookup(self, url: str, host: str) -> Tuple[Optional[CachedResponse], bool]:
+        """The HTTP cache entry a fetch can use, and whether it is fresh enough to serve without a request"""
+        cached = self.http_cache.get(url) if self.http_cache is not None else None
+        if cached and not cached.has_body:
+            # Pinned page whose chapter is in the store: a 304 would leave nothing to parse
+            cached = None
+        if cached and self.http_cache.is_fresh(cached):
+            metrics.inc('quickreader_http_cache_total', help_text="HTTP cache outcomes", host=host, result='fresh')
+            return cached, True
+        return cached, False
+
+    def _cache_response(self, url: str, host: str, status: int, headers: Mapping[str, str], body: bytes,
+                        cached: Optional[CachedResponse]) -> Tuple[bytes, Mapping[str, str]]:
+        """Record a 200, or a 304 answering `cached`, in the HTTP cache and return the page it stands for"""
+        if status == 304:
+            self.http_cache.revalidated(url, headers)
+            metrics.inc('quickreader_http_cache_total', help_text="HTTP cache outcomes",
+                        host=host, result='revalidated')
+            return cached.body, cached.headers
+        if self.http_cache is not None:
+            self.http_cache.put(url, headers, body)
+            metrics.inc('quickreader_http_cache_total', help_text="HTTP cache outcomes",
+                        host=host, result='changed' if cached else 'miss')
+        return body, headers
+
+    def _fetch_page(self, url: str, retry_count: int = 3) -> Optional[Tuple[bytes, Mapping[str, str]]]:
+        """Get the raw body and headers of a page, with retries and detailed logging
+
+        With an `http_cache` attached, fresh pages are served from disk and
+        stale ones are revalidated with a conditional GET. While the host's
+        circuit is open, or once retries are exhausted, a stale copy is served
+        if there is one. Retries use the host's jittered backoff and the shared
+        retry budget. The caller takes the rate limiter token of the first
+        request; every retry takes its own.
+        """
+        import requests
+
+        host = urlparse(url).hostname or ''
+        cached, fresh = self._cache_lookup(url, host)
+        if fresh:
+            return cached.body, cached.headers
+        request_headers = cached.conditional_headers() if cached else None
+
+        self.host_health.start_request()
         for attempt in range(retry_count):
+            if not self.host_health.allow(url):
+                metrics.inc('quickreader_fetch_rejected_total', help_text="Fetches refused by an open circuit",
+                            host=host)
+                logger.warning(f"{host} is unhealthy, not fetching {url}")
+                return self._serve_stale(url, host, cached)
+            if attempt:
+                metrics.inc('quickreader_fetch_retries_total', help_text="Upstream fetch retries", host=host)
+                if self.rate_limiter is not None:
+                    self.rate_limiter.acquire(url)
+            settled = False
             try:
-                response = self.session.get(url, timeout=10)
+                with metrics.span('fetch', host=host):
+                    response = self.session.get(url, timeout=self.request_timeout, headers=request_headers)
+                metrics.inc('quickreader_downloaded_bytes_total', len(response.content),
+                            help_text="Bytes downloaded from upstream", host=host)
                 
                 # Log response details for debugging
                 logger.debug(f"Response status: {response.status_code}")
                 logger.debug(f"Response headers: {response.headers}")
-                
-                # Try to detect encoding
-                if 'charset=' in response.headers.get('content-type', '').lower():
-                    response.encoding = response.headers.get('content-type').lower().split('charset=')[-1]
+
+                if response.status_code in RETRYABLE_STATUS_CODES:
+                    self.host_health.record_failure(url)
                 else:
-                    response.encoding = response.apparent_encoding or 'utf-8'
-                logger.debug(f"Using encoding: {response.encoding}")
-                
-                if response.status_code == 200:
-                    content = response.text
-                    if len(content) < 100:  # Suspiciously short content
-                        logger.warning(f"Retrieved content is suspiciously short ({len(content)} chars)")
-                    return content
+                    self.host_health.record_success(url)
+                settled = True
+
+                if response.status_code == 200 or (response.status_code == 304 and cached):
+                    return self._cache_response(url, host, response.status_code, response.headers,
+                                                response.content, cached)
                     
                 logger.warning(f"Got status code {response.status_code} for {url}")
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    break
             except requests.RequestException as e:
+                self.host_health.record_failure(url)
+                settled = True
                 logger.warning(f"Attempt {attempt + 1} failed for {url}: {str(e)}")
+            finally:
+                # Interrupted or failed unexpectedly: a half-open probe must not stay claimed
+                if not settled:
+                    self.host_health.release_probe(url)
             
             if attempt < retry_count - 1:
-                sleep_time = 2 ** attempt
-                logger.info(f"Retrying in {sleep_time} seconds...")
+                sleep_time = self.host_health.retry_delay(url)
+                if sleep_time is None:
+                    logger.info(f"Not retrying {url}: host unhealthy or retry budget spent")
+                    break
+                logger.info(f"Retrying in {sleep_time:.2f} seconds...")
                 time.sleep(sleep_time)
         
-        logger.error(f"Failed to get content after {retry_count} attempts: {url}")
-        return None
+        metrics.inc('quickreader_fetch_failures_total', help_text="Fetches that failed after all retries", host=host)
+        logger.error(f"Failed to get content after {attempt + 1} attempts: {url}")
+        return self._serve_stale(url, host, cached)
+
+    def _get_page_content(self, url: str, retry_count: int = 3) -> Optional[str]:
+        """Get page content as text"""
+        page = self._fetch_page(url, retry_count)
+        if page is None:
+            return None
+        return self._decode_page(url, page)
+
+    def _decode_page(self, url: str, page: Tuple[bytes, Mapping[str, str]]) -> str:
+        with metrics.span('decode', host=urlparse(url).hostname or ''):
+            content = self.encoding_resolver.decode(url, page[1], page[0])
+        if len(content) < 100:  # Suspiciously short content
+            logger.warning(f"Retrieved content is suspiciously short ({len(content)} chars)")
+        return content
+
+    def chapter_parsed(self, url: str, result: Optional[Dict]):
+        """Update the HTTP cache entry of a chapter page once its parse result is known"""
+        if self.http_cache is None:
+            return
+        if not result:
+            # Never replay a page that did not parse
+            self.http_cache.invalidate(url)
+        elif result.get('next_url'):
+            # A chapter with a successor is finished and will not change
+            self.http_cache.pin(url)
+
+    def _make_soup(self, html_content: str, parser: str = 'lxml') -> 'BeautifulSoup':
+        from bs4 import BeautifulSoup
+
+        with metrics.span('parse', source=type(self).__name__):
+            return BeautifulSoup(html_content, parser)
 
     @abstractmethod
     def setup_session(self):
         """Set up session headers and cookies"""
         pass
 
-    @abstractmethod
     def can_handle(self, url: str) -> bool:
         """Check if this source can handle the given URL"""
+        return source_class_for_url(url) is type(self)
+
+    @abstractmethod
+    def parse_chapter(self, url: str, html_content: str) -> Optional[Dict]:
+        """Parse chapter content and metadata from a downloaded page"""
         pass
 
     @abstractmethod
-    def extract_chapter_content(self, url: str) -> Optional[Dict]:
-        """Extract chapter content and metadata"""
+    def chapter_list_url(self, url: str) -> Optional[str]:
+        """Map any book or chapter URL to the URL of its chapter list page"""
         pass
 
     @abstractmethod
+    def parse_chapter_list(self, url: str, html_content: str) -> Optional[List[Dict]]:
+        """Parse the list of chapters from a downloaded chapter list page"""
+        pass
+
+    def parse_chapter_list_after(self, url: str, html_content: str, last_chapter_url: str) -> Optional[List[Dict]]:
+        """Parse only the chapters listed after `last_chapter_url` on a chapter list page
+
+        The page is scanned from the last link to the stored tail up to the end
+        of the list container. Returns None when that link is gone, in which
+        case the caller reparses the whole list.
+        """
+        book_id, last_id = parse_chapter_url(last_chapter_url)
+        position = html_content.rfind(urlparse(last_chapter_url).path)
+        if not book_id or position < 0:
+            return None
+        end = self.chapter_list_end.search(html_content, position) if self.chapter_list_end else None
+
+        chapters = []
+        seen_urls = set()
+        for match in CHAPTER_LINK_PATTERN.finditer(html_content, position, end.end() if end else len(html_content)):
+            chapter_url = urljoin(url, match.group(1))
+            link_book_id, chapter_id = parse_chapter_url(chapter_url)
+            # Skip other books and links back into the known part of the list
+            if link_book_id != book_id or int(chapter_id) <= int(last_id):
+                continue
+            title = html.unescape(TAG_PATTERN.sub('', match.group(2))).strip()
+            if not title or (chapter_url, title) in seen_urls:
+                continue
+            seen_urls.add((chapter_url, title))
+            chapters.append({'title': title, 'url': chapter_url})
+
+        if self.chapter_list_sorted:
+            chapters.sort(key=lambda chapter: int(parse_chapter_url(chapter['url'])[1]))
+        return chapters
+
+    def extract_chapter_content(self, url: str) -> Optional[Dict]:
+        """Extract chapter content and metadata"""
+        with metrics.span('extract_chapter_content', source=type(self).__name__):
+            for attempt in range(self.parse_attempts):
+                if attempt and self.rate_limiter is not None:
+                    self.rate_limiter.acquire(url)
+                html_content = self._get_page_content(url)
+                if not html_content:
+                    return None
+                result = self.parse_chapter(url, html_content)
+                self.chapter_parsed(url, result)
+                if result:
+                    return result
+            return None
+
     def get_chapter_list(self, url: str) -> Optional[List[Dict]]:
         """Get list of chapters"""
-        pass
+        with metrics.span('get_chapter_list', source=type(self).__name__):
+            list_url = self.chapter_list_url(url)
+            if not list_url:
+                return None
+            html_content = self._get_page_content(list_url)
+            if not html_content:
+                logger.error("Failed to get page content")
+                return None
+            return self.parse_chapter_list(list_url, html_content)
 
+    async def _fetch_page_async(self, url: str, retry_count: int = 3) -> Optional[Tuple[bytes, Mapping[str, str]]]:
+        """Async variant of _fetch_page through the shared asyncio connection pool, with the same HTTP cache handling"""
+        from async_fetch import get_async_fetcher
+
+        host = urlparse(url).hostname or ''
+        cached, fresh = self._cache_lookup(url, host)
+        if fresh:
+            return cached.body, cached.headers
+        request_headers = dict(self.session.headers)
+        if cached:
+            request_headers.update(cached.conditional_headers())
+        response = await get_async_fetcher().fetch(url, headers=request_headers, retry_count=retry_count)
+        if response is None or (response[0] == 304 and not cached):
+            return self._serve_stale(url, host, cached)
+        return self._cache_response(url, host, *response, cached)
+
+    async def _get_page_content_async(self, url: str, retry_count: int = 3) -> Optional[str]:
+        """Get page content as text through the shared asyncio connection pool"""
+        page = await self._fetch_page_async(url, retry_count)
+        if page is None:
+            return None
+        return self._decode_page(url, page)
+
+    async def extract_chapter_content_async(self, url: str) -> Optional[Dict]:
+        """Async variant of extract_chapter_content; parsing runs off the event loop"""
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        with metrics.span('extract_chapter_content', source=type(self).__name__):
+            for attempt in range(self.parse_attempts):
+                html_content = await self._get_page_content_async(url)
+                if not html_content:
+                    return None
+                result = await loop.run_in_executor(None, self.parse_chapter, url, html_content)
+                self.chapter_parsed(url, result)
+                if result:
+                    return result
+            return None
+
+    async def get_chapter_list_async(self, url: str) -> Optional[List[Dict]]:
+        """Async variant of get_chapter_list; parsing runs off the event loop"""
+        import asyncio
+
+        with metrics.span('get_chapter_list', source=type(self).__name__):
+            list_url = self.chapter_list_url(url)
+            if not list_url:
+                return None
+            html_content = await self._get_page_content_async(list_url)
+            if not html_content:
+                logger.error("Failed to get page content")
+                return None
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self.parse_chapter_list, list_url, html_content)
+
+# Source classes by domain, filled in by register_source
+SOURCE_CLASSES: Dict[str, Type[NovelSource]] = {}
+
+def register_source(cls: Type[NovelSource]) -> Type[NovelSource]:
+    """Class decorator making a source available to SourceManager for its domains"""
+    for domain in cls.domains:
+        SOURCE_CLASSES[domain] = cls
+    return cls
+
+def source_class_for_url(url: str) -> Optional[Type[NovelSource]]:
+    """Source class for the URL's host or the nearest parent domain that has one"""
+    labels = (urlparse(url).hostname or '').split('.')
+    for i in range(len(labels) - 1):
+        cls = SOURCE_CLASSES.get('.'.join(labels[i:]))
+        if cls:
+            return cls
+    return None
+
+# JS variables on dxmwx chapter pages and the result keys they map to
+DXMWX_JS_VARIABLES = {
+    'ChapterTitle': 'title',
+    'BookName': 'book_name',
+    'prevpage': 'prev_url',
+    'nextpage': 'next_url',
+    'chapterpage': 'chapter_list_url',
+    'TxtContents': 'content'
+}
+DXMWX_READ_URL_PATTERN = re.compile(r'/read/(\d+)_(\d+)\.html')
+DXMWX_TXT_CONTENTS_PATTERN = re.compile(r'var\s+TxtContents\s*=\s*["\']([^"\']+)["\']')
+# One alternation so a single pass finds the variables, the names array and the first chapter link
+DXMWX_PAGE_PATTERN = re.compile(
+    r'var\s+(' + '|'.join(DXMWX_JS_VARIABLES) + r')\s*=\s*["\']([^"\']+)["\']'
+    r'|var\s+names\s*=\s*(\[[^\]]+\])'
+    r'|/read/(\d+)_(\d+)\.html'
+)
+
+@register_source
 class DXMWXSource(NovelSource):
+    chapter_list_sorted = True
+    # The first row that is not followed by another 40px row closes the list
+    chapter_list_end = re.compile(r'</div>(?!\s*<div[^>]*height:\s*40px)', re.IGNORECASE)
+    domains = ('dxmwx.org',)
+
     def setup_session(self):
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
             'Connection': 'keep-alive',
-            'Cache-Control': 'no-cache',
-            'Pragma': 'no-cache',
             'Referer': 'https://www.dxmwx.org/'
         })
 
-    def can_handle(self, url: str) -> bool:
-        return 'dxmwx.org' in url
-
+    @metrics.timed('extract')
     def _extract_js_variables(self, html_content: str) -> dict:
-        """Extract variables from JavaScript"""
+        """Extract variables from JavaScript in a single scan over the page"""
         variables = {}
-        
-        # Extract all relevant variables using regex
-        patterns = {
-            'title': r'var\s+ChapterTitle\s*=\s*["\']([^"\']+)["\']',
-            'book_name': r'var\s+BookName\s*=\s*["\']([^"\']+)["\']',
-            'prev_url': r'var\s+prevpage\s*=\s*["\']([^"\']+)["\']',
-            'next_url': r'var\s+nextpage\s*=\s*["\']([^"\']+)["\']',
-            'chapter_list_url': r'var\s+chapterpage\s*=\s*["\']([^"\']+)["\']',
-            'content': r'var\s+TxtContents\s*=\s*["\']([^"\']+)["\']'
-        }
-        
-        for key, pattern in patterns.items():
-            match = re.search(pattern, html_content, re.DOTALL)
-            if match:
-                value = match.group(1)
-                # Decode escaped content
-                if key == 'content':
-                    value = value.encode().decode('unicode_escape')
-                variables[key] = value
-        
-        # Extract character names array
-        names_match = re.search(r'var\s+names\s*=\s*(\[[^\]]+\])', html_content)
-        if names_match:
-            try:
-                names_str = names_match.group(1).replace("'", '"')
-                variables['names'] = json.loads(names_str)
-            except json.JSONDecodeError:
-                variables['names'] = []
-        
-        # Extract book and chapter IDs
-        book_id_match = re.search(r'/read/(\d+)_\d+\.html', html_content)
-        if book_id_match:
-            variables['book_id'] = book_id_match.group(1)
-            
-        chapter_id_match = re.search(r'/read/\d+_(\d+)\.html', html_content)
-        if chapter_id_match:
-            variables['chapter_id'] = chapter_id_match.group(1)
-            
+
+        for match in DXMWX_PAGE_PATTERN.finditer(html_content):
+            name, value, names, read_book_id, read_chapter_id = match.groups()
+            if name:
+                key = DXMWX_JS_VARIABLES[name]
+                if key not in variables:
+                    # Decode escaped content
+                    if key == 'content':
+                        value = value.encode().decode('unicode_escape')
+                    variables[key] = value
+                if 'book_id' not in variables:
+                    # Chapter links usually first appear inside prevpage/nextpage
+                    read_match = DXMWX_READ_URL_PATTERN.search(value)
+                    if read_match:
+                        variables['book_id'], variables['chapter_id'] = read_match.groups()
+            elif names:
+                # Extract character names array
+                if 'names' not in variables:
+                    try:
+                        variables['names'] = json.loads(names.replace("'", '"'))
+                    except json.JSONDecodeError:
+                        variables['names'] = []
+            elif 'book_id' not in variables:
+                # Extract book and chapter IDs
+                variables['book_id'], variables['chapter_id'] = read_book_id, read_chapter_id
+
         return variables
 
     def _extract_content_from_api(self, book_id: str, chapter_id: str) -> Optional[str]:
-        """Try to get content from API"""
-        try:
-            # Try the chapter API endpoint
-            api_url = f"https://www.dxmwx.org/api/chapter/{book_id}/{chapter_id}"
-            response = self.session.get(api_url)
-            if response.status_code == 200:
-                data = response.json()
-                return data.get('content')
+        """Try to get content from API; single attempts, skipped while the host is unhealthy"""
+        import requests
 
-            # Try the content API endpoint
-            api_url = f"https://www.dxmwx.org/api/content/{book_id}/{chapter_id}"
-            response = self.session.get(api_url)
+        for api_url in (f"https://www.dxmwx.org/api/chapter/{book_id}/{chapter_id}",
+                        f"https://www.dxmwx.org/api/content/{book_id}/{chapter_id}"):
+            if not self.host_health.allow(api_url):
+                return None
+            try:
+                response = self.session.get(api_url, timeout=self.request_timeout)
+            except requests.RequestException as e:
+                self.host_health.record_failure(api_url)
+                logger.warning(f"API extraction failed: {str(e)}")
+                return None
+            except BaseException:
+                self.host_health.release_probe(api_url)
+                raise
+            if response.status_code in RETRYABLE_STATUS_CODES:
+                self.host_health.record_failure(api_url)
+                return None
+            self.host_health.record_success(api_url)
             if response.status_code == 200:
-                data = response.json()
-                return data.get('content')
-
-            return None
-        except Exception as e:
-            logger.warning(f"API extraction failed: {str(e)}")
-            return None
+                try:
+                    return response.json().get('content')
+                except (ValueError, AttributeError) as e:
+                    logger.warning(f"API extraction failed: {str(e)}")
+                    return None
+        return None
 
-    def _extract_content_from_html(self, soup: BeautifulSoup) -> Optional[str]:
+    def _extract_content_from_html(self, soup: 'BeautifulSoup') -> Optional[str]:
         """Extract content from HTML"""
         try:
             # First try to find the main article content
@@ -305,18 +689,7 @@ class DXMWXSource(NovelSource):
                         return content
 
             # Try to find the largest text block
-            text_blocks = []
-            for tag in soup.find_all(['div', 'p']):
-                text = tag.get_text(strip=True)
-                if len(text) > 100 and not any(skip in text for skip in ['上一章', '下一章', '目录', '书页']):
-                    text_blocks.append((len(text), text))
-            
-            if text_blocks:
-                # Sort by length and get the largest text block
-                text_blocks.sort(reverse=True)
-                return text_blocks[0][1]
-
-            return None
+            return self._largest_text_block(soup, 100, ['上一章', '下一章', '目录', '书页'])
         except Exception as e:
             logger.warning(f"HTML extraction failed: {str(e)}")
             return None
@@ -325,7 +698,7 @@ class DXMWXSource(NovelSource):
         """Extract content from JavaScript variables"""
         try:
             # Try to find TxtContents variable
-            match = re.search(r'var\s+TxtContents\s*=\s*["\']([^"\']+)["\']', html_content)
+            match = DXMWX_TXT_CONTENTS_PATTERN.search(html_content)
             if match:
                 content = match.group(1)
                 # Unescape content if needed
@@ -337,91 +710,75 @@ class DXMWXSource(NovelSource):
             logger.warning(f"JavaScript extraction failed: {str(e)}")
             return None
 
-    def extract_chapter_content(self, url: str) -> Optional[Dict]:
+    def parse_chapter(self, url: str, html_content: str) -> Optional[Dict]:
         """Extract chapter content and metadata"""
-        html_content = self._get_page_content(url)
-        if not html_content:
-            return None
-
         # Extract variables from JavaScript
         variables = self._extract_js_variables(html_content)
         if not variables:
             return None
 
-        # Create soup for parsing
-        soup = BeautifulSoup(html_content, 'html.parser')
-
-        # Get content from variables or fallback to parsing
+        # Only build a DOM when the variables do not carry the chapter text
         content = variables.get('content')
+        nav = {'prev_url': None, 'next_url': None, 'chapter_list_url': None}
         if not content:
-            content = self._extract_content(soup)
+            soup = self._make_soup(html_content)
+            content = self._extract_content(soup, url)
             if not content:
-                # Retry loading once
-                html_content = self._get_page_content(url)
-                if html_content:
-                    variables = self._extract_js_variables(html_content)
-                    content = variables.get('content')
-                    if not content:
-                        content = self._extract_content(BeautifulSoup(html_content, 'html.parser'))
-
-        if not content:
-            return None
+                return None
+            nav = self._extract_navigation(soup, url)
 
         # Clean and format content
         content = self._clean_content(content)
         if not content:
             return None
 
-        # Get navigation links
-        nav = self._extract_navigation(soup, url)
-
-        # Build result
+        # Build result, preferring page links over the JS navigation variables
         result = {
             'url': url,
             'title': variables.get('title', ''),
             'book_name': variables.get('book_name', ''),
             'content': content,
-            'prev_url': nav['prev_url'] or variables.get('prev_url'),
-            'next_url': nav['next_url'] or variables.get('next_url'),
-            'chapter_list_url': nav['chapter_list_url'] or variables.get('chapter_list_url')
+            'prev_url': nav['prev_url'] or self._join_url(url, variables.get('prev_url')),
+            'next_url': nav['next_url'] or self._join_url(url, variables.get('next_url')),
+            'chapter_list_url': nav['chapter_list_url'] or self._join_url(url, variables.get('chapter_list_url'))
         }
 
         return result
 
-    def get_chapter_list(self, url: str) -> Optional[List[Dict]]:
-        try:
-            logger.info(f"Attempting to get chapter list from {url}")
-            
-            # Convert any URL to chapter list URL format
-            book_id = None
-            if '/read/' in url:
-                book_id_match = re.search(r'/read/(\d+)_\d+\.html', url)
-                if book_id_match:
-                    book_id = book_id_match.group(1)
-            elif '/book/' in url:
-                book_id_match = re.search(r'/book/(\d+)\.html', url)
-                if book_id_match:
-                    book_id = book_id_match.group(1)
-            elif '/chapter/' in url:
-                book_id_match = re.search(r'/chapter/(\d+)\.html', url)
-                if book_id_match:
-                    book_id = book_id_match.group(1)
-                    
-            if not book_id:
-                logger.error("Could not extract book ID from URL")
-                return None
-                
-            # Use the chapter list URL format
-            url = f'https://www.dxmwx.org/chapter/{book_id}.html'
-            logger.info(f"Using chapter list URL: {url}")
+    @staticmethod
+    def _join_url(base_url: str, href: Optional[str]) -> Optional[str]:
+        return urljoin(base_url, href) if href else None
 
-            # Get the chapter list page content
-            html_content = self._get_page_content(url)
-            if not html_content:
-                logger.error("Failed to get page content")
-                return None
+    def chapter_list_url(self, url: str) -> Optional[str]:
+        logger.debug(f"Attempting to get chapter list from {url}")
+
+        # Convert any URL to chapter list URL format
+        book_id = None
+        if '/read/' in url:
+            book_id_match = re.search(r'/read/(\d+)_\d+\.html', url)
+            if book_id_match:
+                book_id = book_id_match.group(1)
+        elif '/book/' in url:
+            book_id_match = re.search(r'/book/(\d+)\.html', url)
+            if book_id_match:
+                book_id = book_id_match.group(1)
+        elif '/chapter/' in url:
+            book_id_match = re.search(r'/chapter/(\d+)\.html', url)
+            if book_id_match:
+                book_id = book_id_match.group(1)
+
+        if not book_id:
+            logger.error("Could not extract book ID from URL")
+            return None
 
-            soup = BeautifulSoup(html_content, 'lxml')
+        # Use the chapter list URL format
+        url = f'https://www.dxmwx.org/chapter/{book_id}.html'
+        logger.debug(f"Using chapter list URL: {url}")
+        return url
+
+    def parse_chapter_list(self, url: str, html_content: str) -> Optional[List[Dict]]:
+        try:
+            soup = self._make_soup(html_content)
             chapters = []
             base_url = 'https://www.dxmwx.org'
             seen_urls = set()  # To avoid duplicates
@@ -463,39 +820,37 @@ class DXMWXSource(NovelSource):
             logger.error(f"Error processing chapter list: {str(e)}")
             return None
 
+@register_source
 class HetuShuSource(NovelSource):
+    domains = ('hetushu.com',)
+    chapter_list_end = re.compile(r'</dl>', re.IGNORECASE)
+
     def setup_session(self):
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
             'Connection': 'keep-alive',
-            'Cache-Control': 'no-cache',
             'Referer': 'https://www.hetushu.com/'
         })
 
-    def can_handle(self, url: str) -> bool:
-        return 'hetushu.com' in url
+    def chapter_list_url(self, url: str) -> Optional[str]:
+        # Convert any book URL to index URL format
+        if '/book/' not in url:
+            return None
 
-    def get_chapter_list(self, url: str) -> Optional[List[Dict]]:
-        try:
-            # Convert any book URL to index URL format
-            if '/book/' not in url:
-                return None
-            
-            book_id = re.search(r'/book/(\d+)', url)
-            if not book_id:
-                return None
-                
-            book_id = book_id.group(1)
-            index_url = f'https://www.hetushu.com/book/{book_id}/index.html'
-            
-            logger.info(f"Getting chapter list from {index_url}")
-            html_content = self._get_page_content(index_url)
-            if not html_content:
-                return None
+        book_id = re.search(r'/book/(\d+)', url)
+        if not book_id:
+            return None
 
-            soup = BeautifulSoup(html_content, 'lxml')
+        book_id = book_id.group(1)
+        index_url = f'https://www.hetushu.com/book/{book_id}/index.html'
+        logger.debug(f"Getting chapter list from {index_url}")
+        return index_url
+
+    def parse_chapter_list(self, url: str, html_content: str) -> Optional[List[Dict]]:
+        try:
+            soup = self._make_soup(html_content)
             chapters = []
             base_url = 'https://www.hetushu.com'
 
@@ -524,17 +879,13 @@ class HetuShuSource(NovelSource):
             logger.error(f"Error getting chapter list: {str(e)}")
             return None
 
-    def extract_chapter_content(self, url: str) -> Optional[Dict]:
+    def parse_chapter(self, url: str, html_content: str) -> Optional[Dict]:
         try:
-            html_content = self._get_page_content(url)
-            if not html_content:
-                return None
-
-            soup = BeautifulSoup(html_content, 'lxml')
+            soup = self._make_soup(html_content)
             base_url = 'https://www.hetushu.com'
             
             # Extract content using base class method
-            content = self._extract_content(soup)
+            content = self._extract_content(soup, url)
             if not content:
                 logger.error(f"No content found for {url}")
                 logger.debug(f"HTML content: {html_content}")
@@ -576,11 +927,465 @@ class HetuShuSource(NovelSource):
             return None
 
 class SourceManager:
-    def __init__(self):
-        self.sources = [DXMWXSource(), HetuShuSource()]
+    # Chapters without a next_url are the latest of a serial and may still be revised
+    OPEN_CHAPTER_TTL = 300
+    # Seconds a caller waits for an identical fetch already in flight before giving up
+    FLIGHT_TIMEOUT = 60
+    # Books whose chapter index is kept in memory
+    MAX_CHAPTER_INDEXES = 64
+    # Paragraphs per page of get_chapter_page
+    PARAGRAPH_PAGE_SIZE = 40
+    # Chapters whose paragraph offsets are kept in memory
+    MAX_PARAGRAPH_INDEXES = 32
+    # Most chapters resolved by one get_chapters call
+    MAX_BATCH_CHAPTERS = 50
+    # Book-level fields sent once per get_chapters response instead of with every chapter
+    BATCH_SHARED_FIELDS = ('book_name', 'chapter_list_url')
+
+    def __init__(self, store_path: str = 'chapters.db', memory_cache_bytes: int = 64 * 1024 * 1024,
+                 read_ahead_depth: int = 2, http_cache_path: Optional[str] = 'http_cache.db'):
+        # Sources are created when a URL of theirs is first seen
+        self.sources: Dict[Type[NovelSource], NovelSource] = {}
+        self.sources_lock = threading.Lock()
+        self.store = ChapterStore(store_path)
+        self.http_cache = HttpCache(http_cache_path) if http_cache_path else None
+        self.selector_plans = self.store.load_selector_plans()
+        self.memory_cache = ChapterLRUCache(memory_cache_bytes)
+        # Requests per second allowed against each upstream host
+        self.rate_limiter = HostRateLimiter(default_rate=2.0, default_capacity=4, host_rates={
+            'www.dxmwx.org': 4.0,
+            'www.hetushu.com': 4.0
+        })
+        self.read_ahead = ReadAheadScheduler(self, depth=read_ahead_depth)
+        self.flights = SingleFlight()
+        # list_url -> ChapterIndex, least recently used first
+        self.chapter_indexes: 'OrderedDict[str, ChapterIndex]' = OrderedDict()
+        self.chapter_indexes_lock = threading.Lock()
+        # (url, content length) -> start offsets of the chapter's paragraphs, least recently used first
+        self.paragraph_indexes: 'OrderedDict[tuple, array]' = OrderedDict()
+        # Background checks of followed books; started by the app with updates.start()
+        self.updates = UpdateScheduler(self)
+        self.flights.on_shared = lambda key: metrics.inc(
+            'quickreader_singleflight_shared_total', help_text="Calls that joined an identical in-flight fetch",
+            kind=key[0])
 
     def get_source_for_url(self, url: str) -> Optional[NovelSource]:
-        for source in self.sources:
-            if source.can_handle(url):
-                return source
-        return None 
\ No newline at end of file
+        cls = source_class_for_url(url)
+        if cls is None:
+            return None
+        source = self.sources.get(cls)
+        if source is None:
+            with self.sources_lock:
+                source = self.sources.get(cls)
+                if source is None:
+                    source = cls()
+                    source.selector_plans = self.selector_plans
+                    source.on_selector_plan_learned = self.store.save_selector_plan
+                    source.http_cache = self.http_cache
+                    source.rate_limiter = self.rate_limiter
+                    self.sources[cls] = source
+        return source
+
+    def _cache_in_memory(self, url: str, chapter: Dict):
+        ttl = None if chapter.get('next_url') else self.OPEN_CHAPTER_TTL
+        self.memory_cache.put(url, chapter, ttl=ttl)
+
+    def get_cached_chapter(self, url: str) -> Optional[Dict]:
+        """Get a chapter from memory or the chapter store without going upstream"""
+        # Memory hits and misses are counted by the cache itself
+        chapter = self.memory_cache.get(url)
+        if chapter:
+            return chapter
+
+        chapter = self.store.get(url)
+        metrics.inc('quickreader_cache_lookups_total', help_text="Chapter cache lookups",
+                    tier='store', result='hit' if chapter else 'miss')
+        if chapter:
+            self._cache_in_memory(url, chapter)
+        return chapter
+
+    def _flight(self, kind: str, key: str, func):
+        """Run `func` once for concurrent callers with the same key; waiters time out with None"""
+        try:
+            return self.flights.do((kind, key), func, timeout=self.FLIGHT_TIMEOUT)
+        except FlightTimeout as e:
+            logger.warning(str(e))
+            return None
+
+    def _fetch_chapter(self, url: str, rate_limit: bool) -> Optional[Dict]:
+        # A flight that finished just before this one started may already have it
+        chapter = self.memory_cache.get(url, count=False)
+        if chapter:
+            return chapter
+        source = self.get_source_for_url(url)
+        if not source:
+            logger.error(f"No source can handle {url}")
+            return None
+        if rate_limit:
+            self.rate_limiter.acquire(url)
+        chapter = source.extract_chapter_content(url)
+        if chapter:
+            self.store.put(chapter)
+            self._cache_in_memory(url, chapter)
+        return chapter
+
+    def fetch_chapter(self, url: str, rate_limit: bool = False) -> Optional[Dict]:
+        """Fetch a chapter upstream and cache it
+
+        Concurrent calls for the same URL share one fetch and its result or
+        exception. With `rate_limit`, the call that actually fetches waits for
+        the host's rate limiter; otherwise callers handle rate limiting.
+        """
+        return self._flight('chapter', url, lambda: self._fetch_chapter(url, rate_limit))
+
+    def get_chapter(self, url: str, reader_id: str = 'default') -> Optional[Dict]:
+        """Get a chapter from memory, then the chapter store, then upstream
+
+        Serving a chapter starts read-ahead of the chapters after it for `reader_id`.
+        """
+        chapter = self.get_cached_chapter(url)
+        if not chapter:
+            chapter = self.fetch_chapter(url, rate_limit=True)
+        if chapter:
+            chapter = self._with_position(url, chapter)
+            self.read_ahead.schedule(chapter, reader_id)
+        return chapter
+
+    def _with_position(self, url: str, chapter: Dict) -> Dict:
+        """Copy of `chapter` with its list position, filling missing prev/next links from the index"""
+        index = self.get_chapter_index(url)
+        position = index.position(url) if index else None
+        if position is None:
+            return chapter
+        previous, following = index.nth(position - 1) if position else None, index.nth(position + 1)
+        return dict(chapter, position=position, chapter_count=len(index),
+                    prev_url=chapter.get('prev_url') or (previous and previous['url']),
+                    next_url=chapter.get('next_url') or (following and following['url']))
+
+    def get_chapters(self, urls: Optional[List[str]] = None, book_url: Optional[str] = None,
+                     start: int = 0, stop: Optional[int] = None, max_workers: int = 4,
+                     reader_id: Optional[str] = None) -> Dict:
+        """Resolve several chapters at once, given as URLs or as a range of a book's chapter index
+
+        Chapters in memory or in the store are collected first, the store ones
+        with one query; the rest are fetched upstream on up to `max_workers`
+        threads. At most MAX_BATCH_CHAPTERS are resolved per call. Returns
+        {'chapters': [...], 'errors': [{'url', 'error'}], 'truncated': bool}
+        with chapters in request order, plus the BATCH_SHARED_FIELDS common to
+        all of them, which are then left out of each chapter. With
+        `reader_id`, read-ahead starts after the last chapter returned.
+        """
+        errors = []
+        if urls is None:
+            index = self.get_chapter_index(book_url) if book_url else None
+            if index is None:
+                return {'chapters': [], 'errors': [{'url': book_url, 'error': "Chapter list not loaded"}],
+                        'truncated': False}
+            urls = [entry['url'] for entry in index.range(start, stop)]
+        urls = list(dict.fromkeys(urls))
+        truncated = len(urls) > self.MAX_BATCH_CHAPTERS
+        urls = urls[:self.MAX_BATCH_CHAPTERS]
+
+        found: Dict[str, Dict] = {}
+        for url in urls:
+            chapter = self.memory_cache.get(url)
+            if chapter:
+                found[url] = chapter
+        stored = self.store.get_many([url for url in urls if url not in found])
+        for url, chapter in stored.items():
+            self._cache_in_memory(url, chapter)
+            found[url] = chapter
+        missing = [url for url in urls if url not in found]
+        metrics.inc('quickreader_batch_chapters_total', len(urls) - len(missing),
+                    help_text="Chapters resolved by batch requests", result='cached')
+
+        def fetch(url: str):
+            try:
+                return url, self.fetch_chapter(url, rate_limit=True), None
+            except Exception as e:
+                logger.warning(f"Batch fetch failed for {url}: {str(e)}")
+                return url, None, str(e)
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(missing)),
+                                    thread_name_prefix='batch') as executor:
+                for url, chapter, error in executor.map(fetch, missing):
+                    if chapter:
+                        found[url] = chapter
+                    else:
+                        errors.append({'url': url, 'error': error or "Could not load chapter"})
+            metrics.inc('quickreader_batch_chapters_total', len(missing) - len(errors),
+                        help_text="Chapters resolved by batch requests", result='fetched')
+            metrics.inc('quickreader_batch_chapters_total', len(errors),
+                        help_text="Chapters resolved by batch requests", result='failed')
+
+        chapters = [self._with_position(url, found[url]) for url in urls if url in found]
+        response = {'chapters': chapters, 'errors': errors, 'truncated': truncated}
+        for field in self.BATCH_SHARED_FIELDS:
+            values = set(chapter.get(field) for chapter in chapters)
+            if len(values) == 1:
+                response[field] = values.pop()
+                chapters[:] = [{key: value for key, value in chapter.items() if key != field}
+                               for chapter in chapters]
+        if chapters and reader_id:
+            self.read_ahead.schedule(chapters[-1], reader_id)
+        return response
+
+    def _paragraph_starts(self, url: str, content: str) -> array:
+        """Start offsets of the '\\n\\n'-separated paragraphs of `content`, computed once per chapter"""
+        key = (url, len(content))
+        with self.chapter_indexes_lock:
+            starts = self.paragraph_indexes.get(key)
+            if starts is not None:
+                self.paragraph_indexes.move_to_end(key)
+                return starts
+        starts = array('I', [0])
+        position = content.find('\n\n')
+        while position != -1:
+            starts.append(position + 2)
+            position = content.find('\n\n', position + 2)
+        with self.chapter_indexes_lock:
+            self.paragraph_indexes[key] = starts
+            while len(self.paragraph_indexes) > self.MAX_PARAGRAPH_INDEXES:
+                self.paragraph_indexes.popitem(last=False)
+        return starts
+
+    def get_chapter_page(self, url: str, offset: int = 0, limit: Optional[int] = None,
+                         reader_id: str = 'default') -> Optional[Dict]:
+        """A chapter with `limit` of its paragraphs from `offset` on, in place of the whole content
+
+        Besides the chapter fields other than 'content', the page has
+        'paragraphs', 'offset', 'paragraph_count' and 'next_offset' (None on the
+        last page). The first page is served like get_chapter, including the
+        list position and read-ahead; later pages only read the cached chapter.
+        """
+        limit = limit or self.PARAGRAPH_PAGE_SIZE
+        chapter = self.get_cached_chapter(url) if offset else None
+        if not chapter:
+            chapter = self.get_chapter(url, reader_id)
+        if not chapter:
+            return None
+
+        content = chapter.get('content') or ''
+        starts = self._paragraph_starts(url, content)
+        count = len(starts) if content else 0
+        offset = min(max(0, offset), count)
+        end = min(count, offset + limit)
+        paragraphs = [content[starts[i]:starts[i + 1] - 2 if i + 1 < count else len(content)]
+                      for i in range(offset, end)]
+        page = {key: value for key, value in chapter.items() if key != 'content'}
+        page.update(offset=offset, paragraphs=paragraphs, paragraph_count=count,
+                    next_offset=end if end < count else None)
+        return page
+
+    def _remember_chapter_index(self, index: ChapterIndex):
+        with self.chapter_indexes_lock:
+            self.chapter_indexes[index.list_url] = index
+            self.chapter_indexes.move_to_end(index.list_url)
+            while len(self.chapter_indexes) > self.MAX_CHAPTER_INDEXES:
+                self.chapter_indexes.popitem(last=False)
+
+    def get_chapter_index(self, url: str) -> Optional[ChapterIndex]:
+        """Navigation index of the book at `url` (any book or chapter URL), from the stored chapter list
+
+        Never goes upstream; returns None until the book's chapter list has been loaded once.
+        """
+        source = self.get_source_for_url(url)
+        list_url = source.chapter_list_url(url) if source else None
+        if not list_url:
+            return None
+        with self.chapter_indexes_lock:
+            index = self.chapter_indexes.get(list_url)
+            if index is not None:
+                self.chapter_indexes.move_to_end(list_url)
+                return index
+        chapters = self.store.get_chapter_list(list_url)
+        if chapters is None:
+            return None
+        index = ChapterIndex(list_url, chapters)
+        self._remember_chapter_index(index)
+        return index
+
+    def refresh_chapter_list(self, url: str, rate_limit: bool = True) -> Optional[Dict]:
+        """Bring the stored chapter list of the book at `url` up to date
+
+        Only the part of the index page after the stored tail is parsed. Returns
+        {'list_url', 'new_chapters', 'total'}, or None if the list is unavailable.
+        Without `rate_limit` the caller has already taken a host rate limiter token.
+        """
+        source = self.get_source_for_url(url)
+        if not source:
+            logger.error(f"No source can handle {url}")
+            return None
+        list_url = source.chapter_list_url(url)
+        if not list_url:
+            return None
+        # Readers of the same book refreshing together share one fetch and parse
+        return self._flight('chapter_list', list_url,
+                            lambda: self._refresh_chapter_list(source, list_url, rate_limit))
+
+    def _refresh_chapter_list(self, source: NovelSource, list_url: str, rate_limit: bool = True) -> Optional[Dict]:
+        if rate_limit:
+            self.rate_limiter.acquire(list_url)
+        html_content = source._get_page_content(list_url)
+        if not html_content:
+            logger.error("Failed to get page content")
+            return None
+
+        state = self.store.get_chapter_list_state(list_url)
+        new_chapters = None
+        if state and state['last_chapter_url']:
+            with metrics.span('parse_chapter_list_delta', source=type(source).__name__):
+                new_chapters = source.parse_chapter_list_after(list_url, html_content, state['last_chapter_url'])
+        if new_chapters is not None:
+            new_chapters = drop_volume_headings(new_chapters)
+            if new_chapters:
+                self.store.append_chapter_list(list_url, new_chapters)
+                self._link_new_chapters(state['last_chapter_url'], new_chapters[0]['url'])
+                with self.chapter_indexes_lock:
+                    index = self.chapter_indexes.get(list_url)
+                    if index is not None:
+                        index.extend(new_chapters)
+            total = state['chapter_count'] + len(new_chapters)
+        else:
+            chapters = source.parse_chapter_list(list_url, html_content)
+            if not chapters:
+                return None
+            chapters = drop_volume_headings(chapters)
+            known = set(entry['url'] for entry in self.store.get_chapter_list(list_url) or [])
+            new_chapters = [chapter for chapter in chapters if chapter['url'] not in known] if known else chapters
+            self.store.save_chapter_list(list_url, chapters)
+            self._remember_chapter_index(ChapterIndex(list_url, chapters))
+            total = len(chapters)
+
+        if new_chapters:
+            logger.info(f"{len(new_chapters)} new chapters in {list_url}")
+        return {'list_url': list_url, 'new_chapters': new_chapters, 'total': total}
+
+    def _link_new_chapters(self, tail_url: str, next_url: str):
+        """Point the previously latest chapter at the first new one so read-ahead can follow"""
+        chapter = self.store.get(tail_url)
+        if chapter and not chapter.get('next_url'):
+            chapter['next_url'] = next_url
+            self.store.put(chapter)
+            self._cache_in_memory(tail_url, chapter)
+
+    def get_chapter_list(self, url: str) -> Optional[List[Dict]]:
+        """Full chapter list of the book at `url`, refreshed incrementally"""
+        refresh = self.refresh_chapter_list(url)
+        return self.store.get_chapter_list(refresh['list_url']) if refresh else None
+
+    def get_new_chapters(self, url: str, since: Optional[str] = None,
+                         reader_id: Optional[str] = None) -> Optional[List[Dict]]:
+        """Refresh the chapter list and return only the chapters added to it
+
+        With `since` (a chapter URL the client already has), returns every stored
+        chapter after it instead of only those found by this refresh. With
+        `reader_id`, read-ahead starts on the new chapters for that reader.
+        """
+        refresh = self.refresh_chapter_list(url)
+        if not refresh:
+            return None
+        new_chapters = refresh['new_chapters']
+        if since:
+            after = self.store.get_chapter_list_after(refresh['list_url'], since)
+            if after is not None:
+                new_chapters = after
+        if new_chapters and reader_id:
+            self.read_ahead.schedule({'next_url': new_chapters[0]['url']}, reader_id)
+        return new_chapters
+
+    def search(self, query: str, url: Optional[str] = None, limit: int = 20, order: str = 'rank') -> List[Dict]:
+        """Full-text search over stored chapters; with `url` (any book or chapter URL), only that book"""
+        host = book_id = None
+        if url:
+            host = urlparse(url).hostname
+            book_id, _ = parse_chapter_url(url)
+            if not book_id:
+                match = BOOK_URL_PATTERN.search(url)
+                book_id = match.group(1) if match else None
+        with metrics.span('search'):
+            return self.store.search(query, host=host, book_id=book_id, limit=limit, order=order)
+
+    def render_metrics(self) -> str:
+        """Prometheus text exposition for the /api/metrics endpoint"""
+        stats = self.memory_cache.stats()
+        return metrics.render_prometheus({
+            'quickreader_memory_cache_bytes': stats['bytes'],
+            'quickreader_memory_cache_entries': stats['entries'],
+            'quickreader_memory_cache_evictions': stats['evictions'],
+            'quickreader_memory_cache_hits': stats['hits'],
+            'quickreader_memory_cache_misses': stats['misses'],
+            'quickreader_memory_cache_hit_ratio': stats['hit_ratio'],
+            'quickreader_unhealthy_hosts': host_health.open_hosts()
+        })
+
+    async def aclose(self):
+        """Close the shared asyncio connection pool"""
+        from async_fetch import get_async_fetcher
+
+        await get_async_fetcher().close()
+
+    def download_book(self, url: str, max_workers: int = 8, progress_callback=None,
+                      parse_workers: int = 0) -> Optional[DownloadProgress]:
+        """Download every chapter of the book at `url` into the store, resuming from stored chapters
+
+        With `parse_workers`, pages are fetched on `max_workers` threads and parsed
+        in that many worker processes.
+        """
+        source = self.get_source_for_url(url)
+        if not source:
+            logger.error(f"No source can handle {url}")
+            return None
+
+        chapters = self.get_chapter_list(url)
+        if not chapters:
+            logger.error(f"Could not get chapter list for {url}")
+            return None
+
+        downloader = BookDownloader(self, self.store, self.rate_limiter, max_workers=max_workers,
+                                    parse_workers=parse_workers)
+        return downloader.download(chapters, progress_callback)
+
+    def export_book(self, url: str, path: str, export_format: Optional[str] = None, max_workers: int = 4,
+                    progress_callback=None) -> Optional[DownloadProgress]:
+        """Write the book at `url` to an EPUB or TXT file at `path`, fetching chapters not yet stored
+
+        Memory use does not grow with the book; an interrupted export to the
+        same path resumes where it stopped. See BookExporter.
+        """
+        from book_export import BookExporter
+
+        exporter = BookExporter(self, max_workers=max_workers)
+        return exporter.export(url, path, export_format, progress_callback)
+
+    def reextract_cached(self, parse_workers: Optional[int] = None, progress_callback=None) -> Optional[DownloadProgress]:
+        """Re-run extraction over every chapter page in the HTTP cache, in worker processes"""
+        if self.http_cache is None:
+            return None
+        urls = self.http_cache.urls('chapter')
+        progress = DownloadProgress(len(urls))
+
+        def fetch(url: str):
+            source = self.get_source_for_url(url)
+            cached = self.http_cache.get(url)
+            if not source or not cached or not cached.has_body:
+                return None
+            return type(source).__name__, cached.body, cached.content_type
+
+        def on_result(url: str, chapter: Optional[Dict]):
+            if chapter:
+                self.store.put(chapter)
+                self.memory_cache.invalidate(url)
+            with progress.lock:
+                if chapter:
+                    progress.downloaded += 1
+                else:
+                    progress.failed.append(url)
+            if progress_callback:
+                progress_callback(progress)
+
+        pipeline = ParsePipeline(parse_workers, selector_plans=dict(self.store.load_selector_plans()))
+        pipeline.run(urls, fetch, on_result)
+        logger.info(f"Re-extraction finished: {progress.as_dict()}")
+        return progress
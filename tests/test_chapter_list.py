@@ -0,0 +1,40 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import fixtures
+from replay_server import ReplayServer, mount_replay
+from sources import SourceManager
+
+LIST_PATH = f'/book/{fixtures.HETUSHU_BOOK_ID}/index.html'
+LIST_URL = f'https://www.hetushu.com{LIST_PATH}'
+
+def stored_and_indexed(manager):
+    stored = manager.store.get_chapter_list(LIST_URL)
+    index = manager.get_chapter_index(LIST_URL)
+    return [entry['url'] for entry in stored], [entry['url'] for entry in index.range(0)]
+
+def test_stored_list_and_index_agree_after_refresh():
+    with ReplayServer({LIST_PATH: fixtures.hetushu_index_page(300).encode('utf-8')}) as server:
+        manager = SourceManager(store_path=':memory:', http_cache_path=None)
+        mount_replay(manager.get_source_for_url(LIST_URL), server)
+
+        refresh = manager.refresh_chapter_list(LIST_URL)
+        stored, indexed = stored_and_indexed(manager)
+        assert len(stored) == len(indexed) == refresh['total'] == 300
+        assert stored == indexed
+
+        # The new chapters open a volume, so the delta starts with a heading
+        server.pages[LIST_PATH] = fixtures.hetushu_index_page(306).encode('utf-8')
+        refresh = manager.refresh_chapter_list(LIST_URL)
+        stored, indexed = stored_and_indexed(manager)
+        assert len(refresh['new_chapters']) == 6
+        assert len(stored) == len(indexed) == refresh['total'] == 306
+        assert stored == indexed
+
+        last = manager.get_chapter_index(LIST_URL).nth(-1)
+        assert last['title'] == '第306章 标题306'
+        manager.store.close()
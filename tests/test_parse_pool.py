@@ -0,0 +1,44 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parse_pool import ParsePipeline
+
+def test_run_returns_when_every_fetch_fails():
+    results = []
+    ParsePipeline(1, fetch_workers=2).run(['u1', 'u2', 'u3'], lambda url: None,
+                                          lambda url, chapter: results.append((url, chapter)))
+    assert sorted(results) == [('u1', None), ('u2', None), ('u3', None)]
+
+def test_run_returns_when_a_fetch_raises():
+    def fetch(url):
+        raise RuntimeError("circuit open")
+
+    results = []
+    ParsePipeline(1).run(['u1'], fetch, lambda url, chapter: results.append((url, chapter)))
+    assert results == [('u1', None)]
+
+def test_run_with_no_urls():
+    results = []
+    ParsePipeline(1).run([], lambda url: None, lambda url, chapter: results.append(url))
+    assert results == []
+
+def test_run_parses_pages_between_failed_fetches():
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+    import fixtures
+
+    texts = fixtures.load_cached_texts()
+    urls = [f'https://www.hetushu.com/book/{fixtures.HETUSHU_BOOK_ID}/{fixtures.HETUSHU_FIRST_CHAPTER + i}.html'
+            for i in range(4)]
+
+    def fetch(url):
+        i = urls.index(url)
+        if i % 2:
+            return None
+        return 'HetuShuSource', fixtures.hetushu_chapter_page(i, fixtures.chapter_text(i, texts)).encode('utf-8'), \
+            'text/html; charset=utf-8'
+
+    results = {}
+    ParsePipeline(2).run(urls, fetch, lambda url, chapter: results.__setitem__(url, chapter))
+    assert [bool(results[url]) for url in urls] == [True, False, True, False]
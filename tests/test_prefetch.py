@@ -0,0 +1,57 @@
+import os
+import sys
+import threading
+from concurrent.futures import wait
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prefetch import ReadAheadScheduler
+
+class FakeLimiter:
+    def try_acquire(self, url, reserve=0.0):
+        return True
+
+class FakeManager:
+    """Every chapter is fetched upstream and links to the next one"""
+
+    def __init__(self):
+        self.rate_limiter = FakeLimiter()
+
+    def get_cached_chapter(self, url):
+        return None
+
+    def fetch_chapter(self, url):
+        number = int(url.rsplit('/', 1)[1])
+        return {'url': url, 'next_url': f'{url.rsplit("/", 1)[0]}/{number + 1}'}
+
+def test_finished_readers_are_forgotten():
+    scheduler = ReadAheadScheduler(FakeManager(), depth=2, max_workers=4)
+    futures = [scheduler.schedule({'next_url': f'https://example.com/{reader}/1'}, reader_id=f'tab-{reader}')
+               for reader in range(50)]
+    wait(futures)
+    assert scheduler.generations == {}
+    assert scheduler.pending == {}
+    scheduler.shutdown()
+
+def test_cancelled_readers_are_forgotten():
+    scheduler = ReadAheadScheduler(FakeManager(), depth=2, max_workers=1)
+    blocker = threading.Event()
+    scheduler.executor.submit(blocker.wait)
+    scheduler.schedule({'next_url': 'https://example.com/a/1'}, reader_id='tab-a')
+    latest = scheduler.schedule({'next_url': 'https://example.com/a/5'}, reader_id='tab-a')
+    scheduler.schedule({'next_url': 'https://example.com/b/1'}, reader_id='tab-b')
+    scheduler.cancel('tab-b')
+    assert list(scheduler.pending) == ['tab-a']
+    blocker.set()
+    wait([latest])
+    assert scheduler.generations == {}
+    assert scheduler.pending == {}
+    scheduler.shutdown()
+
+def test_prefetched_counts_every_chapter_across_threads():
+    scheduler = ReadAheadScheduler(FakeManager(), depth=5, max_workers=8)
+    futures = [scheduler.schedule({'next_url': f'https://example.com/{reader}/1'}, reader_id=f'tab-{reader}')
+               for reader in range(200)]
+    wait(futures)
+    assert scheduler.prefetched == 200 * 5
+    scheduler.shutdown()
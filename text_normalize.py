@@ -0,0 +1,58 @@
+import re
+from typing import Iterable
+
+# Paragraphs containing navigation link text are dropped
+SKIP_WORDS = ('上一章', '下一章', '目录')
+# Paragraphs this short or shorter are dropped
+MIN_PARAGRAPH_LENGTH = 10
+
+BR_PATTERN = re.compile(r'<br\s*/?>')
+TAG_PATTERN = re.compile(r'<[^>]+>')
+SENTENCE_END_PATTERN = re.compile(r'[。！？…]')
+# A sentence with its closing punctuation; trailing text without any is not a sentence
+SENTENCE_PATTERN = re.compile(r'[^。！？…]*[。！？…]+')
+
+def _paragraphs(parts: Iterable[str], check_skip_words: bool) -> list:
+    paragraphs = []
+    for part in parts:
+        part = part.strip()
+        if len(part) <= MIN_PARAGRAPH_LENGTH:
+            continue
+        # Skip words hold no whitespace, so testing before normalizing gives the same answer
+        if check_skip_words and any(word in part for word in SKIP_WORDS):
+            continue
+        # Every whitespace character but ' ' is unprintable, so only runs of spaces need checking.
+        # str.split() splits on the same characters as \s+ and the part is already stripped.
+        if not part.isprintable() or '  ' in part:
+            part = ' '.join(part.split())
+        paragraphs.append(part)
+    return paragraphs
+
+def clean_chapter_text(content: str) -> str:
+    """Strip markup from chapter text and lay it out as paragraphs separated by blank lines
+
+    Text is split on blank lines, else on line breaks, else after sentence
+    punctuation, taking the first way that yields a paragraph. Paragraphs of
+    ten characters or fewer, or holding navigation link text, are dropped and
+    whitespace runs become single spaces. If nothing is left the stripped
+    text is returned as is.
+    """
+    if not content:
+        return ""
+
+    content = content.replace('&nbsp;', ' ')
+    if '<' in content:
+        content = BR_PATTERN.sub('\n', content)
+        content = TAG_PATTERN.sub('', content)
+
+    # Most chapters hold no navigation text at all, which spares the per-paragraph test
+    check_skip_words = any(word in content for word in SKIP_WORDS)
+    paragraphs = None
+    if '\n\n' in content:
+        paragraphs = _paragraphs(content.split('\n\n'), check_skip_words)
+    if not paragraphs and '\n' in content:
+        paragraphs = _paragraphs(content.split('\n'), check_skip_words)
+    if not paragraphs and SENTENCE_END_PATTERN.search(content):
+        paragraphs = _paragraphs(SENTENCE_PATTERN.findall(content), check_skip_words)
+
+    return '\n\n'.join(paragraphs) if paragraphs else content.strip()
@@ -0,0 +1,200 @@
+import heapq
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict
+from urllib.parse import urlparse
+
+from host_health import host_health
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class UpdateScheduler:
+    """Check followed books for new chapters in the background, a few requests at a time
+
+    Books wait in a heap ordered by their next check. Each book's interval
+    adapts to how often it updates: half the average gap between observed
+    updates, stretched by half again after every check that finds nothing,
+    kept within [min_interval, max_interval] and jittered so checks stay
+    spread out. Checks go through SourceManager.refresh_chapter_list, sharing
+    its single-flight fetches and the per-host rate limiter with readers. A
+    check starts only when its host's bucket has tokens to spare above
+    `reserve`, the host's circuit is closed and fewer than `max_per_host`
+    checks run against it; at most `max_concurrency` run overall. New
+    chapters go to the store's new chapters feed.
+    """
+
+    def __init__(self, source_manager, min_interval: float = 900.0, max_interval: float = 86400.0,
+                 max_concurrency: int = 2, max_per_host: int = 1, reserve: float = 1.0,
+                 jitter: float = 0.1, defer_delay: float = 30.0):
+        self.source_manager = source_manager
+        self.store = source_manager.store
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_concurrency = max_concurrency
+        self.max_per_host = max_per_host
+        # Tokens left in the host bucket for interactive requests
+        self.reserve = reserve
+        self.jitter = jitter
+        # Upper bound of the random wait before retrying a check that could not start
+        self.defer_delay = defer_delay
+        self.books: Dict[str, Dict] = {}
+        # (next_check, list_url); entries whose time no longer matches the book are stale
+        self.heap: List[tuple] = []
+        self.running: Dict[str, int] = {}
+        self.condition = threading.Condition()
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.thread: Optional[threading.Thread] = None
+        self.stopped = False
+
+        now = time.time()
+        for book in self.store.followed_books():
+            if book['next_check'] < now:
+                # Spread books that fell due while the app was closed instead of checking them all at once
+                book['next_check'] = now + random.uniform(0, self.min_interval)
+            self._push(book)
+
+    def _push(self, book: Dict):
+        self.books[book['list_url']] = book
+        heapq.heappush(self.heap, (book['next_check'], book['list_url']))
+
+    def follow(self, url: str) -> Optional[str]:
+        """Follow the book at `url` (any book or chapter URL), returning its chapter list URL"""
+        source = self.source_manager.get_source_for_url(url)
+        list_url = source.chapter_list_url(url) if source else None
+        if not list_url:
+            return None
+        with self.condition:
+            if list_url not in self.books:
+                now = time.time()
+                self.store.follow_book(list_url, url, self.min_interval, now)
+                self._push({'list_url': list_url, 'url': url, 'interval': self.min_interval,
+                            'next_check': now, 'average_gap': None, 'last_change': None})
+                self.condition.notify()
+        return list_url
+
+    def unfollow(self, url: str):
+        source = self.source_manager.get_source_for_url(url)
+        list_url = source.chapter_list_url(url) if source else None
+        if list_url:
+            with self.condition:
+                self.books.pop(list_url, None)
+                self.store.unfollow_book(list_url)
+
+    def feed(self, after_id: int = 0, limit: int = 100) -> List[Dict]:
+        """New chapters found by update checks, after feed entry `after_id`"""
+        return self.store.get_new_chapters(after_id, limit)
+
+    def start(self):
+        with self.condition:
+            if self.thread is not None:
+                return
+            self.stopped = False
+            self.executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='updates')
+            self.thread = threading.Thread(target=self._run, name='update-scheduler', daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+            thread, executor = self.thread, self.executor
+            self.thread = self.executor = None
+        if thread:
+            thread.join()
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self):
+        while True:
+            self.run_pending()
+            with self.condition:
+                if self.stopped:
+                    return
+                timeout = self.heap[0][0] - time.time() if self.heap else None
+                self.condition.wait(timeout if timeout is None else max(0.05, min(timeout, 60.0)))
+
+    def run_pending(self, now: Optional[float] = None) -> int:
+        """Start every due check that capacity allows, returning how many started
+
+        Checks run on the executor, or inline when the scheduler was not started.
+        """
+        with self.condition:
+            return self._run_pending(now if now is not None else time.time())
+
+    def _run_pending(self, now: float) -> int:
+        """run_pending with the condition held"""
+        started = 0
+        deferred = []
+        limiter = self.source_manager.rate_limiter
+        while self.heap and self.heap[0][0] <= now and sum(self.running.values()) < self.max_concurrency:
+            next_check, list_url = heapq.heappop(self.heap)
+            book = self.books.get(list_url)
+            if book is None or book['next_check'] != next_check:
+                continue
+            host = urlparse(list_url).hostname or ''
+            if (self.running.get(host, 0) >= self.max_per_host or not host_health.is_available(list_url)
+                    or not limiter.try_acquire(list_url, reserve=self.reserve)):
+                metrics.inc('quickreader_update_checks_total', help_text="Followed book update checks",
+                            result='deferred')
+                book['next_check'] = now + random.uniform(self.defer_delay / 2, self.defer_delay)
+                deferred.append(book)
+                continue
+            self.running[host] = self.running.get(host, 0) + 1
+            started += 1
+            if self.executor is not None:
+                self.executor.submit(self._check, book, host)
+            else:
+                self.condition.release()
+                try:
+                    self._check(book, host)
+                finally:
+                    self.condition.acquire()
+        for book in deferred:
+            self._push(book)
+        return started
+
+    def _check(self, book: Dict, host: str):
+        manager = self.source_manager
+        list_url = book['list_url']
+        new_chapters = None
+        known = False
+        try:
+            known = self.store.get_chapter_list_state(list_url) is not None
+            result = manager.refresh_chapter_list(book['url'], rate_limit=False)
+            if result is not None:
+                new_chapters = result['new_chapters']
+                if new_chapters and known:
+                    # A first load lists the whole book; only later additions are news
+                    self.store.add_new_chapters(list_url, new_chapters)
+        except Exception as e:
+            logger.warning(f"Update check failed for {list_url}: {str(e)}")
+        metrics.inc('quickreader_update_checks_total', help_text="Followed book update checks",
+                    result='failed' if new_chapters is None else 'new' if new_chapters else 'unchanged')
+        with self.condition:
+            self.running[host] -= 1
+            if list_url in self.books:
+                # The first load says nothing about how often the book updates
+                self._reschedule(book, bool(new_chapters) if known else None, time.time())
+            self.condition.notify()
+
+    def _reschedule(self, book: Dict, changed: Optional[bool], now: float):
+        if changed is None:
+            interval = book['interval']
+        elif changed:
+            if book['last_change'] is not None:
+                gap = now - book['last_change']
+                average = book['average_gap']
+                book['average_gap'] = gap if average is None else 0.7 * average + 0.3 * gap
+            book['last_change'] = now
+            interval = book['average_gap'] / 2 if book['average_gap'] else self.min_interval
+        else:
+            interval = book['interval'] * 1.5
+        book['interval'] = min(self.max_interval, max(self.min_interval, interval))
+        book['next_check'] = now + book['interval'] * random.uniform(1 - self.jitter, 1 + self.jitter)
+        self.store.save_book_schedule(book['list_url'], book['interval'], book['next_check'],
+                                      book['average_gap'], book['last_change'])
+        self._push(book)